@@ -0,0 +1,225 @@
+# Arquivo: api/agents.py
+# Registro de presença dos agentes MonitorDeRede, mantido no fluxo do /data.
+# Cada employee_id tem estado O(1): último contato, alvos reportados recentemente,
+# taxas de envio com decaimento exponencial e contadores de reenvio de fila.
+# O /agents classifica a frota (online/stale/offline) só com esse estado, sem
+# consultar o InfluxDB, e um retrato em disco mantém a visão após reinícios.
+
+import os
+import json
+import math
+import time
+import threading
+import logging
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+VERSAO_RETRATO = 1
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+
+
+class _Agente:
+    __slots__ = ("primeiro_visto", "ultimo_visto", "ultimo_ponto", "alvos", "taxa_envios", "taxa_pontos",
+                 "taxa_em", "envios", "pontos", "reenvios", "pontos_reenviados", "ultimo_reenvio")
+
+    def __init__(self, agora):
+        self.primeiro_visto = agora
+        self.ultimo_visto = agora
+        # Horário do ping mais recente (do agente), diferente do horário de chegada.
+        self.ultimo_ponto = 0.0
+        # alvo -> último horário em que foi reportado
+        self.alvos = {}
+        # Contadores com decaimento exponencial: valor / tau = taxa por segundo.
+        self.taxa_envios = 0.0
+        self.taxa_pontos = 0.0
+        self.taxa_em = agora
+        self.envios = 0
+        self.pontos = 0
+        self.reenvios = 0
+        self.pontos_reenviados = 0
+        self.ultimo_reenvio = 0.0
+
+
+class AgentRegistry:
+    """Presença e ritmo de envio de cada agente, atualizados a cada lote do /data."""
+
+    def __init__(self, online_s=60, offline_s=600, expiracao_s=7 * 86400, tau_s=300, reenvio_idade_s=120,
+                 caminho_retrato=None, intervalo_retrato_s=60):
+        self.online_s = online_s
+        self.offline_s = offline_s
+        self.expiracao_s = expiracao_s
+        self.tau_s = tau_s
+        # Pontos mais velhos que isso na chegada vêm da fila local do agente (reenvio).
+        self.reenvio_idade_s = reenvio_idade_s
+        self.caminho_retrato = caminho_retrato
+        self.intervalo_retrato_s = intervalo_retrato_s
+        self._agentes = {}
+        self._proxima_limpeza = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._parar = threading.Event()
+
+    def _decair(self, agente, agora):
+        if agora > agente.taxa_em:
+            fator = math.exp(-(agora - agente.taxa_em) / self.tau_s)
+            agente.taxa_envios *= fator
+            agente.taxa_pontos *= fator
+            agente.taxa_em = agora
+
+    def observar(self, pings, envio=None, agora=None):
+        """Registra pings no formato (employee_id, ping_host, latency_ms, success, timestamp_ns).
+
+        O /data entrega um corpo grande em vários lotes; `envio` é um set compartilhado
+        pelos lotes da mesma requisição para o envio e o reenvio contarem uma vez só.
+        """
+        agora = time.time() if agora is None else agora
+        envio = set() if envio is None else envio
+        limite_reenvio = agora - self.reenvio_idade_s
+        with self._lock:
+            if agora >= self._proxima_limpeza:
+                # Sem depender do /agents: o dicionário não cresce com agentes desativados.
+                self._expirar(agora)
+            for employee_id, ping_host, latency_ms, success, timestamp_ns in pings:
+                agente = self._agentes.get(employee_id)
+                if agente is None:
+                    agente = self._agentes[employee_id] = _Agente(agora)
+                self._decair(agente, agora)
+                if (employee_id, 'envio') not in envio:
+                    envio.add((employee_id, 'envio'))
+                    agente.envios += 1
+                    agente.taxa_envios += 1
+                agente.ultimo_visto = agora
+                agente.pontos += 1
+                agente.taxa_pontos += 1
+                agente.alvos[ping_host] = agora
+                ts = timestamp_ns / 1e9
+                if ts > agente.ultimo_ponto:
+                    agente.ultimo_ponto = min(ts, agora)
+                if ts < limite_reenvio:
+                    agente.pontos_reenviados += 1
+                    agente.ultimo_reenvio = agora
+                    if (employee_id, 'reenvio') not in envio:
+                        envio.add((employee_id, 'reenvio'))
+                        agente.reenvios += 1
+        self.iniciar()
+
+    def _expirar(self, agora):
+        for employee_id in [e for e, a in self._agentes.items() if agora - a.ultimo_visto > self.expiracao_s]:
+            del self._agentes[employee_id]
+        self._proxima_limpeza = agora + min(self.expiracao_s, 3600)
+
+    def _status(self, agente, agora):
+        inativo = agora - agente.ultimo_visto
+        if inativo <= self.online_s:
+            return "online"
+        return "stale" if inativo <= self.offline_s else "offline"
+
+    def consultar(self, status=None, agora=None):
+        """Resume cada agente e conta a frota por status; remove os parados há mais de expiracao_s."""
+        agora = time.time() if agora is None else agora
+        agentes = []
+        contagem = {"online": 0, "stale": 0, "offline": 0}
+        with self._lock:
+            self._expirar(agora)
+            for employee_id, agente in self._agentes.items():
+                situacao = self._status(agente, agora)
+                contagem[situacao] += 1
+                if status is not None and situacao != status:
+                    continue
+                self._decair(agente, agora)
+                # Alvos que o agente deixou de pingar saem da lista depois de offline_s.
+                for alvo in [h for h, visto in agente.alvos.items() if agora - visto > self.offline_s]:
+                    del agente.alvos[alvo]
+                agentes.append({
+                    "employee_id": employee_id,
+                    "status": situacao,
+                    "last_seen": _iso(agente.ultimo_visto),
+                    "seconds_since_seen": round(agora - agente.ultimo_visto, 1),
+                    "first_seen": _iso(agente.primeiro_visto),
+                    "last_point": _iso(agente.ultimo_ponto),
+                    "targets": sorted(agente.alvos),
+                    "sends_per_minute": round(agente.taxa_envios / self.tau_s * 60, 2),
+                    "points_per_minute": round(agente.taxa_pontos / self.tau_s * 60, 2),
+                    "sends": agente.envios,
+                    "points": agente.pontos,
+                    "replays": agente.reenvios,
+                    "replayed_points": agente.pontos_reenviados,
+                    "last_replay": _iso(agente.ultimo_reenvio),
+                })
+        agentes.sort(key=lambda a: a["employee_id"])
+        return {"counts": contagem, "agents": agentes}
+
+    def contar(self, status, agora=None):
+        agora = time.time() if agora is None else agora
+        with self._lock:
+            return sum(1 for a in self._agentes.values() if self._status(a, agora) == status)
+
+    # --- Retrato em disco ---
+    def salvar(self):
+        """Grava o estado de todos os agentes (escrita atômica: arquivo temporário + rename)."""
+        if not self.caminho_retrato:
+            return
+        with self._lock:
+            dados = {"version": VERSAO_RETRATO, "saved_at": time.time(),
+                     "agents": {e: {campo: getattr(a, campo) for campo in _Agente.__slots__} for e, a in self._agentes.items()}}
+        temporario = self.caminho_retrato + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.caminho_retrato) or ".", exist_ok=True)
+            with open(temporario, "w") as f:
+                json.dump(dados, f, separators=(",", ":"))
+            os.replace(temporario, self.caminho_retrato)
+        except OSError as e:
+            logger.error(f"Não foi possível gravar o retrato dos agentes: {e}")
+
+    def carregar(self):
+        """Restaura o retrato gravado, se houver; agentes já vistos neste processo prevalecem."""
+        if not self.caminho_retrato or not os.path.exists(self.caminho_retrato):
+            return 0
+        try:
+            with open(self.caminho_retrato) as f:
+                dados = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Retrato dos agentes ilegível, começando vazio: {e}")
+            return 0
+        if dados.get("version") != VERSAO_RETRATO:
+            return 0
+        restaurados = 0
+        with self._lock:
+            for employee_id, campos in dados.get("agents", {}).items():
+                if employee_id in self._agentes:
+                    continue
+                agente = _Agente(campos.get("primeiro_visto", 0.0))
+                for campo in _Agente.__slots__:
+                    if campo in campos:
+                        setattr(agente, campo, campos[campo])
+                self._agentes[employee_id] = agente
+                restaurados += 1
+        return restaurados
+
+    def iniciar(self):
+        # Threads não sobrevivem a um fork: recria a do retrato se o processo mudou.
+        if not self.caminho_retrato or (self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._loop, name="agents-snapshot", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while not self._parar.wait(self.intervalo_retrato_s):
+            self.salvar()
+
+    def parar(self):
+        """Para a thread e grava um último retrato; pode ser chamado mais de uma vez."""
+        self._parar.set()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout=5)
+        self.salvar()
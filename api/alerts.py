@@ -0,0 +1,288 @@
+# Arquivo: api/alerts.py
+# Motor de alertas avaliado no próprio fluxo de ingestão do /data.
+# Cada série (employee_id, ping_host) tem estado O(1): uma máscara de bits com os
+# últimos N pings e um contador de latência alta consecutiva. Os alertas são
+# deduplicados, têm período de carência contra oscilação e são enviados ao
+# Telegram por uma thread própria, agrupando incidentes de um mesmo alvo.
+
+import os
+import time
+import queue
+import threading
+import logging
+from collections import namedtuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# regra: 'perda' (por série) ou 'site' (por alvo); estado: 'disparado' ou 'resolvido'
+Alerta = namedtuple("Alerta", "regra estado employee_id ping_host detalhe incidente")
+
+
+class _EstadoSerie:
+    __slots__ = ("mascara", "vistos", "falhas", "latencia_alta", "degradado", "visto_em")
+
+    def __init__(self):
+        self.visto_em = 0.0
+        self.mascara = 0
+        self.vistos = 0
+        self.falhas = 0
+        self.latencia_alta = 0
+        self.degradado = False
+
+
+class AlertEngine:
+    """Avalia as regras de alerta a cada ping recebido."""
+
+    def __init__(self, notificar, perda_percentual=50.0, janela_perda=10, latencia_ms=300,
+                 latencia_consecutiva=3, min_funcionarios=5, degradado_expira_s=60,
+                 carencia_s=120, idade_max_s=120, expira_s=600):
+        self.notificar = notificar
+        self.perda_percentual = perda_percentual
+        self.janela_perda = janela_perda
+        self.latencia_ms = latencia_ms
+        self.latencia_consecutiva = latencia_consecutiva
+        self.min_funcionarios = min_funcionarios
+        self.degradado_expira_s = degradado_expira_s
+        self.carencia_s = carencia_s
+        self.idade_max_s = idade_max_s
+        # Séries sem pings há mais que isso são esquecidas (agente desligado ou removido).
+        self.expira_s = expira_s
+        self._proxima_limpeza = 0.0
+        self._series = {}
+        # alvo -> {employee_id: último ping degradado}
+        self._degradados = {}
+        self._ativos = set()
+        self._resolvendo = {}
+        self._lock = threading.Lock()
+
+    def avaliar(self, pings, agora=None):
+        """Processa pings no formato (employee_id, ping_host, latency_ms, success, timestamp_ns)."""
+        agora = time.time() if agora is None else agora
+        alvos_alterados = set()
+        with self._lock:
+            for employee_id, ping_host, latency_ms, success, timestamp_ns in pings:
+                # Reenvios de fila antigos não devem gerar alertas de algo que já passou.
+                if agora - timestamp_ns / 1e9 > self.idade_max_s:
+                    continue
+                chave = (employee_id, ping_host)
+                serie = self._series.get(chave)
+                if serie is None:
+                    serie = self._series[chave] = _EstadoSerie()
+                serie.visto_em = agora
+                self._avaliar_perda(serie, chave, success, agora)
+                if self._avaliar_latencia(serie, employee_id, ping_host, latency_ms, success, agora):
+                    alvos_alterados.add(ping_host)
+            for ping_host in alvos_alterados:
+                self._avaliar_site(ping_host, agora)
+            if agora >= self._proxima_limpeza:
+                self._expirar(agora)
+                self._proxima_limpeza = agora + self.expira_s / 4
+            self._confirmar_resolucoes(agora)
+
+    def _expirar(self, agora):
+        """Esquece séries paradas há mais de expira_s; um alerta de perda aberto nelas é resolvido."""
+        for chave in [c for c, s in self._series.items() if agora - s.visto_em > self.expira_s]:
+            del self._series[chave]
+            self._resolver(("perda",) + chave, "perda", chave[0], chave[1], f"sem dados há mais de {self.expira_s:.0f} s", agora)
+        for ping_host in list(self._degradados):
+            self._avaliar_site(ping_host, agora)
+            if not self._degradados[ping_host]:
+                del self._degradados[ping_host]
+
+    def _avaliar_perda(self, serie, chave, success, agora):
+        # Janela dos últimos N pings em uma máscara de bits (1 = falha).
+        limite = 1 << (self.janela_perda - 1)
+        saindo = 1 if serie.vistos >= self.janela_perda and serie.mascara & limite else 0
+        serie.mascara = ((serie.mascara << 1) | (0 if success else 1)) & ((limite << 1) - 1)
+        serie.falhas += (0 if success else 1) - saindo
+        serie.vistos = min(serie.vistos + 1, self.janela_perda)
+        if serie.vistos < self.janela_perda:
+            return
+        perda = 100.0 * serie.falhas / self.janela_perda
+        chave_alerta = ("perda",) + chave
+        if perda > self.perda_percentual:
+            self._disparar(chave_alerta, "perda", chave[0], chave[1], f"perda de {perda:.0f}% nos últimos {self.janela_perda} pings", agora)
+        elif perda <= self.perda_percentual / 2:
+            # Histerese: só resolve quando a perda cai bem abaixo do limite.
+            self._resolver(chave_alerta, "perda", chave[0], chave[1], f"perda de {perda:.0f}%", agora)
+
+    def _avaliar_latencia(self, serie, employee_id, ping_host, latency_ms, success, agora):
+        """Atualiza se a série está degradada; retorna True se o alvo precisa ser reavaliado."""
+        if not success or latency_ms > self.latencia_ms:
+            serie.latencia_alta += 1
+        else:
+            serie.latencia_alta = 0
+        degradado = serie.latencia_alta >= self.latencia_consecutiva
+        degradados = self._degradados.setdefault(ping_host, {})
+        if degradado:
+            degradados[employee_id] = agora
+        elif serie.degradado:
+            degradados.pop(employee_id, None)
+        mudou = degradado != serie.degradado
+        serie.degradado = degradado
+        return mudou or ("site", ping_host) in self._ativos
+
+    def _avaliar_site(self, ping_host, agora):
+        degradados = self._degradados.get(ping_host, {})
+        # Funcionários que pararam de enviar dados não seguram o incidente para sempre.
+        for employee_id in [e for e, visto in degradados.items() if agora - visto > self.degradado_expira_s]:
+            del degradados[employee_id]
+        total = len(degradados)
+        chave_alerta = ("site", ping_host)
+        if total >= self.min_funcionarios:
+            self._disparar(chave_alerta, "site", None, ping_host, f"{total} funcionários com latência acima de {self.latencia_ms} ms ou sem resposta", agora)
+        elif total < max(1, self.min_funcionarios // 2):
+            self._resolver(chave_alerta, "site", None, ping_host, f"{total} funcionários afetados", agora)
+
+    def _disparar(self, chave, regra, employee_id, ping_host, detalhe, agora):
+        if chave in self._ativos:
+            return
+        self._ativos.add(chave)
+        if self._resolvendo.pop(chave, None) is not None:
+            # Voltou antes do fim da carência: para quem recebeu o aviso ele nunca saiu.
+            return
+        incidente = regra == "site" or ("site", ping_host) in self._ativos
+        self.notificar(Alerta(regra, "disparado", employee_id, ping_host, detalhe, incidente))
+
+    def _resolver(self, chave, regra, employee_id, ping_host, detalhe, agora):
+        if chave not in self._ativos:
+            return
+        self._ativos.discard(chave)
+        # A resolução só é avisada depois da carência, evitando alertas oscilando.
+        self._resolvendo[chave] = (agora, Alerta(regra, "resolvido", employee_id, ping_host, detalhe, regra == "site"))
+
+    def _confirmar_resolucoes(self, agora):
+        for chave, (resolvido_em, alerta) in list(self._resolvendo.items()):
+            if agora - resolvido_em >= self.carencia_s:
+                del self._resolvendo[chave]
+                self.notificar(alerta)
+
+    def ativos(self):
+        with self._lock:
+            return sorted(self._ativos, key=str)
+
+
+def formatar_mensagem(alertas):
+    """Monta uma única mensagem, agrupando alertas por série sob o incidente do alvo."""
+    alvos_incidente = {a.ping_host for a in alertas if a.regra == "site"}
+    linhas = []
+    for alerta in alertas:
+        if alerta.regra != "site":
+            continue
+        titulo = "INCIDENTE" if alerta.estado == "disparado" else "INCIDENTE RESOLVIDO"
+        afetados = sorted({a.employee_id for a in alertas if a.regra == "perda" and a.ping_host == alerta.ping_host and a.estado == alerta.estado})
+        linha = f"[{titulo}] alvo {alerta.ping_host}: {alerta.detalhe}"
+        if afetados:
+            linha += f" (perda em {len(afetados)}: {', '.join(afetados[:10])}{'...' if len(afetados) > 10 else ''})"
+        linhas.append(linha)
+    for alerta in alertas:
+        if alerta.regra == "site" or alerta.ping_host in alvos_incidente:
+            continue
+        if alerta.incidente and alerta.estado == "disparado":
+            # O incidente do alvo já foi avisado; evita uma mensagem por funcionário.
+            continue
+        titulo = "ALERTA" if alerta.estado == "disparado" else "RESOLVIDO"
+        linhas.append(f"[{titulo}] {alerta.employee_id} -> {alerta.ping_host}: {alerta.detalhe}")
+    return "\n".join(linhas)
+
+
+class TelegramNotifier:
+    """Envia alertas ao Telegram por uma thread própria, sem bloquear a ingestão."""
+
+    def __init__(self, token, chat_id, api_url="https://api.telegram.org", agrupamento_s=30,
+                 max_fila=1000, timeout=10, tentativas=3):
+        self.token = token
+        self.chat_id = chat_id
+        self.api_url = api_url.rstrip('/')
+        self.agrupamento_s = agrupamento_s
+        self.timeout = timeout
+        self.tentativas = tentativas
+        self.habilitado = bool(token and chat_id)
+        self._fila = queue.Queue(maxsize=max_fila)
+        self._sessao = requests.Session()
+        self._thread = None
+        self._pid = None
+        self._parando = threading.Event()
+        self.enviadas = 0
+
+    def __call__(self, alerta):
+        if not self.habilitado:
+            logger.info(f"Alerta (Telegram não configurado): {alerta}")
+            return
+        self._garantir_thread()
+        try:
+            self._fila.put_nowait(alerta)
+        except queue.Full:
+            logger.warning(f"Fila de alertas cheia, alerta descartado: {alerta}")
+
+    def _garantir_thread(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._loop, name="telegram-notifier", daemon=True)
+        self._thread.start()
+
+    def _esvaziar(self):
+        alertas = []
+        while True:
+            try:
+                alerta = self._fila.get_nowait()
+            except queue.Empty:
+                return alertas
+            if alerta is not None:
+                alertas.append(alerta)
+
+    def _loop(self):
+        while True:
+            alerta = self._fila.get()
+            alertas = [] if alerta is None else [alerta]
+            # Junta o que chegar na janela de agrupamento em uma única mensagem.
+            limite = time.monotonic() + self.agrupamento_s
+            while not self._parando.is_set():
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    proximo = self._fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if proximo is not None:
+                    alertas.append(proximo)
+            parando = self._parando.is_set()
+            if parando:
+                # No encerramento não espera a janela: o que estiver na fila vai junto.
+                alertas.extend(self._esvaziar())
+            texto = formatar_mensagem(alertas)
+            if texto:
+                self._enviar(texto)
+            if parando:
+                return
+
+    def _enviar(self, texto):
+        url = f"{self.api_url}/bot{self.token}/sendMessage"
+        for tentativa in range(self.tentativas):
+            try:
+                resposta = self._sessao.post(url, data={"chat_id": self.chat_id, "text": texto}, timeout=self.timeout)
+                if resposta.status_code == 200:
+                    self.enviadas += 1
+                    return True
+                logger.error(f"Telegram respondeu {resposta.status_code}: {resposta.text[:200]}")
+            except requests.RequestException as e:
+                logger.error(f"Falha ao enviar alerta ao Telegram: {e}")
+            time.sleep(2 ** tentativa)
+        return False
+
+    def parar(self):
+        """Envia na hora os alertas pendentes e espera o envio (com as tentativas) terminar."""
+        if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+            return
+        self._parando.set()
+        try:
+            # Acorda a thread se ela estiver parada esperando o primeiro alerta.
+            self._fila.put_nowait(None)
+        except queue.Full:
+            pass
+        # Até duas mensagens: o grupo em andamento e o restante da fila.
+        self._thread.join(timeout=2 * sum(self.timeout + 2 ** t for t in range(self.tentativas)))
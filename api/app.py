@@ -1,60 +1,303 @@
 # Arquivo: api/app.py (API de Monitoramento, não a de ponto)
 
 import os
-import datetime
+import time
+import zlib
+import atexit
+from datetime import datetime
 from flask import Flask, request, jsonify
 from influxdb import InfluxDBClient
 
+from ingest import BufferedWriter, iterar_linhas, linha_ping, parse_linha
+from spool import Spool, Drenador
+from stats import SlidingStats
+from alerts import AlertEngine, TelegramNotifier
+from agents import AgentRegistry
+from retention import montar_camadas, configurar_em_segundo_plano, escolher_camada, consultar_historico
+from metrics import Registro, instrumentar_flask
+
 app = Flask(__name__)
 
+# Métricas do Prometheus em /metrics. Processo único (ver gunicorn.conf.py), então sem METRICS_DIR.
+metricas = Registro()
+instrumentar_flask(app, metricas, threads=int(os.environ.get('WEB_THREADS', 8)))
+influx_pontos_lote = metricas.histograma("influx_write_batch_points", "Pontos por escrita no InfluxDB",
+                                         limites=(10, 100, 500, 1000, 2500, 5000, 10000, 25000))
+influx_duracao = metricas.histograma("influx_write_duration_seconds", "Duração das escritas no InfluxDB", ("result",))
+ingest_pontos = metricas.contador("ingest_points_total", "Pontos aceitos pelo /data")
+ingest_invalidas = metricas.contador("ingest_invalid_lines_total", "Linhas ignoradas por estarem mal formadas")
+
+
+def registrar_escrita(pontos, duracao_s, sucesso):
+    influx_pontos_lote.observar(pontos)
+    influx_duracao.observar(duracao_s, result="ok" if sucesso else "error")
+
 # Configurações do InfluxDB (lidas do ambiente do Docker)
 INFLUXDB_HOST = os.environ.get('INFLUXDB_HOST')
-INFLUXDB_PORT = int(os.environ.get('INFLUXDB_PORT'))
+INFLUXDB_PORT = int(os.environ.get('INFLUXDB_PORT', 8086))
 INFLUXDB_USER = os.environ.get('INFLUXDB_USER')
 INFLUXDB_PASSWORD = os.environ.get('INFLUXDB_PASSWORD')
 INFLUXDB_DB = os.environ.get('INFLUXDB_DB')
+INFLUXDB_TIMEOUT = float(os.environ.get('INFLUXDB_TIMEOUT', 10))
+# Conexões HTTP mantidas com o InfluxDB: uma por thread de requisição (WEB_THREADS,
+# exportado pelo gunicorn.conf.py) mais o flusher do buffer e o drenador do spool.
+INFLUXDB_POOL_SIZE = int(os.environ.get('INFLUXDB_POOL_SIZE', int(os.environ.get('WEB_THREADS', 8)) + 2))
+
+# Configurações do buffer de escrita em lote
+INFLUX_BATCH_SIZE = int(os.environ.get('INFLUX_BATCH_SIZE', 5000))
+INFLUX_FLUSH_INTERVAL = float(os.environ.get('INFLUX_FLUSH_INTERVAL', 1.0))
+INFLUX_MAX_PENDING = int(os.environ.get('INFLUX_MAX_PENDING', 200000))
+# Tamanho dos lotes repassados ao buffer durante a leitura de um corpo grande
+# e quanto tempo, somando a requisição inteira, ela espera por espaço no buffer.
+# A espera fica abaixo do timeout de 5 s do agente (monitor-network.ps1): se ele
+# desistisse antes da resposta, reenviaria da fila pontos já aceitos. Com o buffer
+# ainda cheio no início, o /data responde 503 com Retry-After e nada é aceito.
+INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE', 1000))
+INGEST_BACKPRESSURE_TIMEOUT = float(os.environ.get('INGEST_BACKPRESSURE_TIMEOUT', 2))
+INGEST_RETRY_AFTER = int(os.environ.get('INGEST_RETRY_AFTER', 5))
+
+# Configurações da fila em disco usada quando o InfluxDB está lento ou fora do ar
+SPOOL_DIR = os.environ.get('SPOOL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'spool'))
+SPOOL_SEGMENT_BYTES = int(os.environ.get('SPOOL_SEGMENT_BYTES', 16 * 1024 * 1024))
+SPOOL_MAX_BYTES = int(os.environ.get('SPOOL_MAX_BYTES', 1024 * 1024 * 1024))
+SPOOL_FSYNC = os.environ.get('SPOOL_FSYNC', '0') == '1'
+SPOOL_DRAIN_RATE = int(os.environ.get('SPOOL_DRAIN_RATE', 20000))
+SPOOL_BACKOFF_MAX = float(os.environ.get('SPOOL_BACKOFF_MAX', 60))
+
+
+def criar_cliente_influx():
+    """Cria o cliente do InfluxDB (também usado pelo drenador para reconectar)."""
+    novo_cliente = InfluxDBClient(host=INFLUXDB_HOST, port=INFLUXDB_PORT, username=INFLUXDB_USER, password=INFLUXDB_PASSWORD,
+                                  timeout=INFLUXDB_TIMEOUT, pool_size=INFLUXDB_POOL_SIZE)
+    novo_cliente.switch_database(INFLUXDB_DB)
+    return novo_cliente
+
 
 try:
-    client = InfluxDBClient(host=INFLUXDB_HOST, port=INFLUXDB_PORT, username=INFLUXDB_USER, password=INFLUXDB_PASSWORD)
-    client.switch_database(INFLUXDB_DB)
+    client = criar_cliente_influx()
 except Exception as e:
     app.logger.error(f"Não foi possível conectar ao InfluxDB: {e}")
+    client = None
+
+spool = Spool(SPOOL_DIR, segment_bytes=SPOOL_SEGMENT_BYTES, max_bytes=SPOOL_MAX_BYTES, fsync=SPOOL_FSYNC)
+writer = BufferedWriter(client, batch_size=INFLUX_BATCH_SIZE, flush_interval=INFLUX_FLUSH_INTERVAL, max_pending=INFLUX_MAX_PENDING, spool=spool,
+                        ao_gravar=registrar_escrita)
+drenador = Drenador(spool, criar_cliente_influx, ao_reconectar=lambda novo: setattr(writer, 'client', novo),
+                    tamanho_lote=INFLUX_BATCH_SIZE, taxa_max=SPOOL_DRAIN_RATE, backoff_max=SPOOL_BACKOFF_MAX)
+writer.drenador = drenador
+
+# Saturação do caminho até o InfluxDB: buffer em memória perto da capacidade e spool crescendo.
+metricas.medidor("influx_buffer_pending_points", "Pontos no buffer aguardando escrita", writer.pendentes)
+metricas.medidor("influx_buffer_capacity_points", "Capacidade do buffer (acima disso há descarte)", lambda: INFLUX_MAX_PENDING)
+metricas.medidor("influx_available", "1 se o InfluxDB está aceitando escritas", lambda: int(drenador.disponivel))
+metricas.medidor("spool_bytes", "Bytes no spool em disco", lambda: spool.status()["bytes"])
+metricas.medidor("spool_points", "Pontos no spool em disco", lambda: spool.status()["pontos"])
+
+# Agregados em memória para o /stats (percentis e perda por funcionário e alvo)
+STATS_WINDOW = int(os.environ.get('STATS_WINDOW', 300))
+STATS_SLICE = int(os.environ.get('STATS_SLICE', 10))
+stats = SlidingStats(janela_s=STATS_WINDOW, fatia_s=STATS_SLICE)
+
+# Presença dos agentes para o /agents; o retrato fica no mesmo volume persistente do spool
+agentes = AgentRegistry(
+    online_s=float(os.environ.get('AGENTS_ONLINE_SECONDS', 60)),
+    offline_s=float(os.environ.get('AGENTS_OFFLINE_SECONDS', 600)),
+    expiracao_s=float(os.environ.get('AGENTS_EXPIRE_SECONDS', 7 * 86400)),
+    caminho_retrato=os.environ.get('AGENTS_SNAPSHOT_PATH', os.path.join(SPOOL_DIR, 'agents.json')),
+    intervalo_retrato_s=float(os.environ.get('AGENTS_SNAPSHOT_INTERVAL', 60)),
+)
+agentes.carregar()
+metricas.medidor("agents_online", "Agentes com contato recente", lambda: agentes.contar("online"))
+
+# Alertas avaliados no fluxo de ingestão e enviados ao Telegram
+TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN')
+TELEGRAM_CHAT_ID = os.environ.get('TELEGRAM_CHAT_ID')
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+notifier = TelegramNotifier(TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, api_url=TELEGRAM_API_URL,
+                            agrupamento_s=float(os.environ.get('ALERT_GROUP_SECONDS', 30)))
+alertas = AlertEngine(
+    notifier,
+    perda_percentual=float(os.environ.get('ALERT_LOSS_PERCENT', 50)),
+    janela_perda=int(os.environ.get('ALERT_LOSS_WINDOW', 10)),
+    latencia_ms=int(os.environ.get('ALERT_LATENCY_MS', 300)),
+    latencia_consecutiva=int(os.environ.get('ALERT_LATENCY_CONSECUTIVE', 3)),
+    min_funcionarios=int(os.environ.get('ALERT_SITE_MIN_EMPLOYEES', 5)),
+    carencia_s=float(os.environ.get('ALERT_RESOLVE_GRACE_SECONDS', 120)),
+    expira_s=float(os.environ.get('ALERT_STATE_EXPIRE_SECONDS', 600)),
+)
+
+# Retenção em camadas: dados brutos por pouco tempo, resumos de 1m e 1h por mais tempo
+camadas = montar_camadas(
+    raw_rp=os.environ.get('RETENTION_RAW_RP', 'autogen'),
+    raw_duracao=os.environ.get('RETENTION_RAW', '30d'),
+    rp_1m_duracao=os.environ.get('RETENTION_1M', '180d'),
+    rp_1h_duracao=os.environ.get('RETENTION_1H', 'INF'),
+)
+if os.environ.get('RETENTION_MANAGE', '1') == '1':
+    configurar_em_segundo_plano(criar_cliente_influx, INFLUXDB_DB, camadas)
+
+def encerrar():
+    """Grava o buffer (ou o manda para o spool), depois para o drenador, o envio de alertas e o retrato dos agentes.
+
+    Registrado no atexit e chamado pelo worker_exit do gunicorn; pode rodar mais de uma vez.
+    """
+    writer.parar()
+    drenador.parar()
+    notifier.parar()
+    agentes.parar()
+
+atexit.register(encerrar)
+
+
+def processar_lote(pings, envio=None, prazo=None):
+    """Atualiza os agregados em memória, avalia os alertas e enfileira o lote para o InfluxDB."""
+    if not pings:
+        return
+    ingest_pontos.inc(len(pings))
+    stats.observar(pings)
+    agentes.observar(pings, envio)
+    alertas.avaliar(pings)
+    # A gravação acontece no flusher em segundo plano; o agente não espera o InfluxDB.
+    timeout = INGEST_BACKPRESSURE_TIMEOUT if prazo is None else max(0.0, prazo - time.monotonic())
+    writer.adicionar([linha_ping(*ping) for ping in pings], timeout=timeout)
 
 
 @app.route('/data', methods=['POST'])
 def receive_data():
-    """Recebe dados de pings individuais e os salva no InfluxDB."""
-    csv_data = request.data.decode('utf-8').strip()
-    points = []
+    """Recebe dados de pings e os enfileira para gravação em lote no InfluxDB.
+
+    O corpo é lido em blocos (opcionalmente com Content-Encoding: gzip) e
+    repassado ao buffer em lotes limitados, então o reenvio de uma fila grande
+    de um agente ocupa memória constante. Linhas inválidas são ignoradas e contadas.
+    Com o buffer cheio a requisição responde 503 com Retry-After em vez de prender
+    o agente além do timeout dele.
+    """
+    prazo = time.monotonic() + INGEST_BACKPRESSURE_TIMEOUT
+    if not writer.esperar_espaco(INGEST_BACKPRESSURE_TIMEOUT):
+        # O agente guarda os pontos na fila e reenvia depois, sem duplicar nada.
+        resposta = jsonify({"error": "Buffer de escrita cheio, tente novamente mais tarde."})
+        resposta.headers['Retry-After'] = str(INGEST_RETRY_AFTER)
+        return resposta, 503
+    gzip = request.headers.get('Content-Encoding', '').lower() == 'gzip'
+    pings = []
+    # Agentes já contados nesta requisição (um corpo grande chega em vários lotes).
+    envio = set()
+    recebidos = 0
+    invalidas = 0
     try:
-        for line in csv_data.split('\n'):
+        for line in iterar_linhas(request.stream, gzip=gzip):
             if not line: continue
-            
-            # Novo formato: employee_id,ping_host,latency_ms,success_flag
-            employee_id, ping_host, latency_ms, success = line.split(',')
-            
-            # Monta o ponto de dados para o InfluxDB
-            points.append({
-                "measurement": "ping_results", # Novo nome para a "tabela"
-                "tags": {
-                    "employee_id": employee_id,
-                    "ping_host": ping_host
-                },
-                "time": datetime.datetime.now().isoformat() + "Z",
-                "fields": {
-                    "latency_ms": int(latency_ms),
-                    "success": int(success) # 1 para sucesso, 0 para falha
-                }
-            })
-
-        if points:
-            client.write_points(points)
-            return jsonify({"status": "success", "points_received": len(points)}), 200
-        else:
-            return jsonify({"status": "no valid data"}), 400
+            try:
+                # Formato: employee_id,ping_host,latency_ms,success_flag[,timestamp]
+                pings.append(parse_linha(line))
+            except ValueError as e:
+                invalidas += 1
+                if invalidas <= 10:
+                    app.logger.warning(f"Linha ignorada: {e}")
+                continue
+            if len(pings) >= INGEST_BATCH_SIZE:
+                processar_lote(pings, envio, prazo)
+                recebidos += len(pings)
+                pings = []
+    except (zlib.error, UnicodeDecodeError) as e:
+        app.logger.error(f"Corpo da requisição ilegível: {e}")
+        return jsonify({"error": f"Corpo ilegível: {e}", "points_received": recebidos}), 400
+
+    processar_lote(pings, envio, prazo)
+    recebidos += len(pings)
+    if invalidas:
+        ingest_invalidas.inc(invalidas)
+
+    if not recebidos:
+        return jsonify({"status": "no valid data", "invalid_lines": invalidas}), 400
+    return jsonify({"status": "success", "points_received": recebidos, "invalid_lines": invalidas}), 202
+
+@app.route('/health/live', methods=['GET'])
+def health_live():
+    return jsonify({"status": "ok"})
+
+@app.route('/health/ready', methods=['GET'])
+def health_ready():
+    """Pronto para receber /data: o spool aceita escrita e o buffer não está cheio.
+
+    O InfluxDB fora do ar não tira a API do ar (os pontos vão para o spool); só é informado.
+    """
+    spool_ok = os.access(SPOOL_DIR, os.W_OK)
+    buffer_ok = writer.pendentes() < INFLUX_MAX_PENDING
+    status = {
+        "status": "ok" if spool_ok and buffer_ok else "unavailable",
+        "spool_writable": spool_ok,
+        "buffer_pending": writer.pendentes(),
+        "influx_available": drenador.disponivel,
+    }
+    return jsonify(status), 200 if spool_ok and buffer_ok else 503
+
+@app.route('/spool', methods=['GET'])
+def spool_status():
+    """Mostra a profundidade da fila em disco e a taxa de drenagem para o InfluxDB."""
+    status = drenador.status()
+    status["buffer_pendentes"] = writer.pendentes()
+    return jsonify(status)
+
+@app.route('/stats', methods=['GET'])
+def latency_stats():
+    """Percentis de latência, taxa de perda e último contato por funcionário e alvo, direto da memória."""
+    janela = request.args.get('window', type=int)
+    if janela is not None and janela < stats.fatia_s:
+        return jsonify({"error": f"Parâmetro 'window' deve ser de pelo menos {stats.fatia_s} segundos"}), 400
+    try:
+        percentis = [float(p) for p in request.args.get('percentiles', '50,95,99').split(',') if p]
+    except ValueError:
+        return jsonify({"error": "Parâmetro 'percentiles' inválido"}), 400
+    if any(not 0 < p <= 100 for p in percentis):
+        return jsonify({"error": "Percentis devem estar entre 0 e 100"}), 400
+    series = stats.consultar(janela_s=janela, employee_id=request.args.get('employee_id'),
+                             ping_host=request.args.get('ping_host'), percentis=percentis)
+    return jsonify({"window_seconds": stats.janela_efetiva(janela), "series": series})
+
+@app.route('/agents', methods=['GET'])
+def agents():
+    """Frota de agentes classificada em online/stale/offline pelo último contato, direto da memória."""
+    status = request.args.get('status')
+    if status is not None and status not in ('online', 'stale', 'offline'):
+        return jsonify({"error": "Parâmetro 'status' deve ser online, stale ou offline"}), 400
+    resultado = agentes.consultar(status=status)
+    resultado.update(online_seconds=agentes.online_s, offline_seconds=agentes.offline_s)
+    return jsonify(resultado)
+
+def _instante(valor, padrao):
+    """Aceita epoch em segundos ou ISO-8601 nos parâmetros de consulta."""
+    if not valor:
+        return padrao
+    try:
+        return float(valor)
+    except ValueError:
+        return datetime.fromisoformat(valor.replace('Z', '+00:00')).timestamp()
+
+
+@app.route('/history', methods=['GET'])
+def history():
+    """Histórico de pings lido da camada de retenção adequada ao intervalo pedido."""
+    agora = time.time()
+    try:
+        inicio = _instante(request.args.get('start'), agora - 3600)
+        fim = _instante(request.args.get('end'), agora)
+    except ValueError:
+        return jsonify({"error": "Parâmetros 'start'/'end' devem ser epoch em segundos ou ISO-8601"}), 400
+    if fim <= inicio:
+        return jsonify({"error": "'end' deve ser maior que 'start'"}), 400
+    max_pontos = request.args.get('max_points', 500, type=int)
+    camada = escolher_camada(camadas, inicio, fim, max_pontos, agora=agora)
+    try:
+        series = consultar_historico(drenador.client or client, camada, inicio, fim,
+                                     employee_id=request.args.get('employee_id'),
+                                     ping_host=request.args.get('ping_host'))
     except Exception as e:
-        app.logger.error(f"Erro ao processar dados: {e}\nDados recebidos: {csv_data}")
-        return jsonify({"error": str(e)}), 500
+        app.logger.error(f"Erro ao consultar o InfluxDB: {e}")
+        return jsonify({"error": str(e)}), 502
+    return jsonify({"tier": camada.nome, "resolution_seconds": camada.resolucao_s,
+                    "measurement": camada.measurement, "series": series})
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Desenvolvimento; em produção o contêiner usa o gunicorn (ver gunicorn.conf.py).
+    app.run(host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
@@ -0,0 +1,118 @@
+# Arquivo: api/bench/fake_influx.py
+# Substituto local do endpoint HTTP do InfluxDB 1.x para o benchmark de ingestão.
+# Atende /write, /ping e /query, conta chamadas e pontos recebidos e pode
+# injetar latência e falhas para simular um InfluxDB lento ou instável.
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+class FakeInflux:
+    """Servidor HTTP que imita o InfluxDB o suficiente para o network-api gravar nele."""
+
+    def __init__(self, host="127.0.0.1", port=0, latencia_ms=0.0, taxa_falha=0.0):
+        self.latencia_ms = latencia_ms
+        self.taxa_falha = taxa_falha
+        self._lock = threading.Lock()
+        self.escritas = 0
+        self.falhas = 0
+        self.pontos = 0
+        self.tamanhos_lote = []
+        self.inicio = None
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _responder(self, status, corpo=b""):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("X-Influxdb-Version", "1.8.10")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def do_GET(self):
+                caminho = urlparse(self.path).path
+                if caminho == "/ping":
+                    self._responder(204)
+                elif caminho == "/query":
+                    self._responder(200, json.dumps({"results": [{"statement_id": 0}]}).encode())
+                else:
+                    self._responder(404)
+
+            def do_POST(self):
+                corpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                caminho = urlparse(self.path).path
+                if caminho == "/query":
+                    self._responder(200, json.dumps({"results": [{"statement_id": 0}]}).encode())
+                    return
+                if caminho != "/write":
+                    self._responder(404)
+                    return
+                if fake.latencia_ms:
+                    time.sleep(fake.latencia_ms / 1000.0)
+                if fake.taxa_falha and random.random() < fake.taxa_falha:
+                    with fake._lock:
+                        fake.falhas += 1
+                    self._responder(503, b'{"error":"falha injetada"}')
+                    return
+                pontos = corpo.count(b"\n")
+                with fake._lock:
+                    fake.escritas += 1
+                    fake.pontos += pontos
+                    fake.tamanhos_lote.append(pontos)
+                self._responder(204)
+
+            def log_message(self, *args):
+                pass
+
+        self._servidor = ThreadingHTTPServer((host, port), Handler)
+        self._servidor.daemon_threads = True
+        self.host, self.port = self._servidor.server_address[:2]
+        self._thread = None
+
+    def iniciar(self):
+        self.inicio = time.monotonic()
+        self._thread = threading.Thread(target=self._servidor.serve_forever, name="fake-influx", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def resumo(self):
+        with self._lock:
+            duracao = time.monotonic() - self.inicio if self.inicio else 0.0
+            lotes = sorted(self.tamanhos_lote)
+            return {
+                "write_calls": self.escritas,
+                "failed_write_calls": self.falhas,
+                "points_written": self.pontos,
+                "mean_batch_size": round(self.pontos / self.escritas, 1) if self.escritas else 0,
+                "max_batch_size": lotes[-1] if lotes else 0,
+                "uptime_seconds": round(duracao, 3),
+            }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="InfluxDB falso para testes de carga do network-api")
+    parser.add_argument("--port", type=int, default=8086)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    fake = FakeInflux(host="0.0.0.0", port=args.port, latencia_ms=args.latency_ms, taxa_falha=args.failure_rate).iniciar()
+    print(f"InfluxDB falso em :{fake.port} (Ctrl+C para sair)")
+    try:
+        while True:
+            time.sleep(5)
+            print(json.dumps(fake.resumo()))
+    except KeyboardInterrupt:
+        fake.parar()
@@ -0,0 +1,242 @@
+# Arquivo: api/bench/ingest_bench.py
+# Benchmark de vazão de ingestão do network-api.
+#
+# Sobe um InfluxDB falso local, inicia o network-api em um processo separado
+# apontando para ele e simula N agentes enviando /data ao mesmo tempo. No fim
+# imprime (ou grava) um JSON com pontos/s, percentis de latência das requisições,
+# chamadas de escrita ao InfluxDB por segundo e pico de memória (RSS) da API.
+#
+# Exemplo:
+#   python bench/ingest_bench.py --agents 300 --duration 30 --lines-per-request 4
+#   python bench/ingest_bench.py --replay-lines 50000 --gzip --influx-latency-ms 50
+#   python bench/ingest_bench.py --output atual.json --compare base.json
+
+import os
+import sys
+import json
+import gzip
+import time
+import socket
+import argparse
+import tempfile
+import platform
+import threading
+import subprocess
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_influx import FakeInflux  # noqa: E402
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ALVOS = ("8.8.8.8", "187.33.93.122", "38.91.107.164", "br11.td.commpeak.com")
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentis(valores, ps=(50, 90, 95, 99)):
+    if not valores:
+        return {f"p{p}": None for p in ps}
+    ordenados = sorted(valores)
+    return {f"p{p}": round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))], 2) for p in ps}
+
+
+def pico_rss_kb(pid):
+    """Pico de memória residente (VmHWM) do processo, em KB; None fora do Linux."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linha in f:
+                if linha.startswith("VmHWM:"):
+                    return int(linha.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def iniciar_api(porta, fake, args, spool_dir):
+    env = dict(os.environ,
+               INFLUXDB_HOST=fake.host, INFLUXDB_PORT=str(fake.port), INFLUXDB_DB="bench",
+               SPOOL_DIR=spool_dir, RETENTION_MANAGE="0",
+               INFLUX_BATCH_SIZE=str(args.influx_batch_size), INFLUX_FLUSH_INTERVAL=str(args.flush_interval))
+    env.pop("TELEGRAM_BOT_TOKEN", None)
+    codigo = f"import app; app.app.run(host='127.0.0.1', port={porta}, threaded=True)"
+    processo = subprocess.Popen([sys.executable, "-c", codigo], cwd=API_DIR, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{porta}"
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        try:
+            requests.get(f"{url}/spool", timeout=1)
+            return processo, url
+        except requests.RequestException:
+            time.sleep(0.1)
+    processo.kill()
+    raise RuntimeError("network-api não subiu em 30 s")
+
+
+def montar_corpo(agente, linhas, replay, comprimir):
+    """Gera um corpo CSV no formato do agente; em reenvio, com timestamps no passado."""
+    agora_ms = int(time.time() * 1000)
+    partes = []
+    for i in range(linhas):
+        alvo = ALVOS[i % len(ALVOS)]
+        sucesso = 0 if i % 50 == 49 else 1
+        latencia = 0 if not sucesso else 10 + (i * 7) % 90
+        ts = agora_ms - (linhas - i) * 1000 if replay else agora_ms
+        partes.append(f"agente{agente:05d},{alvo},{latencia},{sucesso},{ts}\n")
+    corpo = "".join(partes).encode("utf-8")
+    return gzip.compress(corpo) if comprimir else corpo
+
+
+def agente(numero, url, args, fim, resultados):
+    sessao = requests.Session()
+    latencias = []
+    pontos = erros = requisicoes = 0
+    enviou_replay = False
+    while time.monotonic() < fim and (not args.requests_per_agent or requisicoes < args.requests_per_agent):
+        replay = bool(args.replay_lines) and not enviou_replay and numero % max(1, round(1 / args.replay_fraction)) == 0
+        linhas = args.replay_lines if replay else args.lines_per_request
+        comprimir = args.gzip and replay
+        corpo = montar_corpo(numero, linhas, replay, comprimir)
+        cabecalhos = {"Content-Type": "text/csv; charset=utf-8"}
+        if comprimir:
+            cabecalhos["Content-Encoding"] = "gzip"
+        inicio = time.perf_counter()
+        try:
+            resposta = sessao.post(f"{url}/data", data=corpo, headers=cabecalhos, timeout=60)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            if resposta.status_code in (200, 202):
+                pontos += resposta.json().get("points_received", 0)
+            else:
+                erros += 1
+        except requests.RequestException:
+            erros += 1
+        requisicoes += 1
+        enviou_replay = enviou_replay or replay
+        if args.interval:
+            time.sleep(args.interval)
+    resultados[numero] = (latencias, pontos, erros, requisicoes)
+
+
+def executar(args):
+    fake = FakeInflux(latencia_ms=args.influx_latency_ms, taxa_falha=args.influx_failure_rate).iniciar()
+    spool_dir = tempfile.mkdtemp(prefix="bench-spool-")
+    processo, url = iniciar_api(_porta_livre(), fake, args, spool_dir)
+    try:
+        resultados = {}
+        inicio = time.monotonic()
+        fim = inicio + args.duration
+        threads = [threading.Thread(target=agente, args=(i, url, args, fim, resultados)) for i in range(args.agents)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        duracao_carga = time.monotonic() - inicio
+
+        latencias = [v for r in resultados.values() for v in r[0]]
+        pontos = sum(r[1] for r in resultados.values())
+        erros = sum(r[2] for r in resultados.values())
+        requisicoes = sum(r[3] for r in resultados.values())
+
+        # Espera o buffer e o spool esvaziarem para medir o caminho completo até o InfluxDB.
+        limite = time.monotonic() + args.drain_timeout
+        while time.monotonic() < limite:
+            status = requests.get(f"{url}/spool", timeout=5).json()
+            if status.get("buffer_pendentes", 0) == 0 and status.get("pontos", 0) == 0 and fake.resumo()["points_written"] >= pontos:
+                break
+            time.sleep(0.2)
+        duracao_total = time.monotonic() - inicio
+        rss = pico_rss_kb(processo.pid)
+        influx = fake.resumo()
+    finally:
+        processo.terminate()
+        processo.wait(timeout=10)
+        fake.parar()
+
+    return {
+        "benchmark": "network-api-ingest",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "config": {
+            "agents": args.agents, "duration_s": args.duration, "lines_per_request": args.lines_per_request,
+            "requests_per_agent": args.requests_per_agent, "interval_s": args.interval,
+            "replay_lines": args.replay_lines, "replay_fraction": args.replay_fraction, "gzip": args.gzip,
+            "influx_latency_ms": args.influx_latency_ms, "influx_failure_rate": args.influx_failure_rate,
+            "influx_batch_size": args.influx_batch_size, "flush_interval_s": args.flush_interval,
+        },
+        "results": {
+            "requests": requisicoes,
+            "request_errors": erros,
+            "points_acked": pontos,
+            "points_per_second": round(pontos / duracao_carga, 1) if duracao_carga else 0,
+            "requests_per_second": round(requisicoes / duracao_carga, 1) if duracao_carga else 0,
+            "request_latency_ms": percentis(latencias),
+            "influx_write_calls": influx["write_calls"],
+            "influx_write_calls_per_second": round(influx["write_calls"] / duracao_total, 2) if duracao_total else 0,
+            "influx_failed_write_calls": influx["failed_write_calls"],
+            "influx_points_written": influx["points_written"],
+            "influx_mean_batch_size": influx["mean_batch_size"],
+            "load_seconds": round(duracao_carga, 3),
+            "end_to_end_seconds": round(duracao_total, 3),
+            "peak_rss_kb": rss,
+        },
+    }
+
+
+def comparar(atual, base, tolerancia):
+    """Lista regressões em relação a um resultado anterior (vazão menor ou p95 maior)."""
+    regressoes = []
+    a, b = atual["results"], base["results"]
+    if b["points_per_second"] and a["points_per_second"] < b["points_per_second"] * (1 - tolerancia):
+        regressoes.append(f"points_per_second {a['points_per_second']} < {b['points_per_second']}")
+    p95_a, p95_b = a["request_latency_ms"]["p95"], b["request_latency_ms"]["p95"]
+    if p95_a is not None and p95_b and p95_a > p95_b * (1 + tolerancia):
+        regressoes.append(f"request_latency_ms.p95 {p95_a} > {p95_b}")
+    if b["peak_rss_kb"] and a["peak_rss_kb"] and a["peak_rss_kb"] > b["peak_rss_kb"] * (1 + tolerancia):
+        regressoes.append(f"peak_rss_kb {a['peak_rss_kb']} > {b['peak_rss_kb']}")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de ingestão do network-api com InfluxDB falso")
+    parser.add_argument("--agents", type=int, default=100, help="agentes simultâneos")
+    parser.add_argument("--duration", type=float, default=10.0, help="duração da carga em segundos")
+    parser.add_argument("--lines-per-request", type=int, default=1, help="linhas por POST normal")
+    parser.add_argument("--requests-per-agent", type=int, default=0, help="limite de POSTs por agente (0 = só duração)")
+    parser.add_argument("--interval", type=float, default=0.0, help="pausa entre POSTs de um agente, em segundos")
+    parser.add_argument("--replay-lines", type=int, default=0, help="tamanho do reenvio de fila (0 = sem reenvio)")
+    parser.add_argument("--replay-fraction", type=float, default=1.0, help="fração dos agentes que fazem um reenvio")
+    parser.add_argument("--gzip", action="store_true", help="comprime os corpos de reenvio")
+    parser.add_argument("--influx-latency-ms", type=float, default=0.0, help="latência injetada em cada /write")
+    parser.add_argument("--influx-failure-rate", type=float, default=0.0, help="fração de /write que falham (503)")
+    parser.add_argument("--influx-batch-size", type=int, default=5000)
+    parser.add_argument("--flush-interval", type=float, default=1.0)
+    parser.add_argument("--drain-timeout", type=float, default=60.0, help="espera máxima para o buffer/spool esvaziar")
+    parser.add_argument("--output", help="grava o JSON neste arquivo em vez de imprimir")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="variação aceita na comparação")
+    args = parser.parse_args(argv)
+
+    resultado = executar(args)
+    saida = json.dumps(resultado, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(saida + "\n")
+    else:
+        print(saida)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressoes = comparar(resultado, json.load(f), args.tolerance)
+        for regressao in regressoes:
+            print(f"REGRESSÃO: {regressao}", file=sys.stderr)
+        return 1 if regressoes else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
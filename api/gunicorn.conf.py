@@ -0,0 +1,34 @@
+# Arquivo: api/gunicorn.conf.py
+# Configuração do gunicorn para o network-api em produção.
+#
+# Um único worker, de propósito: o buffer de escrita, o spool em disco, as
+# estatísticas do /stats e o estado dos alertas vivem na memória do processo.
+# Com vários workers cada um teria uma visão parcial e disputaria o mesmo spool.
+# A concorrência vem das threads (gthread); o parse do /data é curto e a espera
+# pelo InfluxDB acontece no flusher em segundo plano.
+
+import os
+import multiprocessing
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:5000')
+worker_class = 'gthread'
+workers = 1
+threads = int(os.environ.get('WEB_THREADS', max(8, multiprocessing.cpu_count() * 4)))
+# O pool de conexões HTTP com o InfluxDB (app.py) é dimensionado pelas threads.
+os.environ['WEB_THREADS'] = str(threads)
+
+timeout = int(os.environ.get('WEB_TIMEOUT', 120))
+# SIGTERM (docker stop): termina as requisições e grava o buffer antes de sair.
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+# Sem max_requests: reciclar o worker descartaria as janelas do /stats e o estado dos alertas.
+
+# Os agentes enviam /data o tempo todo; o log de acesso só geraria ruído.
+accesslog = None
+errorlog = '-'
+loglevel = os.environ.get('WEB_LOG_LEVEL', 'info')
+
+
+def worker_exit(server, worker):
+    from app import encerrar
+    encerrar()
@@ -0,0 +1,313 @@
+# Arquivo: api/ingest.py
+# Buffer de escrita em lote para o InfluxDB.
+# Os pontos recebidos em /data são serializados direto em line protocol e
+# acumulados aqui; uma thread em segundo plano descarrega o buffer por
+# tamanho ou por idade, de modo que a requisição do agente não espera o InfluxDB.
+
+import os
+import math
+import zlib
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+
+from spool import dados_rejeitados
+
+logger = logging.getLogger(__name__)
+
+MEASUREMENT = "ping_results"
+CHUNK_SIZE = 64 * 1024
+# Linhas do agente têm algumas dezenas de bytes; acima disso é lixo e a linha é rejeitada.
+MAX_LINHA = 4096
+# Faixa de horários que o InfluxDB aceita (int64 em ns, menos os valores reservados).
+INFLUX_MIN_NS = -9223372036854775806
+INFLUX_MAX_NS = 9223372036854775806
+
+
+def _escapar_tag(valor):
+    """Escapa um valor de tag conforme as regras do line protocol."""
+    return valor.replace('\\', '\\\\').replace(',', '\\,').replace(' ', '\\ ').replace('=', '\\=')
+
+
+def linha_ping(employee_id, ping_host, latency_ms, success, timestamp_ns):
+    """Monta a linha de um ping no line protocol (mesmos tipos do formato JSON antigo)."""
+    return (f"{MEASUREMENT},employee_id={_escapar_tag(employee_id)},ping_host={_escapar_tag(ping_host)} "
+            f"latency_ms={int(latency_ms)}i,success={int(success)}i {int(timestamp_ns)}")
+
+
+def _timestamp_ns(valor):
+    """Converte o timestamp opcional do agente (epoch em s/ms/ns ou ISO-8601) para nanossegundos."""
+    try:
+        numero = float(valor)
+    except ValueError:
+        dt = datetime.fromisoformat(valor.replace('Z', '+00:00'))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        ns = int(dt.timestamp()) * 1_000_000_000 + dt.microsecond * 1000
+    else:
+        if not math.isfinite(numero):
+            raise ValueError(f"Timestamp inválido: {valor}")
+        if abs(numero) < 1e11:
+            ns = int(numero * 1e9)
+        elif abs(numero) < 1e14:
+            ns = int(numero * 1e6)
+        else:
+            ns = int(numero)
+    if not INFLUX_MIN_NS <= ns <= INFLUX_MAX_NS:
+        raise ValueError(f"Timestamp fora da faixa do InfluxDB: {valor}")
+    return ns
+
+
+_relogio_lock = threading.Lock()
+_ultimo_ns = 0
+
+
+def agora_unico_ns():
+    """Horário atual em ns, estritamente crescente no processo.
+
+    O InfluxDB identifica um ponto por série + horário: duas linhas sem timestamp
+    com o mesmo horário virariam um único ponto (o reenvio dos agentes antigos perdia dados).
+    """
+    global _ultimo_ns
+    with _relogio_lock:
+        _ultimo_ns = max(time.time_ns(), _ultimo_ns + 1)
+        return _ultimo_ns
+
+
+def parse_linha(line, relogio=agora_unico_ns):
+    """Converte uma linha CSV do agente na tupla (employee_id, ping_host, latency_ms, success, timestamp_ns).
+
+    Formato: employee_id,ping_host,latency_ms,success_flag[,timestamp]
+    Sem a coluna de timestamp o ponto recebe o horário de chegada, único por linha.
+    """
+    if len(line) > MAX_LINHA:
+        raise ValueError(f"Linha com mais de {MAX_LINHA} caracteres")
+    campos = line.split(',')
+    if len(campos) == 4:
+        employee_id, ping_host, latency_ms, success = campos
+        timestamp_ns = relogio()
+    elif len(campos) == 5:
+        employee_id, ping_host, latency_ms, success, timestamp = campos
+        timestamp_ns = _timestamp_ns(timestamp.strip())
+    else:
+        raise ValueError(f"Número de colunas inválido ({len(campos)}): {line}")
+    if not employee_id or not ping_host:
+        raise ValueError(f"Linha sem employee_id ou ping_host: {line}")
+    return employee_id, ping_host, int(latency_ms), int(success), timestamp_ns
+
+
+def _blocos(stream, gzip, chunk_size):
+    """Blocos do corpo com no máximo chunk_size bytes, já descomprimidos se gzip=True."""
+    descompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzip else None
+    while True:
+        bloco = stream.read(chunk_size)
+        if not bloco:
+            break
+        if descompressor is None:
+            yield bloco
+            continue
+        # max_length limita a expansão: um bloco pequeno de um "gzip bomb" sai em pedaços.
+        while bloco:
+            yield descompressor.decompress(bloco, chunk_size)
+            bloco = descompressor.unconsumed_tail
+    if descompressor is not None:
+        yield descompressor.flush()
+
+
+def iterar_linhas(stream, gzip=False, chunk_size=CHUNK_SIZE):
+    """Lê o corpo da requisição em blocos e devolve uma linha por vez.
+
+    O corpo nunca é carregado inteiro na memória; com gzip=True ele é
+    descomprimido incrementalmente. Uma linha maior que MAX_LINHA é descartada
+    até a próxima quebra e entregue só pelo começo, que o parse_linha rejeita.
+    """
+    resto = b''
+    descartando = False
+    for bloco in _blocos(stream, gzip, chunk_size):
+        resto += bloco
+        *linhas, resto = resto.split(b'\n')
+        for linha in linhas:
+            if descartando:
+                # Fim da linha longa já rejeitada.
+                descartando = False
+                continue
+            yield linha.decode('utf-8').strip()
+        if len(resto) > MAX_LINHA:
+            if not descartando:
+                yield resto[:MAX_LINHA + 1].decode('utf-8', 'replace')
+            descartando = True
+            resto = b''
+    if resto and not descartando:
+        yield resto.decode('utf-8').strip()
+
+
+class BufferedWriter:
+    """Acumula linhas em memória e as envia ao InfluxDB em lotes."""
+
+    def __init__(self, client, batch_size=5000, flush_interval=1.0, max_pending=200000, spool=None, drenador=None,
+                 ao_gravar=None):
+        self.client = client
+        # Chamado após cada escrita no InfluxDB com (pontos, duracao_s, sucesso); usado pelas métricas.
+        self.ao_gravar = ao_gravar
+        # Com spool/drenador configurados, o que não puder ir ao InfluxDB vai para o disco.
+        self.spool = spool
+        self.drenador = drenador
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._linhas = []
+        self._primeira_em = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._parar = False
+
+    def _garantir_thread(self):
+        # Threads não sobrevivem a um fork: recria o flusher se o processo mudou.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._parar = False
+        self._thread = threading.Thread(target=self._loop, name="influx-flusher", daemon=True)
+        self._thread.start()
+
+    def adicionar(self, linhas, timeout=None):
+        """Enfileira linhas já serializadas.
+
+        Sem timeout retorna imediatamente. Com timeout, espera até esse tempo
+        por espaço no buffer (backpressure para cargas grandes, como o reenvio
+        da fila de um agente) antes de recorrer ao descarte.
+        """
+        if not linhas:
+            return
+        if self.drenador is not None:
+            self.drenador.iniciar()
+            if not self.drenador.disponivel and self.spool is not None:
+                # InfluxDB fora do ar: grava direto no spool em vez de ocupar memória.
+                self.spool.adicionar(linhas)
+                return
+        with self._cond:
+            self._garantir_thread()
+            if timeout is not None:
+                limite = time.monotonic() + timeout
+                while len(self._linhas) + len(linhas) > self.max_pending:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._cond.notify_all()
+                    self._cond.wait(restante)
+            if self._primeira_em is None:
+                self._primeira_em = time.monotonic()
+            self._linhas.extend(linhas)
+            excesso = len(self._linhas) - self.max_pending
+            if excesso > 0:
+                # Limite de memória: descarta os pontos mais antigos.
+                del self._linhas[:excesso]
+                logger.warning(f"Buffer do InfluxDB cheio, {excesso} pontos descartados")
+            if len(self._linhas) >= self.batch_size:
+                self._cond.notify_all()
+
+    def esperar_espaco(self, timeout):
+        """Espera até timeout segundos por espaço no buffer; False se ele continuar cheio.
+
+        Com o InfluxDB fora do ar e spool configurado, os pontos vão para o disco e
+        sempre há espaço.
+        """
+        if self.drenador is not None and self.spool is not None:
+            self.drenador.iniciar()
+            if not self.drenador.disponivel:
+                return True
+        with self._cond:
+            self._garantir_thread()
+            limite = time.monotonic() + timeout
+            while len(self._linhas) >= self.max_pending:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                self._cond.notify_all()
+                self._cond.wait(restante)
+            return True
+
+    def pendentes(self):
+        with self._cond:
+            return len(self._linhas)
+
+    def _retirar_lote(self):
+        lote = self._linhas[:self.batch_size]
+        del self._linhas[:self.batch_size]
+        self._primeira_em = time.monotonic() if self._linhas else None
+        # Acorda quem estiver esperando espaço no buffer.
+        self._cond.notify_all()
+        return lote
+
+    def _enviar(self, lote):
+        if self.spool is not None and self.drenador is not None and not self.drenador.disponivel:
+            self.spool.adicionar(lote)
+            return True
+        inicio = time.perf_counter()
+        try:
+            if self.client is None:
+                raise ConnectionError("cliente do InfluxDB não inicializado")
+            self.client.write_points(lote, protocol='line')
+        except Exception as e:
+            logger.error(f"Falha ao gravar {len(lote)} pontos no InfluxDB: {e}")
+            if self.ao_gravar is not None:
+                self.ao_gravar(len(lote), time.perf_counter() - inicio, False)
+            if dados_rejeitados(e):
+                # Lote com dados inválidos: nem o spool nem uma nova tentativa o fariam ser aceito.
+                logger.error(f"{len(lote)} pontos rejeitados pelo InfluxDB e descartados")
+                return True
+            if self.spool is not None:
+                # O lote fica durável no disco e o drenador assume os reenvios.
+                self.spool.adicionar(lote)
+                if self.drenador is not None:
+                    self.drenador.sinalizar_falha(e)
+                return True
+            with self._cond:
+                # Devolve o lote ao início do buffer para a próxima tentativa.
+                self._linhas[:0] = lote
+                if self._primeira_em is None:
+                    self._primeira_em = time.monotonic()
+            return False
+        if self.ao_gravar is not None:
+            self.ao_gravar(len(lote), time.perf_counter() - inicio, True)
+        return True
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._parar:
+                    if len(self._linhas) >= self.batch_size:
+                        break
+                    if self._primeira_em is not None:
+                        restante = self._primeira_em + self.flush_interval - time.monotonic()
+                        if restante <= 0:
+                            break
+                    else:
+                        restante = None
+                    self._cond.wait(restante)
+                if self._parar:
+                    return
+                lote = self._retirar_lote()
+            if not self._enviar(lote):
+                # Evita martelar um InfluxDB fora do ar.
+                time.sleep(self.flush_interval)
+
+    def flush(self):
+        """Envia de forma síncrona tudo o que estiver no buffer."""
+        while True:
+            with self._cond:
+                if not self._linhas:
+                    return True
+                lote = self._retirar_lote()
+            if not self._enviar(lote):
+                return False
+
+    def parar(self):
+        with self._cond:
+            self._parar = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
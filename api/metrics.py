@@ -0,0 +1,373 @@
+# Arquivo: metrics.py
+# Métricas no formato texto do Prometheus para as APIs, sem dependências externas.
+# Cópia idêntica em api/ e ponto-api/ (cada serviço é um contexto de build do Docker);
+# tests/test_metrics_copia.py falha se as duas divergirem.
+#
+# Contadores e histogramas ficam em memória com um lock por métrica; o custo por
+# requisição é uma busca binária e alguns incrementos. Com vários workers do
+# gunicorn, defina METRICS_DIR: cada processo grava um retrato periódico nesse
+# diretório e o /metrics de qualquer worker soma os de todos.
+
+import os
+import json
+import time
+import fcntl
+import bisect
+import logging
+import threading
+
+from flask import Response, g, request, has_app_context
+
+logger = logging.getLogger(__name__)
+
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LIMITES_CONSULTAS = (1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+_SEPARADOR = "\x1f"
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_rotulos(nomes, valores, extra=None):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def _chave(self, rotulos):
+        return tuple(str(rotulos.get(n, "")) for n in self.rotulos)
+
+    def retrato(self):
+        with self._lock:
+            return {_SEPARADOR.join(k): (list(v) if isinstance(v, list) else v) for k, v in self._valores.items()}
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, valor=1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def linhas(self, valores):
+        for chave, valor in sorted(valores.items()):
+            yield f"{self.nome}{_formatar_rotulos(self.rotulos, chave.split(_SEPARADOR) if self.rotulos else ())} {_numero(valor)}"
+
+
+class Histograma(_Metrica):
+    """Contagens por faixa (não acumuladas) + soma; o acúmulo é feito só na exportação."""
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, rotulos=(), limites=LIMITES_LATENCIA):
+        super().__init__(nome, ajuda, rotulos)
+        self.limites = tuple(limites)
+
+    def observar(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        faixa = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            estado = self._valores.get(chave)
+            if estado is None:
+                # [faixa_0, ..., faixa_n (+Inf), soma]
+                estado = self._valores[chave] = [0] * (len(self.limites) + 1) + [0.0]
+            estado[faixa] += 1
+            estado[-1] += valor
+
+    def linhas(self, valores):
+        for chave, estado in sorted(valores.items()):
+            partes = chave.split(_SEPARADOR) if self.rotulos else ()
+            acumulado = 0
+            for limite, contagem in zip(self.limites + (float("inf"),), estado[:-1]):
+                acumulado += contagem
+                le = 'le="%s"' % _numero(limite)
+                yield f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, partes, le)} {acumulado}"
+            yield f"{self.nome}_sum{_formatar_rotulos(self.rotulos, partes)} {_numero(estado[-1])}"
+            yield f"{self.nome}_count{_formatar_rotulos(self.rotulos, partes)} {acumulado}"
+
+
+class Medidor(_Metrica):
+    """Valor instantâneo lido na hora da exportação por uma função (ou definido com set)."""
+    tipo = "gauge"
+
+    def __init__(self, nome, ajuda, funcao=None, rotulos=()):
+        super().__init__(nome, ajuda, rotulos)
+        self.funcao = funcao
+
+    def set(self, valor, **rotulos):
+        with self._lock:
+            self._valores[self._chave(rotulos)] = valor
+
+    def inc(self, valor=1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def retrato(self):
+        if self.funcao is not None:
+            try:
+                valor = self.funcao()
+            except Exception as e:
+                logger.warning(f"Medidor {self.nome} falhou: {e}")
+                return {}
+            return {"": valor} if valor is not None else {}
+        return super().retrato()
+
+    def linhas(self, valores, pid=None):
+        for chave, valor in sorted(valores.items()):
+            partes = chave.split(_SEPARADOR) if self.rotulos else ()
+            extra = 'pid="%s"' % pid if pid else None
+            yield f"{self.nome}{_formatar_rotulos(self.rotulos, partes, extra)} {_numero(valor)}"
+
+
+def _somar(destino, origem):
+    """Soma retratos de contadores/histogramas ({nome: {chave: valor ou lista}})."""
+    for nome, valores in origem.items():
+        alvo = destino.setdefault(nome, {})
+        for chave, valor in valores.items():
+            if isinstance(valor, list):
+                atual = alvo.get(chave)
+                alvo[chave] = [a + b for a, b in zip(atual, valor)] if atual else list(valor)
+            else:
+                alvo[chave] = alvo.get(chave, 0) + valor
+
+
+def _pid_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Registro:
+    def __init__(self, diretorio=None, intervalo=5.0):
+        self.diretorio = diretorio
+        self.intervalo = intervalo
+        self._metricas = []
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def contador(self, nome, ajuda, rotulos=()):
+        return self._registrar(Contador(nome, ajuda, rotulos))
+
+    def histograma(self, nome, ajuda, rotulos=(), limites=LIMITES_LATENCIA):
+        return self._registrar(Histograma(nome, ajuda, rotulos, limites))
+
+    def medidor(self, nome, ajuda, funcao=None, rotulos=()):
+        return self._registrar(Medidor(nome, ajuda, funcao, rotulos))
+
+    # --- Vários processos ---
+    def _cumulativas(self):
+        return {m.nome: m.retrato() for m in self._metricas if m.tipo != "gauge"}
+
+    def _arquivo(self, pid):
+        return os.path.join(self.diretorio, f"{pid}.json")
+
+    def gravar_retrato(self):
+        if not self.diretorio:
+            return
+        dados = {"cumulativas": self._cumulativas(), "medidores": {m.nome: m.retrato() for m in self._metricas if m.tipo == "gauge"}}
+        temporario = self._arquivo(os.getpid()) + ".tmp"
+        with open(temporario, "w") as f:
+            json.dump(dados, f)
+        os.replace(temporario, self._arquivo(os.getpid()))
+
+    def iniciar(self):
+        """Inicia (uma vez por processo) a thread que grava o retrato deste worker."""
+        if not self.diretorio or (self._pid == os.getpid() and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            os.makedirs(self.diretorio, exist_ok=True)
+            self._thread = threading.Thread(target=self._loop, name="metrics-snapshot", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.gravar_retrato()
+            except OSError as e:
+                logger.warning(f"Não foi possível gravar as métricas em {self.diretorio}: {e}")
+
+    def _compactar(self, caminho):
+        """Soma o retrato de um worker encerrado em mortos.json, para o diretório não crescer."""
+        with open(os.path.join(self.diretorio, ".lock"), "a") as trava:
+            fcntl.flock(trava, fcntl.LOCK_EX)
+            if not os.path.exists(caminho):
+                return
+            mortos_caminho = os.path.join(self.diretorio, "mortos.json")
+            mortos = {}
+            if os.path.exists(mortos_caminho):
+                with open(mortos_caminho) as f:
+                    mortos = json.load(f)
+            with open(caminho) as f:
+                _somar(mortos, json.load(f)["cumulativas"])
+            with open(mortos_caminho + ".tmp", "w") as f:
+                json.dump(mortos, f)
+            os.replace(mortos_caminho + ".tmp", mortos_caminho)
+            os.remove(caminho)
+
+    def _outros_processos(self):
+        """Retorna (cumulativas somadas, [(pid, medidores)]) dos outros workers."""
+        cumulativas, medidores = {}, []
+        if not self.diretorio or not os.path.isdir(self.diretorio):
+            return cumulativas, medidores
+        retratos = {}
+        for nome in os.listdir(self.diretorio):
+            if nome.endswith(".json") and nome != "mortos.json" and nome[:-5].isdigit() and int(nome[:-5]) != os.getpid():
+                retratos[int(nome[:-5])] = os.path.join(self.diretorio, nome)
+        # Primeiro os workers encerrados vão para mortos.json, depois tudo é lido.
+        for pid, caminho in list(retratos.items()):
+            if not _pid_vivo(pid):
+                try:
+                    self._compactar(caminho)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Não foi possível compactar {caminho}: {e}")
+                del retratos[pid]
+        mortos = os.path.join(self.diretorio, "mortos.json")
+        if os.path.exists(mortos):
+            try:
+                with open(mortos) as f:
+                    _somar(cumulativas, json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Retrato de métricas {mortos} ignorado: {e}")
+        for pid, caminho in retratos.items():
+            try:
+                with open(caminho) as f:
+                    dados = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Retrato de métricas {caminho} ignorado: {e}")
+                continue
+            _somar(cumulativas, dados["cumulativas"])
+            medidores.append((pid, dados["medidores"]))
+        return cumulativas, medidores
+
+    def exportar(self):
+        cumulativas, outros = self._outros_processos()
+        _somar(cumulativas, self._cumulativas())
+        pid = os.getpid() if self.diretorio else None
+        saida = []
+        for metrica in self._metricas:
+            saida.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+            saida.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            if metrica.tipo == "gauge":
+                saida.extend(metrica.linhas(metrica.retrato(), pid))
+                for outro_pid, medidores in outros:
+                    saida.extend(metrica.linhas(medidores.get(metrica.nome, {}), outro_pid))
+            else:
+                saida.extend(metrica.linhas(cumulativas.get(metrica.nome, {})))
+        return "\n".join(saida) + "\n"
+
+
+def limpar_diretorio(diretorio):
+    """Apaga retratos de execuções anteriores (chamado na subida do gunicorn)."""
+    if not diretorio or not os.path.isdir(diretorio):
+        return
+    for nome in os.listdir(diretorio):
+        if nome.endswith((".json", ".tmp")):
+            os.remove(os.path.join(diretorio, nome))
+
+
+# --- Integração com Flask e SQLAlchemy ---
+def _rota():
+    # A regra (/admin/registros/<int:registro_id>) e não a URL, para não explodir a cardinalidade.
+    return request.url_rule.rule if request.url_rule is not None else "desconhecida"
+
+
+def instrumentar_flask(app, registro, threads=None):
+    """Latência por rota/método/status, requisições em andamento e rota /metrics."""
+    duracao = registro.histograma("http_request_duration_seconds", "Tempo de resposta das requisições",
+                                  ("method", "route", "status"))
+    em_andamento = registro.medidor("http_requests_in_flight", "Requisições sendo atendidas agora")
+    if threads:
+        registro.medidor("http_worker_threads", "Threads de atendimento do processo", lambda: threads)
+
+    @app.before_request
+    def _inicio_metricas():
+        registro.iniciar()
+        g._metricas_inicio = time.perf_counter()
+        em_andamento.inc(1)
+
+    @app.after_request
+    def _fim_metricas(response):
+        inicio = g.pop("_metricas_inicio", None)
+        if inicio is not None:
+            duracao.observar(time.perf_counter() - inicio, method=request.method, route=_rota(), status=response.status_code)
+        return response
+
+    @app.teardown_request
+    def _encerrar_metricas(erro=None):
+        inicio = g.pop("_metricas_inicio", None)
+        if inicio is not None:
+            # Exceção não tratada: o after_request não rodou.
+            duracao.observar(time.perf_counter() - inicio, method=request.method, route=_rota(), status=500)
+        em_andamento.inc(-1)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(registro.exportar(), mimetype="text/plain; version=0.0.4")
+
+    return duracao
+
+
+def _antes_sql(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g._sql_inicio = time.perf_counter()
+
+
+def _depois_sql(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context() and "_sql_inicio" in g:
+        g._sql_consultas = g.get("_sql_consultas", 0) + 1
+        g._sql_tempo = g.get("_sql_tempo", 0.0) + time.perf_counter() - g.pop("_sql_inicio")
+
+
+def instrumentar_sqlalchemy(app, registro):
+    """Quantidade e tempo de comandos SQL por requisição (expõe padrões N+1 por rota)."""
+    # Importado aqui: o network-api usa este mesmo módulo e não tem SQLAlchemy.
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    # Os eventos valem para todos os engines do processo; contains evita contar em dobro
+    # quando a fábrica cria mais de uma aplicação (como nos testes).
+    if not event.contains(Engine, "before_cursor_execute", _antes_sql):
+        event.listen(Engine, "before_cursor_execute", _antes_sql)
+        event.listen(Engine, "after_cursor_execute", _depois_sql)
+    consultas = registro.histograma("db_statements_per_request", "Comandos SQL executados por requisição",
+                                    ("route",), LIMITES_CONSULTAS)
+    tempo = registro.histograma("db_time_per_request_seconds", "Tempo gasto no banco por requisição", ("route",))
+
+    @app.teardown_request
+    def _registrar_sql(erro=None):
+        quantidade = g.pop("_sql_consultas", 0)
+        consultas.observar(quantidade, route=_rota())
+        if quantidade:
+            tempo.observar(g.pop("_sql_tempo", 0.0), route=_rota())
@@ -0,0 +1,192 @@
+# Arquivo: api/retention.py
+# Retenção em camadas e downsampling automático do ping_results.
+# Os dados brutos ficam pouco tempo; continuous queries do InfluxDB 1.8 os resumem
+# em medições de 1 minuto e de 1 hora, guardadas por mais tempo. O /history escolhe
+# a camada mais grossa que ainda atende ao intervalo pedido.
+
+import time
+import threading
+import logging
+from collections import namedtuple
+
+from ingest import MEASUREMENT
+
+logger = logging.getLogger(__name__)
+
+# resolucao_s da camada bruta é o intervalo nominal entre pings de um mesmo alvo.
+Camada = namedtuple("Camada", "nome retention_policy measurement resolucao_s duracao")
+
+
+def duracao_em_segundos(duracao):
+    """Converte durações do InfluxQL ('30d', '12h', 'INF') em segundos (None = infinito)."""
+    if duracao.upper() == "INF" or duracao in ("0", "0s"):
+        return None
+    unidades = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+    return int(duracao[:-1]) * unidades[duracao[-1]]
+
+
+def montar_camadas(raw_rp="autogen", raw_duracao="30d", rp_1m_duracao="180d", rp_1h_duracao="INF"):
+    return [
+        Camada("raw", raw_rp, MEASUREMENT, 5, raw_duracao),
+        Camada("1m", "rp_1m", f"{MEASUREMENT}_1m", 60, rp_1m_duracao),
+        Camada("1h", "rp_1h", f"{MEASUREMENT}_1h", 3600, rp_1h_duracao),
+    ]
+
+
+def _consultas_continuas(database, camadas):
+    """Gera (nome, select, resample) das CQs que alimentam cada camada a partir dos dados brutos."""
+    bruta = camadas[0]
+    origem = f'"{database}"."{bruta.retention_policy}"."{bruta.measurement}"'
+    # Reprocessa uma janela para trás para incluir filas reenviadas pelos agentes com atraso.
+    resample = {"1m": "EVERY 1m FOR 1h", "1h": "EVERY 1h FOR 6h"}
+    consultas = []
+    for camada in camadas[1:]:
+        destino = f'"{database}"."{camada.retention_policy}"."{camada.measurement}"'
+        intervalo = f"{camada.resolucao_s // 60}m" if camada.resolucao_s < 3600 else f"{camada.resolucao_s // 3600}h"
+        # Latência só de pings com sucesso (falhas chegam com latência 0).
+        consultas.append((
+            f"cq_{camada.measurement}_latency",
+            f'SELECT mean("latency_ms") AS "latency_mean", max("latency_ms") AS "latency_max" INTO {destino} '
+            f'FROM {origem} WHERE "success" = 1 GROUP BY time({intervalo}), *',
+            resample[camada.nome],
+        ))
+        consultas.append((
+            f"cq_{camada.measurement}_loss",
+            f'SELECT 1 - mean("success") AS "loss_ratio", count("success") AS "samples" INTO {destino} '
+            f'FROM {origem} GROUP BY time({intervalo}), *',
+            resample[camada.nome],
+        ))
+    return consultas
+
+
+def _duracao_rp(duracao):
+    """Converte a duração devolvida pelo SHOW RETENTION POLICIES ('720h0m0s') em segundos."""
+    total = 0
+    numero = ""
+    for caractere in duracao:
+        if caractere.isdigit():
+            numero += caractere
+        else:
+            total += int(numero or 0) * {"h": 3600, "m": 60, "s": 1}[caractere]
+            numero = ""
+    return total or None
+
+
+def _com_intervalo(select, inicio, fim):
+    """Restringe o SELECT de uma CQ ao intervalo [inicio, fim) em segundos."""
+    filtro = f"time >= {int(inicio)}s AND time < {int(fim)}s"
+    if " WHERE " in select:
+        return select.replace(" GROUP BY ", f" AND {filtro} GROUP BY ", 1)
+    return select.replace(" GROUP BY ", f" WHERE {filtro} GROUP BY ", 1)
+
+
+def backfill_resumos(client, database, camadas, agora=None, passo_s=86400):
+    """Resume nas camadas de 1m e 1h os dados brutos já gravados, um dia por vez.
+
+    As CQs só cobrem dados novos; sem isso, encurtar a retenção dos brutos perderia
+    o histórico antigo. Regravar o mesmo intervalo sobrescreve os mesmos pontos, então
+    uma execução interrompida pode ser repetida.
+    """
+    agora = time.time() if agora is None else agora
+    bruta = camadas[0]
+    origem = f'"{database}"."{bruta.retention_policy}"."{bruta.measurement}"'
+    pontos = list(client.query(f'SELECT first("success") FROM {origem}', database=database, epoch='s').get_points())
+    if not pontos:
+        return
+    mais_antigo = pontos[0]["time"]
+    consultas = _consultas_continuas(database, camadas)
+    for camada in camadas[1:]:
+        retencao = duracao_em_segundos(camada.duracao)
+        # Pontos além da retenção da camada seriam recusados pelo InfluxDB.
+        inicio = mais_antigo if retencao is None else max(mais_antigo, agora - retencao)
+        inicio -= inicio % passo_s
+        while inicio < agora:
+            for nome, select, _ in consultas:
+                if nome.startswith(f"cq_{camada.measurement}_"):
+                    client.query(_com_intervalo(select, inicio, inicio + passo_s), database=database)
+            inicio += passo_s
+        logger.info(f"Backfill de {camada.measurement} concluído")
+
+
+def configurar_retencao(client, database, camadas):
+    """Cria/ajusta as retention policies e as continuous queries (idempotente).
+
+    As camadas de resumo são criadas antes da bruta: se a retenção dos dados brutos
+    for encurtada, o que já existe é resumido nelas (backfill_resumos) antes do ALTER.
+    """
+    client.create_database(database)
+    existentes = {rp["name"]: rp for rp in client.get_list_retention_policies(database)}
+    for camada in camadas[1:] + camadas[:1]:
+        padrao = camada is camadas[0]
+        if camada.retention_policy in existentes:
+            rp = existentes[camada.retention_policy]
+            nova, atual = duracao_em_segundos(camada.duracao), _duracao_rp(rp["duration"])
+            if nova != atual or rp.get("default") != padrao:
+                if padrao and nova is not None and (atual is None or nova < atual):
+                    logger.warning(f"Retenção de {camada.retention_policy} encurtada para {camada.duracao}; "
+                                   f"resumindo os dados existentes antes")
+                    backfill_resumos(client, database, camadas)
+                client.alter_retention_policy(camada.retention_policy, database=database,
+                                              duration=camada.duracao, default=padrao)
+        else:
+            client.create_retention_policy(camada.retention_policy, camada.duracao, 1,
+                                           database=database, default=padrao)
+    cqs_existentes = set()
+    for item in client.get_list_continuous_queries():
+        for cq in item.get(database, []):
+            cqs_existentes.add(cq["name"])
+    for nome, select, resample in _consultas_continuas(database, camadas):
+        if nome not in cqs_existentes:
+            client.create_continuous_query(nome, select, database=database, resample_opts=resample)
+            logger.info(f"Continuous query {nome} criada")
+
+
+def configurar_em_segundo_plano(fabrica_cliente, database, camadas, intervalo=30):
+    """Tenta configurar a retenção até o InfluxDB responder, sem atrasar a subida da API."""
+    def _loop():
+        while True:
+            try:
+                configurar_retencao(fabrica_cliente(), database, camadas)
+                logger.info("Retenção e downsampling do InfluxDB configurados")
+                return
+            except Exception as e:
+                logger.warning(f"Não foi possível configurar a retenção do InfluxDB: {e}")
+                time.sleep(intervalo)
+
+    thread = threading.Thread(target=_loop, name="influx-retention", daemon=True)
+    thread.start()
+    return thread
+
+
+def escolher_camada(camadas, inicio, fim, max_pontos, agora=None):
+    """Escolhe a camada mais fina que cabe em max_pontos por série e ainda guarda o início do intervalo."""
+    agora = time.time() if agora is None else agora
+    for camada in camadas:
+        retencao = duracao_em_segundos(camada.duracao)
+        if retencao is not None and inicio < agora - retencao:
+            continue
+        if (fim - inicio) / camada.resolucao_s <= max_pontos:
+            return camada
+    return camadas[-1]
+
+
+def consultar_historico(client, camada, inicio, fim, employee_id=None, ping_host=None):
+    """Lê uma camada no intervalo [inicio, fim) e agrupa os pontos por série."""
+    filtros = ['time >= $inicio', 'time < $fim']
+    parametros = {
+        "inicio": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(inicio)),
+        "fim": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(fim)),
+    }
+    if employee_id:
+        filtros.append('"employee_id" = $employee_id')
+        parametros["employee_id"] = employee_id
+    if ping_host:
+        filtros.append('"ping_host" = $ping_host')
+        parametros["ping_host"] = ping_host
+    consulta = (f'SELECT * FROM "{camada.retention_policy}"."{camada.measurement}" '
+                f'WHERE {" AND ".join(filtros)} GROUP BY "employee_id", "ping_host"')
+    resultado = client.query(consulta, bind_params=parametros)
+    series = []
+    for (_, tags), pontos in resultado.items():
+        series.append({"employee_id": tags.get("employee_id"), "ping_host": tags.get("ping_host"), "points": list(pontos)})
+    return series
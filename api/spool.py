@@ -0,0 +1,290 @@
+# Arquivo: api/spool.py
+# Fila em disco (write-ahead log segmentado) para quando o InfluxDB está lento ou fora do ar.
+# O /data continua aceitando dados: o que não pode ser gravado vai para segmentos
+# em disco, e um drenador em segundo plano os reenvia com limite de taxa e backoff.
+
+import os
+import time
+import random
+import threading
+import logging
+
+from influxdb.exceptions import InfluxDBClientError
+
+logger = logging.getLogger(__name__)
+
+PREFIXO = "segmento-"
+SUFIXO = ".lp"
+
+
+def dados_rejeitados(erro):
+    """Erro 4xx do InfluxDB por dados inválidos: reenviar o mesmo lote não adianta.
+
+    401/403/404 (credencial ou banco) são tratados como indisponibilidade.
+    """
+    return (isinstance(erro, InfluxDBClientError) and erro.code is not None
+            and 400 <= erro.code < 500 and erro.code not in (401, 403, 404))
+
+
+class Spool:
+    """Log de escrita antecipada em segmentos de texto com uma linha (line protocol) por ponto."""
+
+    def __init__(self, diretorio, segment_bytes=16 * 1024 * 1024, max_bytes=1024 * 1024 * 1024, fsync=False):
+        self.diretorio = diretorio
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._arquivo = None
+        self._arquivo_bytes = 0
+        # Segmento entregue ao drenador; o limite de disco não pode apagá-lo no meio da leitura.
+        self._drenando = None
+        os.makedirs(diretorio, exist_ok=True)
+        segmentos = self._segmentos()
+        self._proximo = self._numero(segmentos[-1]) + 1 if segmentos else 1
+        self._bytes = sum(os.path.getsize(s) for s in segmentos)
+        self._pontos = sum(self._contar_linhas(s) for s in segmentos)
+
+    @staticmethod
+    def _numero(caminho):
+        return int(os.path.basename(caminho)[len(PREFIXO):-len(SUFIXO)])
+
+    @staticmethod
+    def _contar_linhas(caminho):
+        with open(caminho, 'rb') as f:
+            return sum(1 for _ in f)
+
+    def _segmentos(self):
+        nomes = [n for n in os.listdir(self.diretorio) if n.startswith(PREFIXO) and n.endswith(SUFIXO)]
+        return [os.path.join(self.diretorio, n) for n in sorted(nomes)]
+
+    def _fechar_ativo(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+            self._arquivo_bytes = 0
+
+    def adicionar(self, linhas):
+        """Acrescenta linhas ao segmento ativo, abrindo um novo quando ele enche."""
+        if not linhas:
+            return
+        dados = ('\n'.join(linhas) + '\n').encode('utf-8')
+        with self._lock:
+            if self._arquivo is None:
+                caminho = os.path.join(self.diretorio, f"{PREFIXO}{self._proximo:012d}{SUFIXO}")
+                self._proximo += 1
+                self._arquivo = open(caminho, 'ab')
+            self._arquivo.write(dados)
+            self._arquivo.flush()
+            if self.fsync:
+                os.fsync(self._arquivo.fileno())
+            self._arquivo_bytes += len(dados)
+            self._bytes += len(dados)
+            self._pontos += len(linhas)
+            if self._arquivo_bytes >= self.segment_bytes:
+                self._fechar_ativo()
+            self._aplicar_limite()
+
+    def _aplicar_limite(self):
+        # Protege o disco: sem espaço para tudo, os segmentos mais antigos são descartados.
+        ativo = self._arquivo.name if self._arquivo is not None else None
+        while self._bytes > self.max_bytes:
+            descartaveis = [s for s in self._segmentos() if s not in (ativo, self._drenando)]
+            if not descartaveis:
+                return
+            antigo = descartaveis[0]
+            self._bytes -= os.path.getsize(antigo)
+            self._pontos -= self._contar_linhas(antigo)
+            os.remove(antigo)
+            logger.warning(f"Spool acima de {self.max_bytes} bytes, segmento {antigo} descartado")
+
+    def proximo_segmento(self):
+        """Retorna o segmento mais antigo pronto para drenagem (fecha o ativo se for o único)."""
+        with self._lock:
+            segmentos = self._segmentos()
+            if not segmentos:
+                return None
+            if self._arquivo is not None and len(segmentos) == 1:
+                self._fechar_ativo()
+            self._drenando = segmentos[0]
+            return segmentos[0]
+
+    def concluir(self, caminho, pontos, tamanho):
+        """Remove um segmento totalmente drenado; se ele já não existe, as contagens já foram descontadas."""
+        with self._lock:
+            if self._drenando == caminho:
+                self._drenando = None
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                return
+            self._bytes = max(self._bytes - tamanho, 0)
+            self._pontos = max(self._pontos - pontos, 0)
+
+    def status(self):
+        with self._lock:
+            return {"segmentos": len(self._segmentos()), "bytes": self._bytes, "pontos": self._pontos}
+
+
+def ler_lotes(caminho, tamanho_lote, pular=0):
+    """Lê um segmento em lotes, ignorando uma última linha truncada por queda do processo.
+
+    pular descarta as primeiras linhas (já confirmadas em uma tentativa anterior).
+    """
+    lote = []
+    with open(caminho, 'rb') as f:
+        for numero, linha in enumerate(f):
+            if numero < pular:
+                continue
+            if not linha.endswith(b'\n'):
+                logger.warning(f"Linha truncada ignorada em {caminho}")
+                break
+            linha = linha.rstrip(b'\n')
+            if not linha:
+                continue
+            lote.append(linha.decode('utf-8'))
+            if len(lote) >= tamanho_lote:
+                yield lote
+                lote = []
+    if lote:
+        yield lote
+
+
+class Drenador:
+    """Reenvia o conteúdo do spool ao InfluxDB com limite de taxa, reconexão e backoff."""
+
+    def __init__(self, spool, fabrica_cliente, ao_reconectar=None, tamanho_lote=5000,
+                 taxa_max=20000, backoff_inicial=1.0, backoff_max=60.0, intervalo=1.0):
+        self.spool = spool
+        self.fabrica_cliente = fabrica_cliente
+        self.ao_reconectar = ao_reconectar
+        self.tamanho_lote = tamanho_lote
+        self.taxa_max = taxa_max
+        self.backoff_inicial = backoff_inicial
+        self.backoff_max = backoff_max
+        self.intervalo = intervalo
+        self.client = None
+        self.disponivel = True
+        self._backoff = backoff_inicial
+        self._taxa = 0.0
+        self._drenados = 0
+        self._ultimo_erro = None
+        # Progresso dentro do segmento em drenagem, para retomar sem reenviar o que já foi aceito.
+        self._segmento = None
+        self._confirmadas = 0
+        self._evento = threading.Event()
+        self._parar = False
+        self._thread = None
+        self._pid = None
+
+    def iniciar(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._parar = False
+        self._thread = threading.Thread(target=self._loop, name="spool-drainer", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar = True
+        self._evento.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def sinalizar_falha(self, erro=None):
+        """Chamado quando uma escrita direta falha: o drenador assume e entra em backoff."""
+        self.disponivel = False
+        self._ultimo_erro = str(erro) if erro else self._ultimo_erro
+        self._evento.set()
+
+    def status(self):
+        return dict(self.spool.status(), influx_disponivel=self.disponivel, backoff_s=round(self._backoff, 1),
+                    taxa_drenagem_pps=round(self._taxa, 1), pontos_drenados=self._drenados,
+                    ultimo_erro=self._ultimo_erro)
+
+    def _reconectar(self):
+        try:
+            self.client = self.fabrica_cliente()
+            if self.ao_reconectar is not None:
+                self.ao_reconectar(self.client)
+        except Exception as e:
+            logger.error(f"Não foi possível recriar o cliente do InfluxDB: {e}")
+            self.client = None
+
+    def _esperar_backoff(self):
+        # Jitter evita que várias instâncias voltem exatamente ao mesmo tempo.
+        self._evento.wait(self._backoff * random.uniform(0.5, 1.0))
+        self._evento.clear()
+        self._backoff = min(self._backoff * 2, self.backoff_max)
+
+    def _falhou(self, erro):
+        logger.error(f"Drenagem do spool falhou: {erro}")
+        self.disponivel = False
+        self._ultimo_erro = str(erro)
+        self._taxa = 0.0
+        self._reconectar()
+
+    def _sucesso(self):
+        self.disponivel = True
+        self._backoff = self.backoff_inicial
+
+    def _verificar(self):
+        """Testa o InfluxDB enquanto ele estiver marcado como indisponível."""
+        try:
+            if self.client is None:
+                raise ConnectionError("cliente do InfluxDB não inicializado")
+            self.client.ping()
+        except Exception as e:
+            self._falhou(e)
+            return False
+        self._sucesso()
+        return True
+
+    def _drenar_segmento(self, caminho):
+        tamanho = os.path.getsize(caminho)
+        if caminho != self._segmento:
+            self._segmento = caminho
+            self._confirmadas = 0
+        pontos = 0
+        inicio = time.monotonic()
+        for lote in ler_lotes(caminho, self.tamanho_lote, pular=self._confirmadas):
+            if self._parar:
+                return False
+            t0 = time.monotonic()
+            try:
+                self.client.write_points(lote, protocol='line')
+            except Exception as e:
+                if not dados_rejeitados(e):
+                    self._falhou(e)
+                    return False
+                logger.error(f"{len(lote)} pontos rejeitados pelo InfluxDB e descartados: {e}")
+            else:
+                self._sucesso()
+                self._drenados += len(lote)
+            pontos += len(lote)
+            self._confirmadas += len(lote)
+            decorrido = time.monotonic() - inicio
+            self._taxa = pontos / decorrido if decorrido > 0 else 0.0
+            # Limite de taxa para não derrubar um InfluxDB que acabou de voltar.
+            pausa = len(lote) / self.taxa_max - (time.monotonic() - t0)
+            if pausa > 0:
+                time.sleep(pausa)
+        self.spool.concluir(caminho, self._confirmadas, tamanho)
+        self._segmento = None
+        self._confirmadas = 0
+        return True
+
+    def _loop(self):
+        self._reconectar()
+        while not self._parar:
+            if not self.disponivel and not self._verificar():
+                self._esperar_backoff()
+                continue
+            caminho = self.spool.proximo_segmento()
+            if caminho is None:
+                self._taxa = 0.0
+                self._evento.wait(self.intervalo)
+                self._evento.clear()
+                continue
+            if not self._drenar_segmento(caminho):
+                self._esperar_backoff()
@@ -0,0 +1,147 @@
+# Arquivo: api/stats.py
+# Estatísticas de latência e perda em janelas deslizantes, mantidas em memória.
+# Cada série (employee_id, ping_host) guarda um anel de fatias de tempo; cada fatia
+# tem um histograma de latência com faixas fixas e contadores de sucesso/falha.
+# Assim o /stats responde sem consultar o InfluxDB.
+
+import time
+import threading
+from array import array
+from datetime import datetime, timezone
+
+# Limites superiores (ms) das faixas do histograma; a última faixa é "acima de 5000 ms".
+LIMITES_MS = (1, 2, 5, 10, 15, 20, 30, 40, 50, 75, 100, 150, 200, 300, 500, 750, 1000, 2000, 5000)
+NUM_FAIXAS = len(LIMITES_MS) + 1
+
+
+def _faixa(latency_ms):
+    for i, limite in enumerate(LIMITES_MS):
+        if latency_ms <= limite:
+            return i
+    return len(LIMITES_MS)
+
+
+def percentil(histograma, p):
+    """Estima o percentil p (0-100) interpolando dentro da faixa do histograma."""
+    total = sum(histograma)
+    if not total:
+        return None
+    alvo = total * p / 100.0
+    acumulado = 0
+    for i, contagem in enumerate(histograma):
+        if contagem and acumulado + contagem >= alvo:
+            inferior = LIMITES_MS[i - 1] if i > 0 else 0
+            if i == len(LIMITES_MS):
+                return float(inferior)
+            superior = LIMITES_MS[i]
+            return inferior + (superior - inferior) * (alvo - acumulado) / contagem
+        acumulado += contagem
+    return float(LIMITES_MS[-1])
+
+
+class _Serie:
+    __slots__ = ("fatias", "sucessos", "falhas", "histogramas", "ultimo_visto")
+
+    def __init__(self, num_fatias):
+        self.fatias = array('q', [-1] * num_fatias)
+        self.sucessos = array('I', [0] * num_fatias)
+        self.falhas = array('I', [0] * num_fatias)
+        self.histogramas = array('I', [0] * (num_fatias * NUM_FAIXAS))
+        self.ultimo_visto = 0.0
+
+
+class SlidingStats:
+    """Agrega pings por (employee_id, ping_host) em uma janela deslizante de tamanho fixo."""
+
+    def __init__(self, janela_s=300, fatia_s=10, expiracao_s=3600):
+        self.fatia_s = fatia_s
+        self.num_fatias = max(1, int(janela_s // fatia_s))
+        self.janela_s = self.num_fatias * fatia_s
+        self.expiracao_s = expiracao_s
+        self._series = {}
+        self._proxima_limpeza = 0.0
+        self._lock = threading.Lock()
+
+    def observar(self, pings, agora=None):
+        """Registra pings no formato (employee_id, ping_host, latency_ms, success, timestamp_ns)."""
+        agora = time.time() if agora is None else agora
+        limite = agora - self.janela_s
+        with self._lock:
+            if agora >= self._proxima_limpeza:
+                # Sem depender do /stats: séries de agentes desativados não ficam para sempre.
+                self._expirar(agora)
+            for employee_id, ping_host, latency_ms, success, timestamp_ns in pings:
+                # Pontos de reenvio mais antigos que a janela não afetam o tempo real.
+                ts = min(timestamp_ns / 1e9, agora)
+                if ts <= limite:
+                    continue
+                chave = (employee_id, ping_host)
+                serie = self._series.get(chave)
+                if serie is None:
+                    serie = self._series[chave] = _Serie(self.num_fatias)
+                indice = int(ts // self.fatia_s)
+                pos = indice % self.num_fatias
+                if serie.fatias[pos] != indice:
+                    # A fatia pertence a uma volta anterior do anel: recomeça do zero.
+                    serie.fatias[pos] = indice
+                    serie.sucessos[pos] = 0
+                    serie.falhas[pos] = 0
+                    base = pos * NUM_FAIXAS
+                    for i in range(base, base + NUM_FAIXAS):
+                        serie.histogramas[i] = 0
+                if success:
+                    serie.sucessos[pos] += 1
+                    serie.histogramas[pos * NUM_FAIXAS + _faixa(latency_ms)] += 1
+                else:
+                    serie.falhas[pos] += 1
+                if ts > serie.ultimo_visto:
+                    serie.ultimo_visto = ts
+
+    def _expirar(self, agora):
+        for chave in [c for c, s in self._series.items() if agora - s.ultimo_visto > self.expiracao_s]:
+            del self._series[chave]
+        self._proxima_limpeza = agora + min(self.expiracao_s, 3600)
+
+    def janela_efetiva(self, janela_s=None):
+        """Janela realmente usada: arredondada para cima em fatias e limitada à janela em memória."""
+        if janela_s is None:
+            return self.janela_s
+        return min(max(1, int(-(-janela_s // self.fatia_s))) * self.fatia_s, self.janela_s)
+
+    def consultar(self, janela_s=None, employee_id=None, ping_host=None, percentis=(50, 95, 99), agora=None):
+        """Resume cada série na janela pedida (ver janela_efetiva)."""
+        agora = time.time() if agora is None else agora
+        indice_atual = int(agora // self.fatia_s)
+        primeiro_indice = indice_atual - self.janela_efetiva(janela_s) // self.fatia_s + 1
+        resultado = []
+        with self._lock:
+            self._expirar(agora)
+            for (emp, host), serie in self._series.items():
+                if employee_id is not None and emp != employee_id:
+                    continue
+                if ping_host is not None and host != ping_host:
+                    continue
+                sucessos = falhas = 0
+                histograma = [0] * NUM_FAIXAS
+                for pos in range(self.num_fatias):
+                    if not primeiro_indice <= serie.fatias[pos] <= indice_atual:
+                        continue
+                    sucessos += serie.sucessos[pos]
+                    falhas += serie.falhas[pos]
+                    base = pos * NUM_FAIXAS
+                    for i in range(NUM_FAIXAS):
+                        histograma[i] += serie.histogramas[base + i]
+                total = sucessos + falhas
+                item = {
+                    "employee_id": emp,
+                    "ping_host": host,
+                    "samples": total,
+                    "failures": falhas,
+                    "loss_rate": round(falhas / total, 4) if total else None,
+                    "last_seen": datetime.fromtimestamp(serie.ultimo_visto, timezone.utc).isoformat(),
+                }
+                for p in percentis:
+                    valor = percentil(histograma, p)
+                    item[f"p{p:g}_ms"] = round(valor, 1) if valor is not None else None
+                resultado.append(item)
+        return resultado
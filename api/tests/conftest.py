@@ -0,0 +1,68 @@
+import os
+import tempfile
+import threading
+import pytest
+from influxdb.resultset import ResultSet
+
+# O spool dos testes fica em um diretório temporário, nunca no da aplicação.
+os.environ.setdefault('SPOOL_DIR', tempfile.mkdtemp(prefix='network-api-spool-'))
+# Sem InfluxDB real nos testes: a configuração de retenção é testada à parte.
+os.environ.setdefault('RETENTION_MANAGE', '0')
+
+import app as network_api
+
+
+class FakeInflux:
+    """Substituto do InfluxDBClient que apenas guarda as escritas recebidas."""
+
+    def __init__(self):
+        self.escritas = []
+        self.falhar = False
+        self.pings = 0
+        self.consultas = []
+        self.resultado = {}
+        self.lock = threading.Lock()
+
+    def write_points(self, points, protocol='json', **kwargs):
+        if self.falhar:
+            raise ConnectionError("InfluxDB fora do ar")
+        with self.lock:
+            self.escritas.append(list(points))
+        return True
+
+    def ping(self):
+        self.pings += 1
+        if self.falhar:
+            raise ConnectionError("InfluxDB fora do ar")
+        return "1.8"
+
+    def query(self, query, bind_params=None, **kwargs):
+        self.consultas.append((query, bind_params))
+        return ResultSet(self.resultado)
+
+    def linhas(self):
+        with self.lock:
+            return [linha for lote in self.escritas for linha in lote]
+
+
+@pytest.fixture
+def fake_influx():
+    """Troca o cliente do InfluxDB da aplicação por um falso durante o teste."""
+    fake = FakeInflux()
+    drenador = network_api.drenador
+    original = network_api.writer.client, drenador.fabrica_cliente
+    network_api.writer.client = fake
+    drenador.client = fake
+    drenador.fabrica_cliente = lambda: fake
+    drenador.disponivel = True
+    yield fake
+    fake.falhar = False
+    network_api.writer.flush()
+    network_api.writer.client, drenador.fabrica_cliente = original
+
+
+@pytest.fixture
+def test_client(fake_influx):
+    """Cria um cliente de teste para fazer requisições à API."""
+    network_api.app.config['TESTING'] = True
+    return network_api.app.test_client()
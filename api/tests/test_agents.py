@@ -0,0 +1,92 @@
+import time
+
+from agents import AgentRegistry
+
+
+def _ping(emp, host, ts, latency=20, success=1):
+    return (emp, host, latency, success, int(ts * 1e9))
+
+
+def test_classificacao_e_expiracao():
+    """Testa online/stale/offline pelo último contato e a remoção de agentes parados."""
+    registro = AgentRegistry(online_s=60, offline_s=600, expiracao_s=3600)
+    agora = 1_000_000.0
+    registro.observar([_ping("ana", "8.8.8.8", agora)], agora=agora)
+    registro.observar([_ping("bia", "8.8.8.8", agora - 300)], agora=agora - 300)
+    registro.observar([_ping("caio", "8.8.8.8", agora - 1200)], agora=agora - 1200)
+
+    resultado = registro.consultar(agora=agora)
+    assert resultado["counts"] == {"online": 1, "stale": 1, "offline": 1}
+    assert [(a["employee_id"], a["status"]) for a in resultado["agents"]] == [("ana", "online"), ("bia", "stale"), ("caio", "offline")]
+    assert [a["employee_id"] for a in registro.consultar(status="stale", agora=agora)["agents"]] == ["bia"]
+    assert registro.contar("online", agora=agora) == 1
+    assert registro.consultar(agora=agora + 3400)["counts"] == {"online": 0, "stale": 0, "offline": 1}
+
+
+def test_alvos_taxa_e_reenvio_contado_por_requisicao():
+    """Testa alvos recentes, taxa de envio e um reenvio em vários lotes contado uma vez."""
+    registro = AgentRegistry(online_s=60, offline_s=600, tau_s=60, reenvio_idade_s=120)
+    agora = 1_000_000.0
+    for i in range(10):
+        registro.observar([_ping("ana", "8.8.8.8", agora - 60 + i * 6), _ping("ana", "1.1.1.1", agora - 60 + i * 6)], agora=agora - 60 + i * 6)
+    envio = set()
+    for lote in range(3):
+        registro.observar([_ping("ana", "8.8.8.8", agora - 3600 + lote * 10 + i) for i in range(5)], envio=envio, agora=agora)
+
+    [ana] = registro.consultar(agora=agora)["agents"]
+    assert ana["targets"] == ["1.1.1.1", "8.8.8.8"]
+    assert ana["sends"] == 11
+    assert ana["replays"] == 1
+    assert ana["replayed_points"] == 15
+    assert ana["points"] == 35
+    assert ana["last_point"].startswith("1970-01-12T13:46:34")
+    assert 5 < ana["sends_per_minute"] < 11
+
+    # O alvo que parou de aparecer sai da lista depois de offline_s.
+    registro.observar([_ping("ana", "8.8.8.8", agora + 700)], agora=agora + 700)
+    assert registro.consultar(agora=agora + 700)["agents"][0]["targets"] == ["8.8.8.8"]
+
+
+def test_retrato_sobrevive_ao_reinicio(tmp_path):
+    """Testa se o retrato gravado em disco restaura a frota em um registro novo."""
+    caminho = str(tmp_path / "agents.json")
+    registro = AgentRegistry(caminho_retrato=caminho, intervalo_retrato_s=3600)
+    agora = time.time()
+    registro.observar([_ping("ana", "8.8.8.8", agora), _ping("bia", "8.8.8.8", agora - 3600)], agora=agora)
+    registro.parar()
+
+    novo = AgentRegistry(caminho_retrato=caminho)
+    assert novo.carregar() == 2
+    [ana, bia] = novo.consultar(agora=agora)["agents"]
+    assert ana["status"] == "online" and ana["points"] == 1
+    assert bia["replays"] == 1
+
+    (tmp_path / "agents.json").write_text("{corrompido")
+    assert AgentRegistry(caminho_retrato=caminho).carregar() == 0
+
+
+def test_endpoint_agents(test_client, fake_influx):
+    """Testa o /agents alimentado pelo /data, sem consultar o InfluxDB."""
+    agora_ms = int(time.time() * 1000)
+    payload = f"agente-x,8.8.4.4,30,1,{agora_ms}\nagente-x,1.1.1.1,40,1,{agora_ms}\n"
+    assert test_client.post('/data', data=payload, content_type='text/csv').status_code == 202
+
+    response = test_client.get('/agents?status=online')
+    assert response.status_code == 200
+    dados = response.get_json()
+    agente = next(a for a in dados["agents"] if a["employee_id"] == "agente-x")
+    assert agente["targets"] == ["1.1.1.1", "8.8.4.4"]
+    assert agente["sends"] == 1
+    assert dados["counts"]["online"] >= 1
+    assert fake_influx.consultas == []
+
+    assert test_client.get('/agents?status=perdido').status_code == 400
+
+
+def test_observar_remove_agentes_expirados_sem_consulta():
+    """Testa se agentes parados saem da memória mesmo que o /agents nunca seja consultado."""
+    registro = AgentRegistry(expiracao_s=3600)
+    agora = 1_000_000.0
+    registro.observar([_ping(f"func{i}", "8.8.8.8", agora) for i in range(100)], agora=agora)
+    registro.observar([_ping("ana", "8.8.8.8", agora + 4000)], agora=agora + 4000)
+    assert list(registro._agentes) == ["ana"]
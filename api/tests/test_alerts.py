@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+from alerts import AlertEngine, Alerta, TelegramNotifier, formatar_mensagem
+
+
+def _ping(emp, host, latency, success, ts):
+    return (emp, host, latency, success, int(ts * 1e9))
+
+
+@pytest.fixture
+def telegram_local():
+    """Sobe um servidor HTTP local no lugar da API do Telegram e guarda as mensagens."""
+    mensagens = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            corpo = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+            mensagens.append((self.path, parse_qs(corpo)))
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({"ok": True}).encode('utf-8'))
+
+        def log_message(self, *args):
+            pass
+
+    servidor = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{servidor.server_port}", mensagens
+    servidor.shutdown()
+
+
+def test_perda_consecutiva_dispara_uma_vez_e_resolve_apos_carencia():
+    """Testa deduplicação, histerese e carência da regra de perda por série."""
+    recebidos = []
+    motor = AlertEngine(recebidos.append, perda_percentual=50, janela_perda=4, carencia_s=60, min_funcionarios=99)
+    agora = 1000.0
+    motor.avaliar([_ping("joao", "h", 0, 0, agora)] * 4, agora=agora)
+    motor.avaliar([_ping("joao", "h", 0, 0, agora)] * 4, agora=agora)
+    assert [(a.regra, a.estado) for a in recebidos] == [("perda", "disparado")]
+
+    # Recupera e volta a falhar dentro da carência: nenhuma mensagem nova.
+    motor.avaliar([_ping("joao", "h", 10, 1, agora + 1)] * 4, agora=agora + 1)
+    motor.avaliar([_ping("joao", "h", 0, 0, agora + 2)] * 4, agora=agora + 2)
+    assert len(recebidos) == 1
+
+    motor.avaliar([_ping("joao", "h", 10, 1, agora + 3)] * 4, agora=agora + 3)
+    motor.avaliar([_ping("joao", "h", 10, 1, agora + 70)], agora=agora + 70)
+    assert [(a.regra, a.estado) for a in recebidos] == [("perda", "disparado"), ("perda", "resolvido")]
+
+
+def test_reenvio_antigo_nao_gera_alerta():
+    """Testa se dados de uma fila reenviada, já antigos, são ignorados pelo motor."""
+    recebidos = []
+    motor = AlertEngine(recebidos.append, janela_perda=4)
+    motor.avaliar([_ping("joao", "h", 0, 0, 100.0)] * 10, agora=10000.0)
+    assert recebidos == []
+
+
+def test_incidente_de_site_agrupa_funcionarios():
+    """Testa se vários funcionários degradados no mesmo alvo viram um único incidente."""
+    recebidos = []
+    motor = AlertEngine(recebidos.append, janela_perda=4, latencia_ms=200, latencia_consecutiva=2, min_funcionarios=3)
+    agora = 1000.0
+    pings = [_ping(f"func{i}", "8.8.8.8", 0, 0, agora) for i in range(4) for _ in range(4)]
+    motor.avaliar(pings, agora=agora)
+
+    sites = [a for a in recebidos if a.regra == "site"]
+    assert len(sites) == 1 and sites[0].estado == "disparado"
+    texto = formatar_mensagem(recebidos)
+    assert texto.count("\n") == 0
+    assert "[INCIDENTE] alvo 8.8.8.8" in texto
+
+
+def test_formatar_mensagem_sem_incidente():
+    """Testa a mensagem de alertas individuais."""
+    texto = formatar_mensagem([Alerta("perda", "disparado", "joao", "h", "perda de 80%", False),
+                               Alerta("perda", "resolvido", "maria", "h2", "perda de 0%", False)])
+    assert texto == "[ALERTA] joao -> h: perda de 80%\n[RESOLVIDO] maria -> h2: perda de 0%"
+
+
+def test_notifier_envia_agrupado_sem_bloquear(telegram_local):
+    """Testa o envio assíncrono para o stand-in local da API de chat."""
+    url, mensagens = telegram_local
+    notifier = TelegramNotifier("TOKEN", "123", api_url=url, agrupamento_s=0.2)
+    inicio = time.monotonic()
+    notifier(Alerta("perda", "disparado", "joao", "h", "perda de 80%", False))
+    notifier(Alerta("perda", "disparado", "maria", "h", "perda de 90%", False))
+    assert time.monotonic() - inicio < 0.1
+    notifier.parar()
+
+    assert len(mensagens) == 1
+    caminho, dados = mensagens[0]
+    assert caminho == "/botTOKEN/sendMessage"
+    assert dados["chat_id"] == ["123"]
+    assert "joao" in dados["text"][0] and "maria" in dados["text"][0]
+
+
+def test_notifier_desabilitado_sem_token():
+    """Testa se sem TELEGRAM_BOT_TOKEN/CHAT_ID nada é enviado."""
+    notifier = TelegramNotifier(None, None)
+    notifier(Alerta("perda", "disparado", "joao", "h", "x", False))
+    assert notifier._thread is None
+
+
+def test_notifier_parar_envia_pendentes_sem_esperar_agrupamento(telegram_local):
+    """Testa se alertas na janela de agrupamento são enviados no encerramento, sem esperar a janela."""
+    url, mensagens = telegram_local
+    notifier = TelegramNotifier("TOKEN", "123", api_url=url, agrupamento_s=30, timeout=1)
+    notifier(Alerta("perda", "disparado", "joao", "h", "perda de 80%", False))
+    notifier(Alerta("perda", "disparado", "maria", "h", "perda de 90%", False))
+    inicio = time.monotonic()
+    notifier.parar()
+    assert time.monotonic() - inicio < 5
+    assert len(mensagens) == 1
+    assert "joao" in mensagens[0][1]["text"][0] and "maria" in mensagens[0][1]["text"][0]
+
+
+def test_estado_de_series_paradas_expira():
+    """Testa se séries e funcionários degradados que pararam de enviar são esquecidos, resolvendo o alerta aberto."""
+    recebidos = []
+    motor = AlertEngine(recebidos.append, janela_perda=4, carencia_s=0, latencia_consecutiva=2, min_funcionarios=99, expira_s=100)
+    agora = 1000.0
+    motor.avaliar([_ping("joao", "h", 0, 0, agora)] * 4, agora=agora)
+    assert motor.ativos() == [("perda", "joao", "h")]
+
+    motor.avaliar([_ping("maria", "h2", 10, 1, agora + 200)], agora=agora + 200)
+    assert list(motor._series) == [("maria", "h2")]
+    assert motor._degradados == {}
+    assert motor.ativos() == []
+    assert [(a.employee_id, a.estado) for a in recebidos] == [("joao", "disparado"), ("joao", "resolvido")]
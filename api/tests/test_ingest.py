@@ -0,0 +1,161 @@
+import io
+import gzip
+import time
+
+import app as network_api
+from ingest import BufferedWriter, iterar_linhas, linha_ping, _blocos, MAX_LINHA
+
+
+def test_data_enfileira_e_grava_em_lote(test_client, fake_influx):
+    """Testa se o /data responde sem esperar o InfluxDB e grava em line protocol."""
+    payload = "joao.silva,8.8.8.8,23,1\njoao.silva,187.33.93.122,0,0\n"
+    response = test_client.post('/data', data=payload, content_type='text/csv')
+    assert response.status_code == 202
+    assert response.get_json()['points_received'] == 2
+
+    network_api.writer.flush()
+    linhas = fake_influx.linhas()
+    assert len(linhas) == 2
+    assert linhas[0].startswith("ping_results,employee_id=joao.silva,ping_host=8.8.8.8 latency_ms=23i,success=1i ")
+    assert linhas[1].startswith("ping_results,employee_id=joao.silva,ping_host=187.33.93.122 latency_ms=0i,success=0i ")
+
+
+def test_data_linha_invalida(test_client, fake_influx):
+    """Testa se uma linha fora do formato é rejeitada sem enfileirar nada."""
+    response = test_client.post('/data', data="joao.silva,8.8.8.8,23\n", content_type='text/csv')
+    assert response.status_code == 400
+    network_api.writer.flush()
+    assert fake_influx.linhas() == []
+
+
+def test_linha_ping_escapa_tags():
+    """Testa o escape de espaços, vírgulas e sinais de igual nas tags."""
+    linha = linha_ping("maria souza", "a,b=c", 10, 1, 123)
+    assert linha == "ping_results,employee_id=maria\\ souza,ping_host=a\\,b\\=c latency_ms=10i,success=1i 123"
+
+
+def test_buffer_agrupa_varias_requisicoes(fake_influx):
+    """Testa se pontos de várias chamadas saem em poucas escritas, por tamanho de lote."""
+    writer = BufferedWriter(fake_influx, batch_size=100, flush_interval=60)
+    for i in range(250):
+        writer.adicionar([linha_ping("e", "h", i, 1, i)])
+    writer.parar()
+    assert [len(lote) for lote in fake_influx.escritas] == [100, 100, 50]
+
+
+def test_buffer_mantem_pontos_quando_influx_falha(fake_influx):
+    """Testa se um lote que falhou volta ao buffer e é gravado depois."""
+    writer = BufferedWriter(fake_influx, batch_size=10, flush_interval=60)
+    writer.adicionar([linha_ping("e", "h", 1, 1, 1)])
+    fake_influx.falhar = True
+    assert writer.flush() is False
+    assert writer.pendentes() == 1
+    fake_influx.falhar = False
+    assert writer.flush() is True
+    assert len(fake_influx.linhas()) == 1
+
+
+def test_esperar_espaco_no_buffer(fake_influx):
+    """Testa se a espera por espaço desiste no timeout e volta a aceitar depois do flush."""
+    writer = BufferedWriter(fake_influx, batch_size=10, flush_interval=60, max_pending=3)
+    writer.adicionar([linha_ping("e", "h", i, 1, i) for i in range(3)])
+    inicio = time.monotonic()
+    assert writer.esperar_espaco(0.05) is False
+    assert time.monotonic() - inicio < 1
+    assert writer.flush() is True
+    assert writer.esperar_espaco(0) is True
+    writer.parar()
+
+
+def test_data_responde_503_com_buffer_cheio(test_client, fake_influx, monkeypatch):
+    """Testa se o /data recusa o envio com Retry-After, sem aceitar pontos, quando o buffer não esvazia."""
+    monkeypatch.setattr(network_api, 'INGEST_BACKPRESSURE_TIMEOUT', 0.05)
+    monkeypatch.setattr(network_api.writer, 'max_pending', 0)
+    response = test_client.post('/data', data="maria,8.8.8.8,10,1\n", content_type='text/csv')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(network_api.INGEST_RETRY_AFTER)
+    assert network_api.writer.pendentes() == 0
+
+
+def test_data_preserva_timestamp_do_agente(test_client, fake_influx):
+    """Testa se a coluna opcional de timestamp (epoch em ms ou ISO-8601) é respeitada."""
+    payload = "joao.silva,8.8.8.8,23,1,1760781600000\njoao.silva,8.8.8.8,25,1,2025-10-18T10:00:01Z\n"
+    response = test_client.post('/data', data=payload, content_type='text/csv')
+    assert response.status_code == 202
+
+    network_api.writer.flush()
+    linhas = fake_influx.linhas()
+    assert linhas[0].endswith(" 1760781600000000000")
+    assert linhas[1].endswith(" 1760781601000000000")
+
+
+def test_data_linhas_sem_timestamp_viram_pontos_distintos(test_client, fake_influx):
+    """Testa se N linhas sem timestamp da mesma série geram N pontos (horários distintos) no InfluxDB."""
+    payload = "joao,8.8.8.8,20,1\n" * 3
+    assert test_client.post('/data', data=payload, content_type='text/csv').status_code == 202
+    network_api.writer.flush()
+    horarios = {linha.rsplit(" ", 1)[1] for linha in fake_influx.linhas() if linha.startswith("ping_results,employee_id=joao,")}
+    assert len(horarios) == 3
+
+
+def test_data_aceita_gzip_em_lotes(test_client, fake_influx, monkeypatch):
+    """Testa o reenvio de uma fila grande comprimida, lida em blocos e gravada em lotes."""
+    monkeypatch.setattr(network_api, 'INGEST_BATCH_SIZE', 500)
+    linhas = "".join(f"joao.silva,8.8.8.8,{i % 100},1,{1760781600 + i}\n" for i in range(3000))
+    corpo = gzip.compress(linhas.encode('utf-8'))
+    response = test_client.post('/data', data=corpo, content_type='text/csv', headers={'Content-Encoding': 'gzip'})
+    assert response.status_code == 202
+    assert response.get_json()['points_received'] == 3000
+
+    network_api.writer.flush()
+    assert len(fake_influx.linhas()) == 3000
+
+
+def test_data_ignora_linhas_invalidas(test_client, fake_influx):
+    """Testa se linhas quebradas não impedem a gravação das válidas."""
+    payload = "joao.silva,8.8.8.8,23,1\nlixo\njoao.silva,8.8.8.8,abc,1\n"
+    response = test_client.post('/data', data=payload, content_type='text/csv')
+    assert response.status_code == 202
+    assert response.get_json() == {"status": "success", "points_received": 1, "invalid_lines": 2}
+
+
+def test_iterar_linhas_em_blocos_pequenos():
+    """Testa se linhas partidas entre blocos são remontadas corretamente."""
+    stream = io.BytesIO(gzip.compress(b"a,b,1,1\nc,d,2,0\ne,f,3,1"))
+    assert list(iterar_linhas(stream, gzip=True, chunk_size=3)) == ["a,b,1,1", "c,d,2,0", "e,f,3,1"]
+
+
+def test_health(test_client):
+    """Testa se a API fica pronta com o spool gravável, sem depender do InfluxDB."""
+    assert test_client.get('/health/live').status_code == 200
+    response = test_client.get('/health/ready')
+    assert response.status_code == 200
+    assert response.get_json()["spool_writable"] is True
+
+
+def test_metrics(test_client, fake_influx):
+    """Testa se o /metrics expõe a latência por rota e o tamanho dos lotes gravados no InfluxDB."""
+    test_client.post('/data', data="joao.silva,8.8.8.8,23,1\nlixo\n", content_type='text/csv')
+    network_api.writer.flush()
+    texto = test_client.get('/metrics').get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{method="POST",route="/data",status="202"}' in texto
+    assert 'influx_write_duration_seconds_count{result="ok"}' in texto
+    assert 'influx_write_batch_points_bucket{le="10"}' in texto
+    assert 'influx_buffer_pending_points 0' in texto
+
+
+def test_data_rejeita_timestamp_fora_da_faixa(test_client, fake_influx):
+    """Testa se inf, nan e horários fora do int64 em ns do InfluxDB contam como linhas inválidas."""
+    payload = "joao,8.8.8.8,20,1,inf\njoao,8.8.8.8,20,1,nan\njoao,8.8.8.8,20,1,1e30\njoao,8.8.8.8,20,1,9999-01-01T00:00:00\njoao,8.8.8.8,20,1,1760781600\n"
+    response = test_client.post('/data', data=payload, content_type='text/csv')
+    assert response.status_code == 202
+    assert response.get_json() == {"status": "success", "points_received": 1, "invalid_lines": 4}
+
+
+def test_iterar_linhas_limita_gzip_bomb_e_linha_longa():
+    """Testa se a descompressão sai em blocos limitados e se uma linha enorme é rejeitada sem acumular memória."""
+    corpo = gzip.compress(b"a" * 5_000_000 + b"\njoao,8.8.8.8,20,1\n")
+    assert max(len(b) for b in _blocos(io.BytesIO(corpo), True, 1024)) <= 1024
+    linhas = list(iterar_linhas(io.BytesIO(corpo), gzip=True, chunk_size=1024))
+    assert [len(l) for l in linhas] == [MAX_LINHA + 1, len("joao,8.8.8.8,20,1")]
+    assert linhas[1] == "joao,8.8.8.8,20,1"
@@ -0,0 +1,14 @@
+import os
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+COPIAS = [os.path.join(RAIZ, servico, 'metrics.py') for servico in ('api', 'ponto-api')]
+
+
+def test_metrics_identico_nos_dois_servicos():
+    """Testa se api/metrics.py e ponto-api/metrics.py continuam sendo a mesma cópia."""
+    if not all(os.path.exists(c) for c in COPIAS):
+        pytest.skip("Só um dos serviços está disponível (ex.: dentro da imagem Docker).")
+    with open(COPIAS[0], 'rb') as a, open(COPIAS[1], 'rb') as b:
+        assert a.read() == b.read(), "Altere api/metrics.py e ponto-api/metrics.py juntos."
@@ -0,0 +1,128 @@
+import time
+
+from influxdb.resultset import ResultSet
+
+from retention import (montar_camadas, configurar_retencao, escolher_camada, duracao_em_segundos,
+                       _duracao_rp, _consultas_continuas)
+
+
+class ClienteAdmin:
+    """Cliente falso que registra os comandos administrativos enviados ao InfluxDB."""
+
+    def __init__(self, rps, cqs, mais_antigo=None):
+        self.rps = rps
+        self.cqs = cqs
+        self.mais_antigo = mais_antigo
+        self.comandos = []
+
+    def query(self, consulta, **kwargs):
+        if consulta.startswith('SELECT first('):
+            valores = [[self.mais_antigo, 1]] if self.mais_antigo is not None else []
+            return ResultSet({"series": [{"name": "ping_results", "columns": ["time", "first"], "values": valores}]})
+        self.comandos.append(("query", consulta))
+        return ResultSet({})
+
+    def create_database(self, nome):
+        self.comandos.append(("create_database", nome))
+
+    def get_list_retention_policies(self, database):
+        return self.rps
+
+    def alter_retention_policy(self, nome, **kwargs):
+        self.comandos.append(("alter_rp", nome, kwargs["duration"], kwargs["default"]))
+
+    def create_retention_policy(self, nome, duracao, replicacao, **kwargs):
+        self.comandos.append(("create_rp", nome, duracao, kwargs["default"]))
+
+    def get_list_continuous_queries(self):
+        return [{"network_monitoring": [{"name": n, "query": "..."} for n in self.cqs]}]
+
+    def create_continuous_query(self, nome, select, **kwargs):
+        self.comandos.append(("create_cq", nome))
+
+
+def test_configurar_retencao_cria_camadas():
+    """Testa a criação das retention policies e CQs em um banco novo."""
+    camadas = montar_camadas()
+    cliente = ClienteAdmin([{"name": "autogen", "duration": "0s", "default": True}], [])
+    configurar_retencao(cliente, "network_monitoring", camadas)
+    assert ("alter_rp", "autogen", "30d", True) in cliente.comandos
+    assert ("create_rp", "rp_1m", "180d", False) in cliente.comandos
+    assert ("create_rp", "rp_1h", "INF", False) in cliente.comandos
+    assert sum(1 for c in cliente.comandos if c[0] == "create_cq") == 4
+
+
+def test_encurtar_retencao_resume_dados_antigos_antes():
+    """Testa se os dados brutos existentes são resumidos em 1m/1h antes do ALTER que encurta a retenção."""
+    camadas = montar_camadas()
+    agora = time.time()
+    cliente = ClienteAdmin([{"name": "autogen", "duration": "0s", "default": True}], [], mais_antigo=agora - 3 * 86400)
+    configurar_retencao(cliente, "network_monitoring", camadas)
+    backfill = [c[1] for c in cliente.comandos if c[0] == "query"]
+    # 1m e 1h, duas consultas cada, um dia por vez (o primeiro dia é arredondado para baixo).
+    assert len(backfill) == 2 * 2 * 4
+    assert all(" INTO " in q and "time >= " in q for q in backfill)
+    assert 'WHERE "success" = 1 AND time >= ' in backfill[0]
+    ordem = [c[0] for c in cliente.comandos]
+    assert ordem.index("alter_rp") > max(i for i, c in enumerate(ordem) if c == "query")
+    assert ordem.index("create_rp") < ordem.index("query")
+
+
+def test_configurar_retencao_idempotente():
+    """Testa se uma segunda subida não recria nada que já está certo."""
+    camadas = montar_camadas()
+    rps = [{"name": "autogen", "duration": "720h0m0s", "default": True},
+           {"name": "rp_1m", "duration": "4320h0m0s", "default": False},
+           {"name": "rp_1h", "duration": "0s", "default": False}]
+    cqs = [nome for nome, _, _ in _consultas_continuas("network_monitoring", camadas)]
+    cliente = ClienteAdmin(rps, cqs)
+    configurar_retencao(cliente, "network_monitoring", camadas)
+    assert cliente.comandos == [("create_database", "network_monitoring")]
+
+
+def test_consultas_continuas_resumem_latencia_e_perda():
+    """Testa se as CQs gravam média/máximo de latência, perda e contagem nas medições certas."""
+    consultas = dict((n, s) for n, s, _ in _consultas_continuas("db", montar_camadas()))
+    latencia = consultas["cq_ping_results_1m_latency"]
+    assert 'INTO "db"."rp_1m"."ping_results_1m"' in latencia
+    assert 'WHERE "success" = 1 GROUP BY time(1m), *' in latencia
+    perda = consultas["cq_ping_results_1h_loss"]
+    assert '"loss_ratio"' in perda and '"samples"' in perda and "time(1h)" in perda
+
+
+def test_duracoes():
+    assert duracao_em_segundos("30d") == 30 * 86400
+    assert duracao_em_segundos("INF") is None
+    assert _duracao_rp("720h0m0s") == 30 * 86400
+    assert _duracao_rp("0s") is None
+
+
+def test_escolher_camada_por_intervalo():
+    """Testa a escolha da camada pelo tamanho do intervalo e pela retenção."""
+    camadas = montar_camadas()
+    agora = 1_000_000_000.0
+    assert escolher_camada(camadas, agora - 1800, agora, 500, agora=agora).nome == "raw"
+    assert escolher_camada(camadas, agora - 86400, agora, 500, agora=agora).nome == "1h"
+    assert escolher_camada(camadas, agora - 86400, agora, 1500, agora=agora).nome == "1m"
+    assert escolher_camada(camadas, agora - 30 * 86400, agora, 100000, agora=agora).nome == "1m"
+    # Fora da retenção dos dados brutos e do resumo de 1 minuto.
+    assert escolher_camada(camadas, agora - 365 * 86400, agora - 364 * 86400, 100000, agora=agora).nome == "1h"
+
+
+def test_endpoint_history(test_client, fake_influx):
+    """Testa o /history lendo a camada escolhida e agrupando por série."""
+    fake_influx.resultado = {"series": [{
+        "name": "ping_results_1h", "tags": {"employee_id": "joao", "ping_host": "8.8.8.8"},
+        "columns": ["time", "latency_mean", "loss_ratio"], "values": [["2025-10-01T00:00:00Z", 21.5, 0.01]],
+    }]}
+    agora = time.time()
+    response = test_client.get(f'/history?start={agora - 30 * 86400}&end={agora}&employee_id=joao')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["tier"] == "1h"
+    assert data["series"][0]["points"][0]["latency_mean"] == 21.5
+    consulta, parametros = fake_influx.consultas[-1]
+    assert 'FROM "rp_1h"."ping_results_1h"' in consulta
+    assert parametros["employee_id"] == "joao"
+
+    assert test_client.get('/history?start=10&end=5').status_code == 400
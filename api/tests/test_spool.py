@@ -0,0 +1,139 @@
+import os
+import time
+
+from ingest import BufferedWriter, linha_ping
+from influxdb.exceptions import InfluxDBClientError
+
+from spool import Spool, Drenador, ler_lotes
+
+
+def _esperar(condicao, timeout=5):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicao():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_spool_segmenta_e_reabre(tmp_path):
+    """Testa a rotação de segmentos e a recuperação da contagem após reiniciar."""
+    spool = Spool(str(tmp_path), segment_bytes=100)
+    for i in range(10):
+        spool.adicionar([linha_ping("e", "h", i, 1, i)])
+    status = spool.status()
+    assert status["pontos"] == 10
+    assert status["segmentos"] > 1
+
+    reaberto = Spool(str(tmp_path), segment_bytes=100)
+    assert reaberto.status() == dict(status)
+
+
+def test_ler_lotes_ignora_linha_truncada(tmp_path):
+    """Testa se uma escrita interrompida no fim do segmento não envenena a drenagem."""
+    caminho = tmp_path / "segmento-000000000001.lp"
+    caminho.write_bytes(b"a 1\nb 2\nc 3\nmeia-lin")
+    assert list(ler_lotes(str(caminho), 2)) == [["a 1", "b 2"], ["c 3"]]
+
+
+def test_writer_usa_spool_quando_influx_falha(tmp_path, fake_influx):
+    """Testa se o lote vai para o disco e é drenado quando o InfluxDB volta."""
+    spool = Spool(str(tmp_path))
+    drenador = Drenador(spool, lambda: fake_influx, tamanho_lote=2, backoff_inicial=0.05, backoff_max=0.1, intervalo=0.05)
+    writer = BufferedWriter(fake_influx, batch_size=10, flush_interval=60, spool=spool, drenador=drenador)
+
+    fake_influx.falhar = True
+    writer.adicionar([linha_ping("e", "h", i, 1, i) for i in range(3)])
+    assert writer.flush() is True
+    assert not drenador.disponivel
+    assert spool.status()["pontos"] == 3
+
+    # Indisponível: novos dados vão direto ao disco, sem passar pelo buffer.
+    writer.adicionar([linha_ping("e", "h", 9, 1, 9)])
+    assert writer.pendentes() == 0
+    assert spool.status()["pontos"] == 4
+
+    fake_influx.falhar = False
+    assert _esperar(lambda: spool.status()["pontos"] == 0)
+    drenador.parar()
+    assert drenador.disponivel
+    assert len(fake_influx.linhas()) == 4
+    assert drenador.status()["pontos_drenados"] == 4
+
+
+def test_endpoint_spool(test_client, fake_influx):
+    """Testa o endpoint de status da fila em disco."""
+    response = test_client.get('/spool')
+    assert response.status_code == 200
+    data = response.get_json()
+    for campo in ("segmentos", "bytes", "pontos", "influx_disponivel", "taxa_drenagem_pps", "buffer_pendentes"):
+        assert campo in data
+
+
+def test_drenagem_retoma_do_ponto_confirmado(tmp_path, fake_influx):
+    """Testa se, após uma falha no meio do segmento, os lotes já aceitos não são reenviados."""
+    spool = Spool(str(tmp_path))
+    spool.adicionar([linha_ping("e", "h", i, 1, i) for i in range(6)])
+    drenador = Drenador(spool, lambda: fake_influx, tamanho_lote=2)
+    drenador.client = fake_influx
+    caminho = spool.proximo_segmento()
+
+    escritas = []
+
+    def falhar_no_segundo_lote(lote, protocol='line'):
+        if len(escritas) == 1 and not getattr(falhar_no_segundo_lote, 'falhou', False):
+            falhar_no_segundo_lote.falhou = True
+            raise ConnectionError("queda")
+        escritas.append(lote)
+
+    fake_influx.write_points = falhar_no_segundo_lote
+    drenador._reconectar = lambda: None
+    assert drenador._drenar_segmento(caminho) is False
+    assert drenador._drenar_segmento(caminho) is True
+    assert [len(lote) for lote in escritas] == [2, 2, 2]
+    assert spool.status()["pontos"] == 0
+
+
+def test_writer_descarta_lote_rejeitado_sem_ir_ao_spool(tmp_path, fake_influx):
+    """Testa se um 4xx de dados inválidos descarta o lote em vez de mandar o InfluxDB para backoff."""
+    spool = Spool(str(tmp_path))
+    drenador = Drenador(spool, lambda: fake_influx)
+    writer = BufferedWriter(fake_influx, batch_size=10, flush_interval=60, spool=spool, drenador=drenador)
+
+    def rejeitar(lote, protocol='line'):
+        raise InfluxDBClientError("unable to parse", 400)
+
+    fake_influx.write_points = rejeitar
+    writer.client = fake_influx
+    assert writer._enviar([linha_ping("e", "h", 1, 1, 1)]) is True
+    assert drenador.disponivel
+    assert spool.status()["pontos"] == 0
+
+
+def test_writer_com_spool_sem_drenador(tmp_path, fake_influx):
+    """Testa se um writer com spool e sem drenador grava a falha no disco sem quebrar."""
+    spool = Spool(str(tmp_path))
+    writer = BufferedWriter(fake_influx, batch_size=10, flush_interval=60, spool=spool)
+    fake_influx.falhar = True
+    assert writer._enviar([linha_ping("e", "h", 1, 1, 1)]) is True
+    assert spool.status()["pontos"] == 1
+
+
+def test_limite_do_spool_preserva_segmento_em_drenagem(tmp_path):
+    """Testa se o limite de disco não apaga o segmento em leitura e se concluir não desconta duas vezes."""
+    spool = Spool(str(tmp_path), segment_bytes=50, max_bytes=10_000)
+    spool.adicionar([linha_ping("e", "h", i, 1, i) for i in range(3)])
+    spool.adicionar([linha_ping("e", "h", i, 1, i) for i in range(3)])
+    caminho = spool.proximo_segmento()
+    tamanho = os.path.getsize(caminho)
+
+    spool.max_bytes = 1
+    spool.adicionar([linha_ping("e", "h", 9, 1, 9)])
+    # Só sobra o segmento em drenagem; os demais (já fechados) foram descartados.
+    assert os.path.exists(caminho)
+    assert spool.status()["pontos"] == 3
+
+    spool.concluir(caminho, 3, tamanho)
+    assert spool.status()["pontos"] == 0
+    spool.concluir(caminho, 3, tamanho)
+    assert spool.status() == {"segmentos": 0, "bytes": 0, "pontos": 0}
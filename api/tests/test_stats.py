@@ -0,0 +1,94 @@
+import time
+
+from stats import SlidingStats, percentil, NUM_FAIXAS, _faixa
+
+
+def _ping(emp, host, latency, success, ts):
+    return (emp, host, latency, success, int(ts * 1e9))
+
+
+def test_percentis_e_perda_na_janela():
+    """Testa percentis, taxa de perda e último contato de uma série."""
+    stats = SlidingStats(janela_s=300, fatia_s=10)
+    agora = 1_000_000.0
+    pings = [_ping("joao", "8.8.8.8", 20, 1, agora - 5) for _ in range(90)]
+    pings += [_ping("joao", "8.8.8.8", 400, 1, agora - 5) for _ in range(8)]
+    pings += [_ping("joao", "8.8.8.8", 0, 0, agora - 1) for _ in range(2)]
+    stats.observar(pings, agora=agora)
+
+    [serie] = stats.consultar(agora=agora)
+    assert serie["samples"] == 100
+    assert serie["failures"] == 2
+    assert serie["loss_rate"] == 0.02
+    assert 15 <= serie["p50_ms"] <= 20
+    assert 300 <= serie["p95_ms"] <= 500
+    assert serie["last_seen"].startswith("1970-01-12T13:46:39")
+
+
+def test_janela_desliza_e_ignora_pontos_antigos():
+    """Testa se fatias que saíram da janela e reenvios antigos não entram na conta."""
+    stats = SlidingStats(janela_s=60, fatia_s=10)
+    agora = 1_000_000.0
+    stats.observar([_ping("a", "h", 10, 1, agora - 50)], agora=agora)
+    stats.observar([_ping("a", "h", 10, 1, agora - 3600)], agora=agora)
+    assert stats.consultar(agora=agora)[0]["samples"] == 1
+    assert stats.consultar(agora=agora + 60)[0]["samples"] == 0
+    # Janela menor que a mantida em memória.
+    stats.observar([_ping("a", "h", 10, 0, agora + 60)], agora=agora + 60)
+    assert stats.consultar(janela_s=10, agora=agora + 60)[0]["samples"] == 1
+
+
+def test_filtros_e_expiracao():
+    """Testa os filtros por funcionário/alvo e a remoção de séries paradas."""
+    stats = SlidingStats(janela_s=60, fatia_s=10, expiracao_s=120)
+    agora = 1_000_000.0
+    stats.observar([_ping("a", "h1", 5, 1, agora), _ping("b", "h1", 5, 1, agora), _ping("a", "h2", 5, 1, agora)], agora=agora)
+    assert len(stats.consultar(employee_id="a", agora=agora)) == 2
+    assert len(stats.consultar(ping_host="h1", agora=agora)) == 2
+    assert stats.consultar(agora=agora + 121) == []
+
+
+def test_observar_remove_series_expiradas_sem_consulta():
+    """Testa se a ingestão sozinha descarta séries paradas, sem ninguém chamar o /stats."""
+    stats = SlidingStats(janela_s=60, fatia_s=10, expiracao_s=120)
+    agora = 1_000_000.0
+    stats.observar([_ping(f"agente{i}", "h", 5, 1, agora) for i in range(50)], agora=agora)
+    assert len(stats._series) == 50
+    stats.observar([_ping("novo", "h", 5, 1, agora + 60)], agora=agora + 60)
+    assert len(stats._series) == 51
+    stats.observar([_ping("novo", "h", 5, 1, agora + 121)], agora=agora + 121)
+    assert set(stats._series) == {("novo", "h")}
+
+
+def test_percentil_faixa_aberta():
+    """Testa o percentil quando as amostras caem na última faixa (acima de 5000 ms)."""
+    histograma = [0] * NUM_FAIXAS
+    histograma[_faixa(9000)] = 3
+    assert percentil(histograma, 99) == 5000.0
+    assert percentil([0] * NUM_FAIXAS, 50) is None
+
+
+def test_endpoint_stats(test_client, fake_influx):
+    """Testa o /stats alimentado pelo /data, sem consultar o InfluxDB."""
+    agora_ms = int(time.time() * 1000)
+    payload = "".join(f"maria,8.8.4.4,{30 + i},1,{agora_ms - i}\n" for i in range(19)) + f"maria,8.8.4.4,0,0,{agora_ms}\n"
+    assert test_client.post('/data', data=payload, content_type='text/csv').status_code == 202
+
+    response = test_client.get('/stats?employee_id=maria&percentiles=50,95')
+    assert response.status_code == 200
+    [serie] = response.get_json()["series"]
+    assert serie["samples"] == 20
+    assert serie["loss_rate"] == 0.05
+    assert set(serie) >= {"p50_ms", "p95_ms", "last_seen"}
+    assert fake_influx.pings == 0
+
+    assert test_client.get('/stats?percentiles=150').status_code == 400
+
+
+def test_endpoint_stats_informa_janela_usada(test_client, fake_influx):
+    """Testa se window_seconds reflete a janela realmente calculada e se janelas menores que uma fatia são recusadas."""
+    assert test_client.get('/stats?window=0').status_code == 400
+    assert test_client.get('/stats?window=5').status_code == 400
+    assert test_client.get('/stats?window=15').get_json()["window_seconds"] == 20
+    assert test_client.get('/stats?window=99999').get_json()["window_seconds"] == 300
+    assert test_client.get('/stats').get_json()["window_seconds"] == 300
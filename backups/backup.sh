@@ -3,6 +3,10 @@
 # Carrega as variáveis de ambiente (senha, usuário, etc.)
 set -e
 
+# Dump completo semanal: base para recuperar o banco inteiro (schema e todas as tabelas).
+# Os registros de ponto e usuários são arquivados todas as noites, de forma incremental,
+# pelo serviço ponto-arquivo (ponto-api/arquivo.py) em /backups/arquivo.
+
 # AJUSTE: Exporta a senha para a variável PGPASSWORD, que o pg_dump entende.
 export PGPASSWORD=$POSTGRES_PASSWORD
 
@@ -17,7 +21,7 @@ pg_dump -h postgres-db -U "$POSTGRES_USER" "$POSTGRES_DB" | gzip > "$BACKUP_PATH
 
 echo "Backup concluído: ${FILENAME}"
 
-# Limpa backups antigos (com mais de 7 dias)
-echo "Limpando backups com mais de 7 dias..."
-find /backups -name "backup-*.sql.gz" -type f -mtime +7 -delete
+# Mantém os dumps das últimas 5 semanas; o arquivo mensal não expira.
+echo "Limpando backups com mais de 35 dias..."
+find /backups -name "backup-*.sql.gz" -type f -mtime +35 -delete
 echo "Limpeza concluída."
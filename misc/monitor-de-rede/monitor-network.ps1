@@ -18,9 +18,19 @@ $QueueFile = Join-Path $scriptDir "pending_data.csv"
 $configFile = Join-Path $scriptDir "userid.cfg"
 
 # --- FUNÇÃO PARA ENVIAR DADOS ---
-function Send-Data($Payload) {
+# Com -Compress o corpo vai em gzip (usado no reenvio da fila, que pode ser grande).
+function Send-Data($Payload, [switch]$Compress) {
     try {
-        Invoke-RestMethod -Uri $ApiEndpoint -Method Post -Body $Payload -ContentType "text/csv; charset=utf-8" -TimeoutSec 5
+        if ($Compress) {
+            $bytes = [System.Text.Encoding]::UTF8.GetBytes($Payload)
+            $buffer = New-Object System.IO.MemoryStream
+            $gzip = New-Object System.IO.Compression.GZipStream($buffer, [System.IO.Compression.CompressionMode]::Compress)
+            $gzip.Write($bytes, 0, $bytes.Length)
+            $gzip.Close()
+            Invoke-RestMethod -Uri $ApiEndpoint -Method Post -Body $buffer.ToArray() -ContentType "text/csv; charset=utf-8" -Headers @{ "Content-Encoding" = "gzip" } -TimeoutSec 60
+        } else {
+            Invoke-RestMethod -Uri $ApiEndpoint -Method Post -Body $Payload -ContentType "text/csv; charset=utf-8" -TimeoutSec 5
+        }
         return $true
     } catch {
         return $false
@@ -61,8 +71,10 @@ while ($true) {
             Write-Host "[$([string](Get-Date -Format 'HH:mm:ss'))] Alvo: $target -> FALHA" -ForegroundColor Red
         }
 
-        # Novo formato CSV: employee_id,ping_host,latency_ms,success_flag
-        $csvPayload = "$EmployeeID,$target,$latency,$success`n"
+        # Formato CSV: employee_id,ping_host,latency_ms,success_flag,timestamp (epoch em ms, UTC)
+        # O timestamp faz os dados reenviados da fila manterem o horário real do ping.
+        $timestamp = [DateTimeOffset]::UtcNow.ToUnixTimeMilliseconds()
+        $csvPayload = "$EmployeeID,$target,$latency,$success,$timestamp`n"
 
         # Tenta enviar o dado. Se falhar, adiciona à fila.
         if (-not (Send-Data -Payload $csvPayload)) {
@@ -72,8 +84,8 @@ while ($true) {
 
         # Verifica e tenta reenviar dados da fila se a conexão atual funcionou
         if ($success -eq 1 -and (Test-Path $QueueFile)) {
-             $pendingData = Get-Content $QueueFile
-             if (Send-Data -Payload $pendingData) {
+             $pendingData = Get-Content $QueueFile -Raw
+             if (Send-Data -Payload $pendingData -Compress) {
                  Write-Host "Dados da fila reenviados com sucesso!"
                  Remove-Item $QueueFile
              }
@@ -1,20 +1,31 @@
 import os
 import io
-import pandas as pd
-from flask import Flask, request, jsonify, send_file
+import csv
+import json
+import base64
+import binascii
+import zlib
+import tempfile
+from openpyxl import Workbook
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
-from flask_jwt_extended import create_access_token, JWTManager, jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import create_access_token, create_refresh_token, JWTManager, jwt_required, get_jwt_identity, get_jwt
 from datetime import datetime, date, timezone, timedelta
 from functools import wraps
-from sqlalchemy import extract
+from sqlalchemy import extract, and_, or_, text
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.dialects import postgresql, sqlite
 
 # Importa as configurações que criamos
 from config import DevelopmentConfig
+from senhas import HashSenhas
+from cache_hoje import CacheHoje
+from metrics import Registro, instrumentar_flask, instrumentar_sqlalchemy
 
 # As extensões são inicializadas aqui, fora da função, para serem globais.
 db = SQLAlchemy()
-bcrypt = Bcrypt()
+senhas = HashSenhas()
+cache_hoje = CacheHoje()
 jwt = JWTManager()
 
 # Define nosso fuso horário de -3 horas para consistência
@@ -29,6 +40,7 @@ class Usuario(db.Model):
     password_hash = db.Column(db.String(128), nullable=False)
     role = db.Column(db.String(20), nullable=False, default='funcionario')
     registros = db.relationship('RegistroPonto', backref='usuario', lazy=True, cascade="all, delete-orphan")
+    resumos = db.relationship('ResumoDiario', backref='usuario', lazy=True, cascade="all, delete-orphan")
 
 class RegistroPonto(db.Model):
     __tablename__ = 'registros_ponto'
@@ -37,6 +49,314 @@ class RegistroPonto(db.Model):
     timestamp = db.Column(db.DateTime(timezone=True), nullable=False)
     tipo_registro = db.Column(db.String(20), nullable=False)
     justificativa = db.Column(db.Text, nullable=True)
+    # Índices usados pelos filtros por período (ver migrations/0001_indices_registros_ponto.sql)
+    __table_args__ = (
+        db.Index('ix_registros_ponto_usuario_timestamp', 'usuario_id', 'timestamp'),
+        db.Index('ix_registros_ponto_timestamp', 'timestamp'),
+    )
+
+class ResumoDiario(db.Model):
+    """Resumo pré-calculado de um dia de um funcionário, mantido a cada alteração de registro."""
+    __tablename__ = 'resumos_diarios'
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='CASCADE'), primary_key=True)
+    dia = db.Column(db.Date, primary_key=True)
+    entrada = db.Column(db.DateTime(timezone=True), nullable=True)
+    saida_almoco = db.Column(db.DateTime(timezone=True), nullable=True)
+    volta_almoco = db.Column(db.DateTime(timezone=True), nullable=True)
+    saida = db.Column(db.DateTime(timezone=True), nullable=True)
+    minutos_trabalhados = db.Column(db.Integer, nullable=False, default=0)
+    minutos_almoco = db.Column(db.Integer, nullable=False, default=0)
+    minutos_extras = db.Column(db.Integer, nullable=False, default=0)
+    total_registros = db.Column(db.Integer, nullable=False, default=0)
+    completo = db.Column(db.Boolean, nullable=False, default=False)
+    atualizado_em = db.Column(db.DateTime(timezone=True), nullable=False)
+    # Fechamento do mês: leitura por dia de todos os funcionários (ver migrations/0002_resumos_diarios.sql);
+    # atualizado_em: meses alterados desde o último arquivamento (ver arquivo.py e migrations/0004).
+    __table_args__ = (
+        db.Index('ix_resumos_diarios_dia', 'dia'),
+        db.Index('ix_resumos_diarios_atualizado_em', 'atualizado_em'),
+    )
+
+class TokenRevogado(db.Model):
+    """Refresh tokens já usados (rotação) ou encerrados no logout; guardados só até expirarem."""
+    __tablename__ = 'tokens_revogados'
+    jti = db.Column(db.String(36), primary_key=True)
+    expira_em = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+
+
+# --- Filtros por Período ---
+def intervalo_periodo(ano, mes=None, dia=None):
+    """Retorna o intervalo semiaberto [inicio, fim) do ano, mês ou dia no fuso BR_TIMEZONE.
+
+    Comparar o timestamp com um intervalo permite ao banco usar os índices,
+    ao contrário de extract('month', ...), e respeita o dia local e não o UTC.
+    """
+    if dia:
+        inicio = datetime(ano, mes, dia, tzinfo=BR_TIMEZONE)
+        return inicio, inicio + timedelta(days=1)
+    if mes:
+        inicio = datetime(ano, mes, 1, tzinfo=BR_TIMEZONE)
+        fim = datetime(ano + 1, 1, 1, tzinfo=BR_TIMEZONE) if mes == 12 else datetime(ano, mes + 1, 1, tzinfo=BR_TIMEZONE)
+        return inicio, fim
+    return datetime(ano, 1, 1, tzinfo=BR_TIMEZONE), datetime(ano + 1, 1, 1, tzinfo=BR_TIMEZONE)
+
+def filtrar_periodo(query, ano, mes=None, dia=None):
+    inicio, fim = intervalo_periodo(ano, mes, dia)
+    return query.filter(RegistroPonto.timestamp >= inicio, RegistroPonto.timestamp < fim)
+
+
+# --- Resumo Diário ---
+TIPOS_REGISTRO = ('entrada', 'saida_almoco', 'volta_almoco', 'saida')
+
+def hora_local(timestamp):
+    """Converte para BR_TIMEZONE; valores sem fuso (SQLite) já estão no horário local."""
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=BR_TIMEZONE)
+    return timestamp.astimezone(BR_TIMEZONE)
+
+def _minutos(inicio, fim):
+    if not inicio or not fim or fim <= inicio:
+        return 0
+    return int((fim - inicio).total_seconds() // 60)
+
+def calcular_resumo(registros, jornada_minutos):
+    """Pareia as batidas (timestamp, tipo) de um dia e calcula os minutos trabalhados, de almoço e extras.
+
+    Vale a primeira batida de cada tipo, exceto a saída, onde vale a última.
+    """
+    batidas = {}
+    for timestamp, tipo in sorted(registros, key=lambda r: r[0]):
+        if tipo == 'saida' or tipo not in batidas:
+            batidas[tipo] = hora_local(timestamp)
+    entrada, saida_almoco = batidas.get('entrada'), batidas.get('saida_almoco')
+    volta_almoco, saida = batidas.get('volta_almoco'), batidas.get('saida')
+    if saida_almoco or volta_almoco:
+        trabalhados = _minutos(entrada, saida_almoco) + _minutos(volta_almoco, saida)
+    else:
+        trabalhados = _minutos(entrada, saida)
+    return {
+        "entrada": entrada, "saida_almoco": saida_almoco, "volta_almoco": volta_almoco, "saida": saida,
+        "minutos_trabalhados": trabalhados,
+        "minutos_almoco": _minutos(saida_almoco, volta_almoco),
+        # Hora extra só conta com o dia fechado (há saída).
+        "minutos_extras": max(0, trabalhados - jornada_minutos) if saida else 0,
+        "total_registros": len(registros),
+        "completo": all(t in batidas for t in TIPOS_REGISTRO),
+    }
+
+def atualizar_resumos_diarios(usuario_dias, jornada_minutos=480):
+    """Recalcula os resumos dos pares (usuario_id, dia) na sessão atual; o commit fica com quem chamou.
+
+    Faz duas consultas qualquer que seja o número de pares, então serve tanto para
+    uma batida quanto para uma importação em lote. Um dia que ficou sem batidas
+    mantém o resumo zerado, para o arquivamento incremental enxergar a exclusão.
+    """
+    usuario_dias = set(usuario_dias)
+    if not usuario_dias:
+        return
+    usuarios = {u for u, _ in usuario_dias}
+    primeiro, ultimo = min(d for _, d in usuario_dias), max(d for _, d in usuario_dias)
+    inicio = intervalo_periodo(primeiro.year, primeiro.month, primeiro.day)[0]
+    fim = intervalo_periodo(ultimo.year, ultimo.month, ultimo.day)[1]
+    batidas = {}
+    for usuario_id, timestamp, tipo in db.session.query(RegistroPonto.usuario_id, RegistroPonto.timestamp, RegistroPonto.tipo_registro).filter(
+        RegistroPonto.usuario_id.in_(usuarios), RegistroPonto.timestamp >= inicio, RegistroPonto.timestamp < fim
+    ):
+        chave = (usuario_id, hora_local(timestamp).date())
+        if chave in usuario_dias:
+            batidas.setdefault(chave, []).append((timestamp, tipo))
+    existentes = set(db.session.query(ResumoDiario.usuario_id, ResumoDiario.dia).filter(
+        ResumoDiario.usuario_id.in_(usuarios), ResumoDiario.dia >= primeiro, ResumoDiario.dia <= ultimo
+    ))
+    agora = datetime.now(BR_TIMEZONE)
+    linhas = []
+    for chave in usuario_dias:
+        registros = batidas.get(chave)
+        if not registros and chave not in existentes:
+            continue
+        linha = calcular_resumo(registros or [], jornada_minutos)
+        linha.update(usuario_id=chave[0], dia=chave[1], atualizado_em=agora)
+        linhas.append(linha)
+    gravar_resumos(linhas)
+
+
+def gravar_resumos(linhas, somente_mais_novos=False):
+    """INSERT ... ON CONFLICT (usuario_id, dia) DO UPDATE dos resumos, em um único comando.
+
+    Duas primeiras batidas simultâneas do mesmo dia não colidem na chave primária.
+    Com somente_mais_novos, uma linha com atualizado_em mais recente no banco
+    (gravada pela API durante um recálculo em lote) é mantida.
+    """
+    if not linhas:
+        return
+    insert = postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+    comando = insert(ResumoDiario.__table__).values(linhas)
+    onde = ResumoDiario.__table__.c.atualizado_em <= comando.excluded.atualizado_em if somente_mais_novos else None
+    db.session.execute(comando.on_conflict_do_update(
+        index_elements=['usuario_id', 'dia'],
+        set_={campo: comando.excluded[campo] for campo in linhas[0] if campo not in ('usuario_id', 'dia')},
+        where=onde,
+    ))
+
+
+# --- Importação em Lote de Registros (admin) ---
+IMPORTACAO_LIMITE = 20000
+IMPORTACAO_JUSTIFICATIVA = "Importação em lote"
+
+def ler_importacao(req):
+    """Lê as linhas do corpo: CSV com cabeçalho ou JSON (lista ou {"registros": [...]})."""
+    if req.mimetype in ('text/csv', 'text/plain'):
+        texto = req.get_data().decode('utf-8-sig')
+        return [{k.strip(): (v or '').strip() for k, v in linha.items() if k} for linha in csv.DictReader(io.StringIO(texto))]
+    dados = req.get_json(silent=True)
+    if isinstance(dados, dict):
+        dados = dados.get('registros')
+    if not isinstance(dados, list):
+        raise ValueError("Envie um CSV ou uma lista JSON de registros.")
+    return dados
+
+def validar_importacao(linhas):
+    """Valida todas as linhas antes de gravar; devolve (registros, erros) com o número de cada linha."""
+    ids, usernames = set(), set()
+    for linha in linhas:
+        if isinstance(linha, dict):
+            if str(linha.get('usuario_id') or '').strip().isdigit(): ids.add(int(linha['usuario_id']))
+            elif linha.get('username'): usernames.add(str(linha['username']).strip())
+    # Uma consulta para resolver todos os funcionários citados no arquivo.
+    por_id, por_username = {}, {}
+    if ids or usernames:
+        for usuario_id, username in db.session.query(Usuario.id, Usuario.username).filter(or_(Usuario.id.in_(ids), Usuario.username.in_(usernames))):
+            por_id[usuario_id] = usuario_id
+            por_username[username] = usuario_id
+    registros, erros = [], []
+    for numero, linha in enumerate(linhas, 1):
+        if not isinstance(linha, dict):
+            erros.append({"linha": numero, "erro": "Linha deve ser um objeto."})
+            continue
+        usuario_id = str(linha.get('usuario_id') or '').strip()
+        username = str(linha.get('username') or '').strip()
+        if usuario_id:
+            usuario_id = por_id.get(int(usuario_id)) if usuario_id.isdigit() else None
+        elif username:
+            usuario_id = por_username.get(username)
+        else:
+            erros.append({"linha": numero, "erro": "Informe 'usuario_id' ou 'username'."})
+            continue
+        if usuario_id is None:
+            erros.append({"linha": numero, "erro": "Usuário não encontrado."})
+            continue
+        tipo = str(linha.get('tipo') or '').strip()
+        if tipo not in TIPOS_REGISTRO:
+            erros.append({"linha": numero, "erro": f"Tipo inválido: '{tipo}'."})
+            continue
+        data, hora = str(linha.get('data') or '').strip(), str(linha.get('hora') or '').strip()
+        try:
+            formato = '%Y-%m-%d %H:%M:%S' if hora.count(':') == 2 else '%Y-%m-%d %H:%M'
+            timestamp = datetime.strptime(f"{data} {hora}", formato).replace(tzinfo=BR_TIMEZONE)
+        except ValueError:
+            erros.append({"linha": numero, "erro": "Data/hora inválida (use AAAA-MM-DD e HH:MM)."})
+            continue
+        justificativa = str(linha.get('justificativa') or '').strip() or IMPORTACAO_JUSTIFICATIVA
+        registros.append((numero, {"usuario_id": usuario_id, "timestamp": timestamp, "tipo_registro": tipo, "justificativa": justificativa}))
+    return registros, erros
+
+def separar_duplicados(registros):
+    """Separa as linhas que já existem no banco (ou se repetem no arquivo) pela chave (usuario, horário, tipo)."""
+    if not registros:
+        return [], []
+    usuarios = {r["usuario_id"] for _, r in registros}
+    inicio = min(r["timestamp"] for _, r in registros)
+    fim = max(r["timestamp"] for _, r in registros)
+    vistos = {(usuario_id, hora_local(timestamp), tipo) for usuario_id, timestamp, tipo in db.session.query(
+        RegistroPonto.usuario_id, RegistroPonto.timestamp, RegistroPonto.tipo_registro
+    ).filter(RegistroPonto.usuario_id.in_(usuarios), RegistroPonto.timestamp >= inicio, RegistroPonto.timestamp <= fim)}
+    novos, duplicados = [], []
+    for numero, r in registros:
+        chave = (r["usuario_id"], r["timestamp"], r["tipo_registro"])
+        if chave in vistos:
+            duplicados.append(numero)
+        else:
+            vistos.add(chave)
+            novos.append(r)
+    return novos, duplicados
+
+
+# --- Listagem Paginada de Registros (admin) ---
+REGISTROS_CAMPOS = {
+    "id": RegistroPonto.id,
+    "usuario_id": RegistroPonto.usuario_id,
+    "nome_usuario": Usuario.nome_completo,
+    "timestamp": RegistroPonto.timestamp,
+    "tipo_registro": RegistroPonto.tipo_registro,
+    "justificativa": RegistroPonto.justificativa,
+}
+REGISTROS_LIMITE_MAX = 1000
+
+def _gerar_cursor(r):
+    """Cursor opaco com a chave de ordenação (nome, timestamp, id) da última linha da página."""
+    chave = [r.nome_usuario, r.timestamp.isoformat(), r.id]
+    return base64.urlsafe_b64encode(json.dumps(chave).encode('utf-8')).decode('ascii')
+
+def _apos_cursor(cursor):
+    """Condição keyset: linhas estritamente depois de (nome, timestamp, id) na ordenação da listagem."""
+    try:
+        nome, timestamp, registro_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        timestamp = datetime.fromisoformat(timestamp)
+        registro_id = int(registro_id)
+    except (TypeError, binascii.Error, json.JSONDecodeError, UnicodeError) as e:
+        raise ValueError(str(e))
+    return or_(
+        Usuario.nome_completo > nome,
+        and_(Usuario.nome_completo == nome, or_(
+            RegistroPonto.timestamp > timestamp,
+            and_(RegistroPonto.timestamp == timestamp, RegistroPonto.id > registro_id),
+        )),
+    )
+
+
+# --- Relatório de Ponto ---
+RELATORIO_COLUNAS = ['ID Registro', 'Funcionário', 'Username', 'Data e Hora', 'Tipo', 'Justificativa']
+RELATORIO_LOTE = 1000
+
+def _linha_relatorio(r):
+    return [r.id, r.nome_completo, r.username, hora_local(r.timestamp).strftime('%Y-%m-%d %H:%M:%S'), r.tipo_registro, r.justificativa]
+
+def _relatorio_xlsx(linhas):
+    """Grava as linhas em uma planilha write-only (memória constante) e devolve o arquivo temporário.
+
+    O zip do XLSX só fica válido depois do wb.save, então a planilha não sai em streaming:
+    o tamanho é limitado por RELATORIO_XLSX_MAX_LINHAS e exportações maiores vão em CSV.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Registros de Ponto')
+    ws.append(RELATORIO_COLUNAS)
+    for linha in linhas:
+        ws.append(linha)
+    saida = tempfile.TemporaryFile()
+    wb.save(saida)
+    saida.seek(0)
+    return saida
+
+def _relatorio_csv(linhas, comprimir=False):
+    """Gera o CSV em blocos à medida que as linhas chegam do banco (opcionalmente em gzip)."""
+    compressor = zlib.compressobj(wbits=31) if comprimir else None
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    # BOM para o Excel reconhecer o UTF-8 dos acentos.
+    buffer.write('\ufeff')
+    escritor.writerow(RELATORIO_COLUNAS)
+    for i, linha in enumerate(linhas, 1):
+        escritor.writerow(linha)
+        if i % RELATORIO_LOTE == 0:
+            bloco = buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            yield compressor.compress(bloco) if compressor else bloco
+    bloco = buffer.getvalue().encode('utf-8')
+    if compressor:
+        yield compressor.compress(bloco) + compressor.flush()
+    else:
+        yield bloco
 
 
 # --- Decorador de Admin ---
@@ -54,6 +374,30 @@ def admin_required():
     return wrapper
 
 
+# --- Tokens de Acesso e de Renovação ---
+def emitir_tokens(user):
+    """Access token curto para as requisições e refresh token para renovar a sessão sem a senha."""
+    additional_claims = {"role": user.role}
+    return {
+        "access_token": create_access_token(identity=str(user.id), additional_claims=additional_claims),
+        "refresh_token": create_refresh_token(identity=str(user.id)),
+        "role": user.role,
+    }
+
+def revogar_token(payload):
+    """Coloca o refresh token na lista de revogados (o commit fica com quem chamou)."""
+    db.session.add(TokenRevogado(jti=payload['jti'], expira_em=datetime.fromtimestamp(payload['exp'], timezone.utc)))
+    # Limpa os que já expiraram: depois disso o próprio JWT deixa de ser aceito.
+    TokenRevogado.query.filter(TokenRevogado.expira_em < datetime.now(timezone.utc)).delete(synchronize_session=False)
+
+@jwt.token_in_blocklist_loader
+def token_revogado(jwt_header, jwt_payload):
+    # Só os refresh tokens são consultados; os access tokens expiram em minutos.
+    if jwt_payload.get('type') != 'refresh':
+        return False
+    return db.session.get(TokenRevogado, jwt_payload['jti']) is not None
+
+
 # --- Função "Fábrica" que Cria a Aplicação ---
 def create_app(config_class=DevelopmentConfig):
     app = Flask(__name__)
@@ -62,22 +406,90 @@ def create_app(config_class=DevelopmentConfig):
 
     # Vincula as extensões à aplicação
     db.init_app(app)
-    bcrypt.init_app(app)
+    senhas.init_app(app)
+    cache_hoje.init_app(app)
+
+    # Métricas do Prometheus em /metrics (ver metrics.py)
+    metricas = Registro(app.config.get('METRICS_DIR'))
+    instrumentar_flask(app, metricas, threads=app.config.get('WEB_THREADS'))
+    instrumentar_sqlalchemy(app, metricas)
+
+    def pool_do_banco():
+        with app.app_context():
+            return db.engine.pool
+
+    # Saturação do pool: conexões em uso perto de size + overflow fazem as requisições esperarem.
+    metricas.medidor("db_pool_checked_out", "Conexões do pool em uso", lambda: getattr(pool_do_banco(), 'checkedout', lambda: None)())
+    metricas.medidor("db_pool_size", "Tamanho fixo do pool de conexões", lambda: getattr(pool_do_banco(), 'size', lambda: None)())
+    metricas.medidor("db_pool_overflow", "Conexões abertas além do tamanho fixo", lambda: getattr(pool_do_banco(), 'overflow', lambda: None)())
+    app.extensions['metricas'] = metricas
     jwt.init_app(app)
 
+    def atualizar_resumos(usuario_id, *dias):
+        atualizar_resumos_diarios({(usuario_id, dia) for dia in dias}, app.config['JORNADA_DIARIA_MINUTOS'])
+
+    def invalidar_hoje(usuario_id, *dias):
+        # Chamado depois do commit, para uma leitura concorrente não recolocar o valor antigo.
+        for dia in set(dias) or {datetime.now(BR_TIMEZONE).date()}:
+            cache_hoje.invalidar(usuario_id, dia)
+
     # --- ROTAS DA API ---
+
+    @app.route('/health/live', methods=['GET'])
+    def health_live():
+        # Só indica que o processo responde; não toca no banco.
+        return jsonify({"status": "ok"})
+
+    @app.route('/health/ready', methods=['GET'])
+    def health_ready():
+        # Um SELECT 1 em uma conexão do pool: barato e confirma que o Postgres responde.
+        try:
+            db.session.execute(text('SELECT 1'))
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            app.logger.error(f"Banco indisponível: {e}")
+            return jsonify({"status": "unavailable", "database": "error"}), 503
+        return jsonify({"status": "ok", "database": "ok"})
     
     @app.route('/login', methods=['POST'])
     def login():
         username = request.json.get('username', None)
         password = request.json.get('password', None)
         user = Usuario.query.filter_by(username=username).first()
-        if user and bcrypt.check_password_hash(user.password_hash, password):
-            additional_claims = {"role": user.role}
-            access_token = create_access_token(identity=str(user.id), additional_claims=additional_claims)
-            return jsonify(access_token=access_token, role=user.role)
+        if user and senhas.verificar(password, user.password_hash):
+            # Se o work factor mudou, aproveita a senha em mãos para regravar o hash.
+            if senhas.precisa_rehash(user.password_hash):
+                user.password_hash = senhas.gerar(password)
+                db.session.commit()
+            return jsonify(emitir_tokens(user))
         return jsonify({"msg": "Usuário ou senha inválidos"}), 401
 
+    @app.route('/token/refresh', methods=['POST'])
+    @jwt_required(refresh=True)
+    def renovar_token():
+        user = db.session.get(Usuario, int(get_jwt_identity()))
+        if user is None:
+            return jsonify({"msg": "Usuário não encontrado"}), 401
+        # Rotação: o refresh token usado é revogado e um novo é emitido junto do access token.
+        revogar_token(get_jwt())
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Outra requisição já usou este refresh token.
+            db.session.rollback()
+            return jsonify({"msg": "Token has been revoked"}), 401
+        return jsonify(emitir_tokens(user))
+
+    @app.route('/logout', methods=['POST'])
+    @jwt_required(refresh=True)
+    def logout():
+        revogar_token(get_jwt())
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+        return jsonify({"msg": "Sessão encerrada."})
+
     @app.route('/ponto/registrar', methods=['POST'])
     @jwt_required()
     def registrar_ponto():
@@ -86,31 +498,42 @@ def create_app(config_class=DevelopmentConfig):
         if not tipo or tipo not in tipos_validos:
             return jsonify({"msg": "Tipo de registro inválido ou ausente"}), 400
         current_user_id = get_jwt_identity()
+        agora = datetime.now(BR_TIMEZONE)
         novo_registro = RegistroPonto(
             usuario_id=int(current_user_id),
             tipo_registro=tipo,
-            timestamp=datetime.now(BR_TIMEZONE)
+            timestamp=agora
         )
         db.session.add(novo_registro)
+        atualizar_resumos(int(current_user_id), agora.date())
         db.session.commit()
+        # Depois do commit: o próximo /me/hoje relê o banco e um GET concorrente
+        # que leu antes da batida não consegue regravar o valor antigo.
+        cache_hoje.invalidar(int(current_user_id), agora.date())
         return jsonify({"msg": f"Ponto de '{tipo}' registrado com sucesso!"}), 201
     
     @app.route('/me/hoje', methods=['GET'])
     @jwt_required()
     def get_user_and_today_records():
         current_user_id = get_jwt_identity()
-        user = Usuario.query.get(int(current_user_id))
-        
         now_brt = datetime.now(BR_TIMEZONE)
-        today_start = now_brt.replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        registros_hoje = RegistroPonto.query.filter(
-            RegistroPonto.usuario_id == int(current_user_id),
-            RegistroPonto.timestamp >= today_start
-        ).all()
-        tipos_registrados = [r.tipo_registro for r in registros_hoje]
-        user_data = { "id": user.id, "nome_completo": user.nome_completo, "registros_hoje": tipos_registrados }
-        return jsonify(user_data)
+        user_data, versao = cache_hoje.ler(int(current_user_id), now_brt.date())
+        if user_data is None:
+            user = Usuario.query.get(int(current_user_id))
+            today_start = now_brt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+            registros_hoje = RegistroPonto.query.filter(
+                RegistroPonto.usuario_id == int(current_user_id),
+                RegistroPonto.timestamp >= today_start
+            ).order_by(RegistroPonto.timestamp.asc()).all()
+            tipos_registrados = [r.tipo_registro for r in registros_hoje]
+            user_data = { "id": user.id, "nome_completo": user.nome_completo, "registros_hoje": tipos_registrados }
+            cache_hoje.gravar(int(current_user_id), now_brt.date(), user_data, versao)
+        resposta = jsonify(user_data)
+        # Polls sem mudança recebem 304 sem corpo.
+        resposta.headers['Cache-Control'] = 'private, no-cache'
+        resposta.add_etag()
+        return resposta.make_conditional(request)
 
     @app.route('/me/registros', methods=['GET'])
     @jwt_required()
@@ -120,11 +543,11 @@ def create_app(config_class=DevelopmentConfig):
         ano = request.args.get('ano', type=int)
         if not mes or not ano:
             return jsonify({"msg": "Parâmetros 'ano' e 'mes' são obrigatórios."}), 400
-        query = RegistroPonto.query.filter_by(usuario_id=int(current_user_id)).filter(
-            extract('month', RegistroPonto.timestamp) == mes,
-            extract('year', RegistroPonto.timestamp) == ano
-        ).order_by(RegistroPonto.timestamp.asc())
-        registros = query.all()
+        try:
+            query = filtrar_periodo(RegistroPonto.query.filter_by(usuario_id=int(current_user_id)), ano, mes)
+        except ValueError:
+            return jsonify({"msg": "Período inválido."}), 400
+        registros = query.order_by(RegistroPonto.timestamp.asc()).all()
         return jsonify([{"id": r.id, "timestamp": r.timestamp.astimezone(BR_TIMEZONE).isoformat(), "tipo_registro": r.tipo_registro} for r in registros])
     
     @app.route('/admin/usuarios', methods=['GET', 'POST'])
@@ -139,7 +562,7 @@ def create_app(config_class=DevelopmentConfig):
                 return jsonify({"msg": "Dados incompletos"}), 400
             if Usuario.query.filter_by(username=dados['username']).first():
                 return jsonify({"msg": "Username já existe"}), 409
-            hashed_password = bcrypt.generate_password_hash(dados['password']).decode('utf-8')
+            hashed_password = senhas.gerar(dados['password'])
             novo_usuario = Usuario(username=dados['username'], password_hash=hashed_password, nome_completo=dados['nome_completo'], role=dados.get('role', 'funcionario'))
             db.session.add(novo_usuario)
             db.session.commit()
@@ -155,12 +578,14 @@ def create_app(config_class=DevelopmentConfig):
             if 'nome_completo' in dados: user.nome_completo = dados['nome_completo']
             if 'role' in dados: user.role = dados['role']
             if 'password' in dados and dados['password']:
-                user.password_hash = bcrypt.generate_password_hash(dados['password']).decode('utf-8')
+                user.password_hash = senhas.gerar(dados['password'])
             db.session.commit()
+            invalidar_hoje(usuario_id)
             return jsonify({"msg": "Usuário atualizado com sucesso!"})
         if request.method == 'DELETE':
             db.session.delete(user)
             db.session.commit()
+            invalidar_hoje(usuario_id)
             return jsonify({"msg": "Usuário deletado com sucesso!"})
 
     @app.route('/admin/registros', methods=['GET', 'POST'])
@@ -171,13 +596,51 @@ def create_app(config_class=DevelopmentConfig):
             mes = request.args.get('mes', type=int)
             ano = request.args.get('ano', type=int)
             dia = request.args.get('dia', type=int)
-            query = RegistroPonto.query.join(Usuario).order_by(Usuario.nome_completo, RegistroPonto.timestamp.asc())
+            limite = request.args.get('limit', type=int)
+            campos = request.args.get('fields')
+            campos = [c.strip() for c in campos.split(',') if c.strip()] if campos else list(REGISTROS_CAMPOS)
+            if any(c not in REGISTROS_CAMPOS for c in campos):
+                return jsonify({"msg": f"Campos válidos: {', '.join(REGISTROS_CAMPOS)}"}), 400
+            if limite is not None and not 1 <= limite <= REGISTROS_LIMITE_MAX:
+                return jsonify({"msg": f"'limit' deve estar entre 1 e {REGISTROS_LIMITE_MAX}."}), 400
+            # Projeção só das colunas usadas (o nome vem do JOIN, sem carregar r.usuario por linha).
+            # As colunas da ordenação entram sempre, pois formam o cursor da próxima página.
+            colunas = [RegistroPonto.id.label('id'), Usuario.nome_completo.label('nome_usuario'), RegistroPonto.timestamp.label('timestamp')]
+            colunas += [REGISTROS_CAMPOS[c].label(c) for c in campos if c not in ('id', 'nome_usuario', 'timestamp')]
+            query = db.session.query(*colunas).join(Usuario, RegistroPonto.usuario_id == Usuario.id).order_by(Usuario.nome_completo, RegistroPonto.timestamp.asc(), RegistroPonto.id.asc())
             if usuario_id: query = query.filter(RegistroPonto.usuario_id == usuario_id)
-            if mes: query = query.filter(extract('month', RegistroPonto.timestamp) == mes)
-            if ano: query = query.filter(extract('year', RegistroPonto.timestamp) == ano)
-            if dia: query = query.filter(extract('day', RegistroPonto.timestamp) == dia)
-            registros = query.all()
-            return jsonify([{"id": r.id, "usuario_id": r.usuario_id, "nome_usuario": r.usuario.nome_completo, "timestamp": r.timestamp.astimezone(BR_TIMEZONE).isoformat(), "tipo_registro": r.tipo_registro, "justificativa": r.justificativa} for r in registros])
+            if ano:
+                try:
+                    query = filtrar_periodo(query, ano, mes, dia if mes else None)
+                except ValueError:
+                    return jsonify({"msg": "Período inválido."}), 400
+            # Combinações sem ano (ou dia sem mês) não formam um intervalo contínuo.
+            if mes and not ano: query = query.filter(extract('month', RegistroPonto.timestamp) == mes)
+            if dia and not (ano and mes): query = query.filter(extract('day', RegistroPonto.timestamp) == dia)
+            cursor = request.args.get('cursor')
+            if cursor:
+                try:
+                    query = query.filter(_apos_cursor(cursor))
+                except ValueError:
+                    return jsonify({"msg": "Cursor inválido."}), 400
+            if limite:
+                registros = query.limit(limite + 1).all()
+                proxima_pagina = len(registros) > limite
+                registros = registros[:limite]
+            else:
+                registros, proxima_pagina = query.all(), False
+            itens = []
+            for r in registros:
+                item = {c: getattr(r, c) for c in campos}
+                if 'timestamp' in item: item['timestamp'] = r.timestamp.astimezone(BR_TIMEZONE).isoformat()
+                itens.append(item)
+            resposta = jsonify(itens)
+            if proxima_pagina:
+                resposta.headers['X-Next-Cursor'] = _gerar_cursor(registros[-1])
+            # ETag: se nada mudou desde a última consulta, o navegador recebe um 304 sem corpo.
+            resposta.headers['Cache-Control'] = 'private, no-cache'
+            resposta.add_etag()
+            return resposta.make_conditional(request)
         if request.method == 'POST':
             dados = request.json
             usuario_id = dados.get('usuario_id')
@@ -191,13 +654,41 @@ def create_app(config_class=DevelopmentConfig):
                     timestamp_completo = data_base.replace(hour=hora, minute=minuto, tzinfo=BR_TIMEZONE)
                     novo_registro = RegistroPonto(usuario_id=usuario_id, tipo_registro=tipo, timestamp=timestamp_completo, justificativa="Lançamento Manual")
                     db.session.add(novo_registro)
+            atualizar_resumos(int(usuario_id), data_base.date())
             db.session.commit()
+            invalidar_hoje(int(usuario_id), data_base.date())
             return jsonify({"msg": "Registros manuais inseridos com sucesso!"}), 201
 
+    @app.route('/admin/registros/importar', methods=['POST'])
+    @admin_required()
+    def importar_registros():
+        try:
+            linhas = ler_importacao(request)
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            return jsonify({"msg": f"Corpo inválido: {e}"}), 400
+        if not linhas:
+            return jsonify({"msg": "Nenhuma linha para importar."}), 400
+        if len(linhas) > IMPORTACAO_LIMITE:
+            return jsonify({"msg": f"Máximo de {IMPORTACAO_LIMITE} linhas por importação."}), 413
+        registros, erros = validar_importacao(linhas)
+        # Tudo ou nada: com qualquer linha inválida nada é gravado e o admin corrige o arquivo.
+        if erros:
+            return jsonify({"msg": f"{len(erros)} linha(s) inválida(s); nada foi importado.", "erros": erros}), 400
+        novos, duplicados = separar_duplicados(registros)
+        if novos:
+            # INSERT em lote (executemany) em vez de um objeto ORM por batida.
+            db.session.execute(RegistroPonto.__table__.insert(), novos)
+            atualizar_resumos_diarios({(r["usuario_id"], r["timestamp"].date()) for r in novos}, app.config['JORNADA_DIARIA_MINUTOS'])
+        db.session.commit()
+        for usuario_id, dia in {(r["usuario_id"], r["timestamp"].date()) for r in novos}:
+            invalidar_hoje(usuario_id, dia)
+        return jsonify({"msg": f"{len(novos)} registro(s) importado(s).", "inseridos": len(novos), "ignorados": len(duplicados), "linhas_duplicadas": duplicados, "erros": []}), 201
+
     @app.route('/admin/registros/<int:registro_id>', methods=['PUT', 'DELETE'])
     @admin_required()
     def gerenciar_registro_especifico(registro_id):
         registro = RegistroPonto.query.get_or_404(registro_id)
+        usuario_id, dia_anterior = registro.usuario_id, hora_local(registro.timestamp).date()
         if request.method == 'PUT':
             dados = request.json
             if 'timestamp' in dados:
@@ -205,43 +696,80 @@ def create_app(config_class=DevelopmentConfig):
                 registro.timestamp = naive_dt.replace(tzinfo=BR_TIMEZONE)
             if 'tipo_registro' in dados: registro.tipo_registro = dados['tipo_registro']
             if 'justificativa' in dados: registro.justificativa = dados['justificativa']
+            # Se a batida mudou de dia, os dois dias precisam ser recalculados.
+            dia_atual = hora_local(registro.timestamp).date()
+            atualizar_resumos(usuario_id, dia_anterior, dia_atual)
             db.session.commit()
+            invalidar_hoje(usuario_id, dia_anterior, dia_atual)
             return jsonify({"msg": "Registro atualizado com sucesso!"})
         if request.method == 'DELETE':
             db.session.delete(registro)
+            atualizar_resumos(usuario_id, dia_anterior)
             db.session.commit()
+            invalidar_hoje(usuario_id, dia_anterior)
             return jsonify({"msg": "Registro deletado com sucesso!"})
     
+    @app.route('/admin/resumo', methods=['GET'])
+    @admin_required()
+    def get_resumo_mensal():
+        ano = request.args.get('ano', type=int)
+        mes = request.args.get('mes', type=int)
+        usuario_id = request.args.get('usuario_id', type=int)
+        if not mes or not ano:
+            return jsonify({"msg": "Parâmetros 'ano' e 'mes' são obrigatórios."}), 400
+        try:
+            inicio, fim = intervalo_periodo(ano, mes)
+        except ValueError:
+            return jsonify({"msg": "Período inválido."}), 400
+        # Lê só a tabela pré-calculada: cerca de uma linha por funcionário por dia.
+        query = db.session.query(ResumoDiario, Usuario.nome_completo).join(Usuario, ResumoDiario.usuario_id == Usuario.id).filter(
+            ResumoDiario.dia >= inicio.date(), ResumoDiario.dia < fim.date(), ResumoDiario.total_registros > 0
+        ).order_by(Usuario.nome_completo, ResumoDiario.dia)
+        if usuario_id: query = query.filter(ResumoDiario.usuario_id == usuario_id)
+        def horario(t):
+            return hora_local(t).isoformat() if t else None
+        return jsonify([{
+            "usuario_id": r.usuario_id, "nome_usuario": nome, "dia": r.dia.isoformat(),
+            "entrada": horario(r.entrada), "saida_almoco": horario(r.saida_almoco),
+            "volta_almoco": horario(r.volta_almoco), "saida": horario(r.saida),
+            "minutos_trabalhados": r.minutos_trabalhados, "minutos_almoco": r.minutos_almoco,
+            "minutos_extras": r.minutos_extras, "total_registros": r.total_registros, "completo": r.completo,
+        } for r, nome in query.all()])
+
     @app.route('/admin/relatorio', methods=['GET'])
     @admin_required()
     def gerar_relatorio():
         ano = request.args.get('ano', type=int)
         mes = request.args.get('mes', type=int)
         usuario_id = request.args.get('usuario_id', type=int)
+        formato = request.args.get('formato', 'xlsx')
         if not ano or not mes: return jsonify({"msg": "Parâmetros 'ano' e 'mes' são obrigatórios."}), 400
-        query = RegistroPonto.query.join(Usuario).filter(extract('year', RegistroPonto.timestamp) == ano, extract('month', RegistroPonto.timestamp) == mes)
+        if formato not in ('xlsx', 'csv', 'csv.gz'): return jsonify({"msg": "Formato inválido. Use 'xlsx', 'csv' ou 'csv.gz'."}), 400
+        # Só as colunas do relatório, sem montar objetos ORM nem carregar o usuário de cada registro.
+        query = db.session.query(
+            RegistroPonto.id, Usuario.nome_completo, Usuario.username,
+            RegistroPonto.timestamp, RegistroPonto.tipo_registro, RegistroPonto.justificativa
+        ).join(Usuario, RegistroPonto.usuario_id == Usuario.id)
+        try:
+            query = filtrar_periodo(query, ano, mes)
+        except ValueError:
+            return jsonify({"msg": "Período inválido."}), 400
         if usuario_id:
             query = query.filter(RegistroPonto.usuario_id == usuario_id)
-        registros = query.order_by(Usuario.nome_completo, RegistroPonto.timestamp).all()
-        if not registros: return jsonify({"msg": "Nenhum registro encontrado para este período."}), 404
-        dados_para_excel = []
-        for r in registros:
-            timestamp_local = r.timestamp.astimezone(BR_TIMEZONE)
-            dados_para_excel.append({
-                'ID Registro': r.id, 
-                'Funcionário': r.usuario.nome_completo, 
-                'Username': r.usuario.username, 
-                'Data e Hora': timestamp_local.strftime('%Y-%m-%d %H:%M:%S'), 
-                'Tipo': r.tipo_registro, 
-                'Justificativa': r.justificativa
-            })
-        df = pd.DataFrame(dados_para_excel)
-        output = io.BytesIO()
-        writer = pd.ExcelWriter(output, engine='openpyxl')
-        df.to_excel(writer, index=False, sheet_name='Registros de Ponto')
-        writer.close()
-        output.seek(0)
-        return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', as_attachment=True, download_name=f'relatorio_ponto_{ano}_{mes}.xlsx')
+        query = query.order_by(Usuario.nome_completo, RegistroPonto.timestamp)
+        if query.first() is None: return jsonify({"msg": "Nenhum registro encontrado para este período."}), 404
+        maximo_xlsx = app.config['RELATORIO_XLSX_MAX_LINHAS']
+        if formato == 'xlsx' and query.offset(maximo_xlsx).first() is not None:
+            return jsonify({"msg": f"O relatório passa de {maximo_xlsx} linhas; use formato=csv ou formato=csv.gz."}), 400
+        # Cursor do lado do servidor: as linhas chegam do banco em lotes, não todas de uma vez.
+        linhas = (_linha_relatorio(r) for r in query.execution_options(stream_results=True).yield_per(RELATORIO_LOTE))
+        nome_arquivo = f'relatorio_ponto_{ano}_{mes}'
+        if formato == 'xlsx':
+            return send_file(_relatorio_xlsx(linhas), mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', as_attachment=True, download_name=f'{nome_arquivo}.xlsx')
+        comprimir = formato == 'csv.gz'
+        resposta = Response(stream_with_context(_relatorio_csv(linhas, comprimir)), mimetype='application/gzip' if comprimir else 'text/csv; charset=utf-8')
+        resposta.headers['Content-Disposition'] = f'attachment; filename={nome_arquivo}.{formato}'
+        return resposta
 
     return app
 
@@ -0,0 +1,318 @@
+# Arquivo: ponto-api/arquivo.py
+# Arquivamento incremental de registros_ponto e usuarios, no lugar do pg_dump completo diário.
+#
+# Cada mês vira um arquivo registros/AAAA-MM.json.gz em formato colunar (uma lista por
+# coluna) e os usuários um usuarios.json.gz; o manifesto.json guarda o SHA-256 de cada
+# arquivo e a marca d'água da última exportação. A cada execução só são regravados os
+# meses com resumos diários alterados desde a marca (a API atualiza resumos_diarios a
+# cada batida, edição ou exclusão), então o custo acompanha o movimento do dia e não o
+# histórico inteiro. Os arquivos são determinísticos: mês sem mudança real mantém o hash.
+#
+# Uso (com os contêineres no ar):
+#   docker compose exec ponto-api python arquivo.py exportar [--completo]
+#   docker compose exec ponto-api python arquivo.py restaurar 2024-05
+#   docker compose exec ponto-api python arquivo.py consultar 2024-05 --usuario joao > maio.csv
+#   docker compose exec ponto-api python arquivo.py verificar
+
+import argparse
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, text
+from app import (create_app, db, Usuario, RegistroPonto, ResumoDiario, BR_TIMEZONE,
+                 atualizar_resumos_diarios, filtrar_periodo, hora_local, intervalo_periodo)
+
+PASTA_PADRAO = os.environ.get('ARQUIVO_DIR', '/backups/arquivo')
+MANIFESTO = 'manifesto.json'
+VERSAO = 1
+LOTE = 1000
+# A marca d'água fica um pouco antes do início da execução: uma transação que gravou
+# atualizado_em antes disso, mas só fez commit depois da leitura, entra na próxima noite.
+MARGEM = timedelta(minutes=10)
+
+COLUNAS_REGISTROS = ('id', 'usuario_id', 'timestamp', 'tipo_registro', 'justificativa')
+COLUNAS_USUARIOS = ('id', 'nome_completo', 'username', 'password_hash', 'role')
+
+
+class ArquivoInvalido(Exception):
+    pass
+
+
+# --- Arquivos e Manifesto ---
+def _sha256(caminho):
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _gravar_atomico(caminho, dados):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = caminho + '.tmp'
+    with open(temporario, 'wb') as f:
+        f.write(dados)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+
+
+def _gravar_colunas(pasta, relativo, colunas):
+    """Grava {coluna: [valores]} como JSON gzip (mtime fixo) e devolve a entrada do manifesto."""
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as gz:
+        gz.write(json.dumps({"versao": VERSAO, "colunas": colunas}, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    caminho = os.path.join(pasta, relativo)
+    _gravar_atomico(caminho, buffer.getvalue())
+    linhas = len(next(iter(colunas.values()), []))
+    return {"arquivo": relativo, "sha256": _sha256(caminho), "linhas": linhas}
+
+
+def _ler_colunas(pasta, entrada):
+    """Lê um arquivo do manifesto conferindo o SHA-256; devolve as linhas como dicionários."""
+    caminho = os.path.join(pasta, entrada['arquivo'])
+    if not os.path.exists(caminho):
+        raise ArquivoInvalido(f"{entrada['arquivo']} não encontrado.")
+    if _sha256(caminho) != entrada['sha256']:
+        raise ArquivoInvalido(f"{entrada['arquivo']} corrompido: SHA-256 não confere com o manifesto.")
+    with gzip.open(caminho, 'rb') as f:
+        colunas = json.loads(f.read().decode('utf-8'))['colunas']
+    nomes = list(colunas)
+    return [dict(zip(nomes, valores)) for valores in zip(*(colunas[n] for n in nomes))]
+
+
+def ler_manifesto(pasta):
+    caminho = os.path.join(pasta, MANIFESTO)
+    if not os.path.exists(caminho):
+        return {"versao": VERSAO, "marca": None, "usuarios": None, "meses": {}}
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _gravar_manifesto(pasta, manifesto):
+    dados = json.dumps(manifesto, ensure_ascii=False, indent=2, sort_keys=True).encode('utf-8')
+    _gravar_atomico(os.path.join(pasta, MANIFESTO), dados)
+
+
+def _entrada_mes(manifesto, mes):
+    entrada = manifesto['meses'].get(mes)
+    if entrada is None:
+        raise ArquivoInvalido(f"O mês {mes} não está no arquivo.")
+    return entrada
+
+
+# --- Exportação ---
+def _mes(data):
+    return f"{data.year:04d}-{data.month:02d}"
+
+
+def _meses_entre(primeiro, ultimo):
+    ano, mes = primeiro.year, primeiro.month
+    while (ano, mes) <= (ultimo.year, ultimo.month):
+        yield f"{ano:04d}-{mes:02d}"
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+
+def _exportar_usuarios(pasta):
+    colunas = {c: [] for c in COLUNAS_USUARIOS}
+    for usuario in db.session.query(*(getattr(Usuario, c) for c in COLUNAS_USUARIOS)).order_by(Usuario.id):
+        for nome, valor in zip(COLUNAS_USUARIOS, usuario):
+            colunas[nome].append(valor)
+    entrada = _gravar_colunas(pasta, 'usuarios.json.gz', colunas)
+    entrada['ids'] = colunas['id']
+    return entrada
+
+
+def _exportar_mes(pasta, mes):
+    """Lê o mês em lotes, na ordem do índice de timestamp, e grava o arquivo colunar dele."""
+    ano, numero = map(int, mes.split('-'))
+    query = filtrar_periodo(db.session.query(*(getattr(RegistroPonto, c) for c in COLUNAS_REGISTROS)), ano, numero)
+    query = query.order_by(RegistroPonto.timestamp, RegistroPonto.id).execution_options(stream_results=True).yield_per(LOTE)
+    colunas = {c: [] for c in COLUNAS_REGISTROS}
+    for registro in query:
+        for nome, valor in zip(COLUNAS_REGISTROS, registro):
+            colunas[nome].append(hora_local(valor).isoformat() if nome == 'timestamp' else valor)
+    entrada = _gravar_colunas(pasta, f"registros/{mes}.json.gz", colunas)
+    entrada['usuarios'] = sorted(set(colunas['usuario_id']))
+    return entrada
+
+
+def _meses_alterados(manifesto, usuarios):
+    """Meses a regravar: resumos alterados desde a marca e meses de usuários que foram excluídos."""
+    marca = datetime.fromisoformat(manifesto['marca'])
+    meses = {_mes(dia) for (dia,) in db.session.query(ResumoDiario.dia).filter(ResumoDiario.atualizado_em > marca).distinct()}
+    # Excluir um usuário apaga em cascata os resumos dele, então não sobra atualizado_em para olhar.
+    anteriores = set((manifesto.get('usuarios') or {}).get('ids', []))
+    excluidos = anteriores - set(usuarios['ids'])
+    if excluidos:
+        meses |= {mes for mes, entrada in manifesto['meses'].items() if excluidos & set(entrada.get('usuarios', []))}
+    return meses
+
+
+def exportar(pasta, completo=False):
+    """Exporta os meses alterados desde a última marca (ou todos) e atualiza o manifesto."""
+    inicio = datetime.now(BR_TIMEZONE)
+    manifesto = ler_manifesto(pasta)
+    usuarios = _exportar_usuarios(pasta)
+    if completo or not manifesto.get('marca'):
+        primeiro, ultimo = db.session.query(func.min(RegistroPonto.timestamp), func.max(RegistroPonto.timestamp)).one()
+        meses = set(_meses_entre(hora_local(primeiro), hora_local(ultimo))) if primeiro else set()
+    else:
+        meses = _meses_alterados(manifesto, usuarios)
+    manifesto['usuarios'] = usuarios
+    exportados = []
+    for mes in sorted(meses):
+        entrada = _exportar_mes(pasta, mes)
+        # Na primeira exportação não vale a pena guardar os meses vazios do intervalo.
+        if entrada['linhas'] == 0 and mes not in manifesto['meses']:
+            os.remove(os.path.join(pasta, entrada['arquivo']))
+            continue
+        anterior = manifesto['meses'].get(mes, {})
+        if anterior.get('sha256') != entrada['sha256']:
+            entrada['exportado_em'] = inicio.isoformat()
+            manifesto['meses'][mes] = entrada
+            exportados.append(mes)
+    manifesto['versao'] = VERSAO
+    manifesto['marca'] = (inicio - MARGEM).isoformat()
+    _gravar_manifesto(pasta, manifesto)
+    # A leitura foi toda dentro de uma transação; encerra para não segurar a conexão.
+    db.session.rollback()
+    return exportados
+
+
+# --- Restauração e Consulta ---
+def restaurar(pasta, mes):
+    """Substitui os registros do mês no banco pelos do arquivo e recalcula os resumos do mês."""
+    manifesto = ler_manifesto(pasta)
+    registros = _ler_colunas(pasta, _entrada_mes(manifesto, mes))
+    ano, numero = map(int, mes.split('-'))
+    inicio, fim = intervalo_periodo(ano, numero)
+
+    # Usuários excluídos depois do arquivamento voltam a partir do retrato de usuarios.
+    necessarios = {r['usuario_id'] for r in registros}
+    existentes = {i for (i,) in db.session.query(Usuario.id).filter(Usuario.id.in_(necessarios))} if necessarios else set()
+    faltando = necessarios - existentes
+    if faltando:
+        usuarios = [u for u in _ler_colunas(pasta, manifesto['usuarios']) if u['id'] in faltando]
+        if len(usuarios) != len(faltando):
+            raise ArquivoInvalido(f"Usuários {sorted(faltando)} não estão no retrato de usuários.")
+        db.session.execute(Usuario.__table__.insert(), usuarios)
+
+    # Dias que tinham batidas antes da restauração também precisam de resumo novo.
+    dias = {(u, d) for u, d in db.session.query(ResumoDiario.usuario_id, ResumoDiario.dia).filter(
+        ResumoDiario.dia >= inicio.date(), ResumoDiario.dia < fim.date()
+    )}
+    removidos = filtrar_periodo(RegistroPonto.query, ano, numero).delete(synchronize_session=False)
+    for r in registros:
+        r['timestamp'] = datetime.fromisoformat(r['timestamp'])
+        dias.add((r['usuario_id'], r['timestamp'].date()))
+    if registros:
+        db.session.execute(RegistroPonto.__table__.insert(), registros)
+    atualizar_resumos_diarios(dias, current_app.config['JORNADA_DIARIA_MINUTOS'])
+    if db.engine.dialect.name == 'postgresql':
+        # Os ids vieram do arquivo; a sequência precisa continuar depois do maior deles.
+        for tabela in ('usuarios', 'registros_ponto'):
+            db.session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), (SELECT COALESCE(MAX(id), 1) FROM {tabela}))"
+            ))
+    db.session.commit()
+    return {"removidos": removidos, "restaurados": len(registros), "usuarios_recriados": len(faltando)}
+
+
+def consultar(pasta, mes, usuario=None, saida=sys.stdout):
+    """Escreve em CSV os registros arquivados do mês, sem tocar no banco."""
+    manifesto = ler_manifesto(pasta)
+    registros = _ler_colunas(pasta, _entrada_mes(manifesto, mes))
+    usuarios = {u['id']: u for u in _ler_colunas(pasta, manifesto['usuarios'])}
+    escritor = csv.writer(saida)
+    escritor.writerow(['id', 'usuario_id', 'username', 'nome_completo', 'timestamp', 'tipo_registro', 'justificativa'])
+    total = 0
+    for r in registros:
+        dono = usuarios.get(r['usuario_id'], {})
+        if usuario and dono.get('username') != usuario:
+            continue
+        escritor.writerow([r['id'], r['usuario_id'], dono.get('username', ''), dono.get('nome_completo', ''),
+                           r['timestamp'], r['tipo_registro'], r['justificativa'] or ''])
+        total += 1
+    return total
+
+
+def verificar(pasta):
+    """Confere o SHA-256 de todos os arquivos do manifesto; devolve a lista de problemas."""
+    manifesto = ler_manifesto(pasta)
+    entradas = list(manifesto['meses'].values())
+    if manifesto.get('usuarios'):
+        entradas.append(manifesto['usuarios'])
+    problemas = []
+    for entrada in entradas:
+        try:
+            _ler_colunas(pasta, entrada)
+        except ArquivoInvalido as e:
+            problemas.append(str(e))
+    return problemas
+
+
+# --- Linha de Comando ---
+def _segundos_ate(horario):
+    hora, minuto = map(int, horario.split(':'))
+    agora = datetime.now(BR_TIMEZONE)
+    proxima = agora.replace(hour=hora, minute=minuto, second=0, microsecond=0)
+    if proxima <= agora:
+        proxima += timedelta(days=1)
+    return (proxima - agora).total_seconds()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Arquivo incremental mensal dos registros de ponto.")
+    parser.add_argument('--pasta', default=PASTA_PADRAO, help="Pasta do arquivo (padrão: ARQUIVO_DIR ou /backups/arquivo).")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    exportacao = comandos.add_parser('exportar', help="Exporta os meses alterados desde a última execução.")
+    exportacao.add_argument('--completo', action='store_true', help="Regrava todos os meses.")
+    exportacao.add_argument('--diariamente', metavar='HH:MM', help="Fica no ar e exporta todo dia nesse horário (Brasília).")
+    restauracao = comandos.add_parser('restaurar', help="Substitui os registros de um mês pelos do arquivo.")
+    restauracao.add_argument('mes', help="AAAA-MM")
+    consulta = comandos.add_parser('consultar', help="Lista em CSV os registros arquivados de um mês.")
+    consulta.add_argument('mes', help="AAAA-MM")
+    consulta.add_argument('--usuario', help="Só os registros deste username.")
+    comandos.add_parser('verificar', help="Confere os checksums de todos os arquivos.")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.comando == 'consultar':
+            consultar(args.pasta, args.mes, args.usuario)
+            return 0
+        if args.comando == 'verificar':
+            problemas = verificar(args.pasta)
+            for problema in problemas:
+                print(problema, file=sys.stderr)
+            print("Arquivo íntegro." if not problemas else f"{len(problemas)} arquivo(s) com problema.")
+            return 1 if problemas else 0
+
+        app = create_app()
+        with app.app_context():
+            if args.comando == 'restaurar':
+                resultado = restaurar(args.pasta, args.mes)
+                print(f"{args.mes}: {resultado['restaurados']} registros restaurados, {resultado['removidos']} substituídos, "
+                      f"{resultado['usuarios_recriados']} usuários recriados.")
+                return 0
+            while True:
+                if args.diariamente:
+                    time.sleep(_segundos_ate(args.diariamente))
+                meses = exportar(args.pasta, args.completo)
+                print(f"{datetime.now(BR_TIMEZONE):%Y-%m-%d %H:%M} exportação concluída; meses regravados: {', '.join(meses) or 'nenhum'}.", flush=True)
+                if not args.diariamente:
+                    return 0
+    except ArquivoInvalido as e:
+        print(e, file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+# Arquivo: ponto-api/backfill_resumos.py
+# Preenche a tabela resumos_diarios a partir dos registros de ponto já existentes.
+# A API mantém os resumos a cada batida; este script só é necessário uma vez,
+# depois da migração 0002, ou para refazer um período. Pode rodar com a API no ar:
+# grava por upsert e não sobrescreve um resumo que a API atualizou durante a execução.
+#
+# Uso (com os contêineres no ar):
+#   docker compose exec ponto-api python backfill_resumos.py
+#   docker compose exec ponto-api python backfill_resumos.py --desde 2024-01-01
+
+import argparse
+from datetime import datetime
+from sqlalchemy import tuple_
+from app import create_app, db, RegistroPonto, ResumoDiario, BR_TIMEZONE, calcular_resumo, gravar_resumos, hora_local
+
+LOTE = 1000
+# Batidas lidas por consulta; cada consulta termina antes do commit do lote.
+LINHAS_POR_CONSULTA = 10 * LOTE
+
+
+def _dias(query):
+    """Agrupa as batidas, lidas em ordem de (usuario_id, timestamp), por funcionário e dia local."""
+    chave_atual, registros = None, []
+    for usuario_id, timestamp, tipo in query:
+        chave = (usuario_id, hora_local(timestamp).date())
+        if chave != chave_atual and registros:
+            yield chave_atual, registros
+            registros = []
+        chave_atual = chave
+        registros.append((timestamp, tipo))
+    if registros:
+        yield chave_atual, registros
+
+
+def _dias_em_lotes(query, limite=None):
+    """Lê as batidas por keyset em (usuario_id, timestamp), uma consulta nova por lote.
+
+    Nenhum cursor fica aberto entre lotes, então quem consome pode dar commit. O último
+    dia de um lote cheio pode estar incompleto: ele é relido no começo do lote seguinte.
+    """
+    limite = limite or LINHAS_POR_CONSULTA
+    depois = None
+    while True:
+        consulta = query
+        if depois is not None:
+            consulta = consulta.filter(tuple_(RegistroPonto.usuario_id, RegistroPonto.timestamp) >= depois)
+        linhas = consulta.order_by(RegistroPonto.usuario_id, RegistroPonto.timestamp).limit(limite).all()
+        dias = list(_dias(linhas))
+        if len(linhas) < limite:
+            yield dias
+            return
+        if len(dias) == 1:
+            # Um único dia com mais batidas que o lote: relê com um limite maior.
+            limite *= 2
+            continue
+        (usuario_id, _), registros = dias.pop()
+        depois = (usuario_id, registros[0][0])
+        yield dias
+
+
+def preencher_resumos(desde=None, app=None):
+    app = app or create_app()
+    with app.app_context():
+        jornada = app.config['JORNADA_DIARIA_MINUTOS']
+        query = db.session.query(RegistroPonto.usuario_id, RegistroPonto.timestamp, RegistroPonto.tipo_registro)
+        resumos = ResumoDiario.query
+        if desde:
+            inicio = datetime.combine(desde, datetime.min.time(), tzinfo=BR_TIMEZONE)
+            query = query.filter(RegistroPonto.timestamp >= inicio)
+            resumos = resumos.filter(ResumoDiario.dia >= desde)
+
+        print("Recalculando resumos diários...")
+        # Cada lote é um upsert com commit próprio: nenhuma linha some durante a execução
+        # e os locks duram só um lote, sem segurar as batidas da API.
+        agora = datetime.now(BR_TIMEZONE)
+        total = 0
+        for dias in _dias_em_lotes(query):
+            linhas = []
+            for (usuario_id, dia), registros in dias:
+                linha = calcular_resumo(registros, jornada)
+                linha.update(usuario_id=usuario_id, dia=dia, atualizado_em=agora)
+                linhas.append(linha)
+            for i in range(0, len(linhas), LOTE):
+                gravar_resumos(linhas[i:i + LOTE], somente_mais_novos=True)
+            db.session.commit()
+            total += len(linhas)
+        # Dias que ficaram sem batidas e que nem o recálculo nem a API tocaram: zerados, como faz a API.
+        zerados = resumos.filter(ResumoDiario.atualizado_em < agora, ResumoDiario.total_registros > 0).update(
+            dict(calcular_resumo([], jornada), atualizado_em=agora), synchronize_session=False)
+        db.session.commit()
+        print(f"{total} resumos diários gravados, {zerados} zerados.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Preenche resumos_diarios a partir de registros_ponto")
+    parser.add_argument("--desde", type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(),
+                        help="recalcula só a partir deste dia (AAAA-MM-DD)")
+    args = parser.parse_args()
+    preencher_resumos(args.desde)
@@ -0,0 +1,39 @@
+# Arquivo: ponto-api/bench/servidor.py
+# Aplicação da API de ponto para o benchmark (ver rush_bench.py).
+# Usa o banco de DATABASE_URL, seja SQLite ou Postgres; no SQLite o pool do
+# config.py não se aplica, então as conexões só ganham um timeout de lock maior.
+#
+# Sozinho: python bench/servidor.py --port 5001
+# Com gunicorn: gunicorn -c gunicorn.conf.py --pythonpath bench servidor:app
+
+import os
+import sys
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+from app import create_app  # noqa: E402
+from config import Config, DevelopmentConfig  # noqa: E402
+
+
+class ConfigBench(Config):
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(API_DIR, 'bench.db'))
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'bench')
+    JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'bench')
+    if SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+        # Com várias threads gravando, o SQLite espera o lock em vez de falhar na hora.
+        SQLALCHEMY_ENGINE_OPTIONS = {"connect_args": {"timeout": 30, "check_same_thread": False}}
+    else:
+        SQLALCHEMY_ENGINE_OPTIONS = DevelopmentConfig.SQLALCHEMY_ENGINE_OPTIONS
+
+
+app = create_app(ConfigBench)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="API de ponto para o benchmark")
+    parser.add_argument("--port", type=int, default=5001)
+    args = parser.parse_args()
+    app.run(host='127.0.0.1', port=args.port, threaded=True)
@@ -0,0 +1,158 @@
+# Arquivo: ponto-api/cache_hoje.py
+# Cache da resposta do /me/hoje por (usuário, dia no fuso de Brasília).
+# O painel do funcionário consulta esse endpoint o tempo todo, mas o conteúdo só
+# muda quando o próprio usuário bate o ponto ou quando um admin edita os registros
+# dele; nos dois casos a entrada é invalidada depois do commit.
+#
+# Cada entrada leva a versão da chave lida antes da consulta ao banco; invalidar
+# incrementa a versão, então um GET concorrente que leu o banco antes da batida
+# não consegue recolocar o valor antigo.
+#
+# Sem CACHE_REDIS_URL o cache fica na memória do processo (LRU com TTL), o que só
+# é seguro com um worker: com vários, ele é desligado e é preciso usar o Redis.
+
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # só necessária com CACHE_REDIS_URL (instalada pelo requirements.txt)
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class _MemoriaLRU:
+    def __init__(self, max_itens, ttl):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._versoes = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _limitar(itens, maximo):
+        while len(itens) > maximo:
+            itens.popitem(last=False)
+
+    def ler(self, chave):
+        with self._lock:
+            versao = self._versoes.get(chave, 0)
+            item = self._itens.get(chave)
+            if item is None:
+                return None, versao
+            valor, versao_valor, expira = item
+            if expira < time.monotonic() or versao_valor != versao:
+                del self._itens[chave]
+                return None, versao
+            self._itens.move_to_end(chave)
+            return valor, versao
+
+    def gravar(self, chave, valor, versao):
+        with self._lock:
+            if versao != self._versoes.get(chave, 0):
+                return
+            self._itens[chave] = (valor, versao, time.monotonic() + self.ttl)
+            self._itens.move_to_end(chave)
+            self._limitar(self._itens, self.max_itens)
+
+    def invalidar(self, chave):
+        with self._lock:
+            self._itens.pop(chave, None)
+            self._versoes[chave] = self._versoes.get(chave, 0) + 1
+            self._versoes.move_to_end(chave)
+            self._limitar(self._versoes, self.max_itens)
+
+
+class _Redis:
+    def __init__(self, url, ttl, prefixo):
+        if redis is None:
+            raise RuntimeError("CACHE_REDIS_URL definido, mas o pacote 'redis' não está instalado.")
+        self.ttl = ttl
+        self.prefixo = prefixo
+        self._cliente = redis.Redis.from_url(url, socket_timeout=0.5)
+
+    # Falhas do Redis não derrubam o endpoint: sem cache, a consulta vai ao banco.
+    # O valor é gravado como "<versão>:<json>"; a versão fica em "<chave>:v".
+    def ler(self, chave):
+        try:
+            valor, versao = self._cliente.mget(self.prefixo + chave, self.prefixo + chave + ':v')
+        except redis.RedisError:
+            return None, None
+        versao = int(versao or 0)
+        if valor is None:
+            return None, versao
+        versao_valor, _, dados = valor.partition(b':')
+        return (dados if int(versao_valor) == versao else None), versao
+
+    def gravar(self, chave, valor, versao):
+        try:
+            self._cliente.set(self.prefixo + chave, f"{versao}:{valor}", ex=self.ttl)
+        except redis.RedisError:
+            pass
+
+    def invalidar(self, chave):
+        try:
+            with self._cliente.pipeline() as pipe:
+                pipe.delete(self.prefixo + chave)
+                pipe.incr(self.prefixo + chave + ':v')
+                # A versão vive mais que qualquer valor gravado com a versão anterior.
+                pipe.expire(self.prefixo + chave + ':v', 2 * self.ttl)
+                pipe.execute()
+        except redis.RedisError:
+            logger.warning(f"Não foi possível invalidar {chave} no Redis; a entrada expira em {self.ttl} s")
+
+
+class CacheHoje:
+    """Extensão Flask com o payload do /me/hoje por usuário e dia.
+
+    CACHE_HOJE_TTL (segundos) limita por quanto tempo uma entrada é servida e
+    CACHE_HOJE_MAX quantas entradas cabem na memória; CACHE_HOJE_TTL = 0 desliga o cache.
+    Sem CACHE_REDIS_URL e com WEB_WORKERS > 1 o cache também fica desligado.
+    """
+
+    def __init__(self, app=None):
+        self._backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        ttl = app.config.get('CACHE_HOJE_TTL', 60)
+        url = app.config.get('CACHE_REDIS_URL')
+        if not ttl:
+            self._backend = None
+        elif url:
+            self._backend = _Redis(url, ttl, app.config.get('CACHE_REDIS_PREFIXO', 'ponto:hoje:'))
+        elif app.config.get('WEB_WORKERS', 1) > 1:
+            # Cada worker teria a sua cópia e a invalidação só alcançaria a do próprio processo.
+            logger.warning("Cache do /me/hoje desligado: vários workers sem CACHE_REDIS_URL")
+            self._backend = None
+        else:
+            self._backend = _MemoriaLRU(app.config.get('CACHE_HOJE_MAX', 10000), ttl)
+        app.extensions['cache_hoje'] = self
+
+    @staticmethod
+    def _chave(usuario_id, dia):
+        return f"{usuario_id}:{dia.isoformat()}"
+
+    def ler(self, usuario_id, dia):
+        """Retorna (payload ou None, versão); a versão deve ser repassada ao gravar."""
+        if self._backend is None:
+            return None, None
+        valor, versao = self._backend.ler(self._chave(usuario_id, dia))
+        return (json.loads(valor) if valor is not None else None), versao
+
+    def obter(self, usuario_id, dia):
+        return self.ler(usuario_id, dia)[0]
+
+    def gravar(self, usuario_id, dia, payload, versao):
+        """Grava o payload lido do banco; é ignorado se a chave foi invalidada depois de ler a versão."""
+        if self._backend is not None and versao is not None:
+            self._backend.gravar(self._chave(usuario_id, dia), json.dumps(payload), versao)
+
+    def invalidar(self, usuario_id, dia):
+        if self._backend is not None:
+            self._backend.invalidar(self._chave(usuario_id, dia))
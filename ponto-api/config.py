@@ -2,6 +2,13 @@
 # Este arquivo centraliza as configurações da nossa aplicação.
 
 import os
+from datetime import timedelta
+
+def _conexoes_por_worker():
+    return max(1, int(os.environ.get('DB_CONEXOES_TOTAL', 40)) // int(os.environ.get('WEB_WORKERS', 1)))
+
+def _pool_size():
+    return int(os.environ.get('DB_POOL_SIZE', min(int(os.environ.get('WEB_THREADS', 4)), _conexoes_por_worker())))
 
 class Config:
     """Configuração base que se aplica a todos os ambientes."""
@@ -10,16 +17,63 @@ class Config:
     
     # Lê a chave secreta do JWT do ambiente.
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
+
+    # O access token é curto; o frontend o renova com o refresh token em /token/refresh.
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.environ.get('JWT_ACCESS_MINUTOS', 15)))
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.environ.get('JWT_REFRESH_DIAS', 7)))
+
+    # Custo do bcrypt nos hashes novos; hashes com outro custo são regravados no login.
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    # Processos dedicados ao bcrypt e quantos hashes podem esperar por eles. Com vários
+    # workers, BCRYPT_PROCESSOS_TOTAL limita os hashes simultâneos somando todos, por meio
+    # de vagas em BCRYPT_VAGAS_DIR (ambos exportados pelo gunicorn.conf.py).
+    BCRYPT_PROCESSOS = int(os.environ.get('BCRYPT_PROCESSOS', max(1, (os.cpu_count() or 2) // 2)))
+    BCRYPT_PROCESSOS_TOTAL = int(os.environ.get('BCRYPT_PROCESSOS_TOTAL', 0)) or None
+    BCRYPT_VAGAS_DIR = os.environ.get('BCRYPT_VAGAS_DIR')
+    BCRYPT_FILA_MAX = int(os.environ.get('BCRYPT_FILA_MAX', 64))
+
+    # Cache do /me/hoje: TTL em segundos (0 desliga) e tamanho máximo na memória.
+    # Com vários workers (WEB_WORKERS, exportado pelo gunicorn.conf.py) o cache em memória
+    # fica desligado; aponte CACHE_REDIS_URL para um Redis para todos compartilharem as entradas.
+    WEB_WORKERS = int(os.environ.get('WEB_WORKERS', 1))
+    CACHE_HOJE_TTL = int(os.environ.get('CACHE_HOJE_TTL', 60))
+    CACHE_HOJE_MAX = int(os.environ.get('CACHE_HOJE_MAX', 10000))
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+
+    # Métricas: threads por worker (exportado pelo gunicorn.conf.py) e diretório onde
+    # cada worker grava seu retrato para o /metrics somar todos (vazio = só o processo atual).
+    WEB_THREADS = int(os.environ.get('WEB_THREADS', 4))
+    METRICS_DIR = os.environ.get('METRICS_DIR')
     
     # Desativa uma funcionalidade do SQLAlchemy que não usamos e que consome recursos.
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Jornada diária (em minutos) acima da qual o resumo diário conta hora extra.
+    JORNADA_DIARIA_MINUTOS = int(os.environ.get('JORNADA_DIARIA_MINUTOS', 480))
+
+    # O XLSX é montado inteiro antes do envio; acima deste número de linhas o
+    # /admin/relatorio recusa a planilha e indica formato=csv ou csv.gz (enviados em streaming).
+    RELATORIO_XLSX_MAX_LINHAS = int(os.environ.get('RELATORIO_XLSX_MAX_LINHAS', 200000))
+
 class DevelopmentConfig(Config):
     """Configuração para o ambiente de desenvolvimento (o que usamos no Docker)."""
     # Lê a URL de conexão com o banco de dados PostgreSQL do ambiente.
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     DEBUG = False
 
+    # Pool de conexões por processo: DB_CONEXOES_TOTAL (bem abaixo do max_connections=100
+    # do Postgres, que também atende backups e migrações) dividido entre os WEB_WORKERS;
+    # uma conexão fixa por thread (WEB_THREADS) até essa cota e o resto como folga para picos.
+    # pre_ping descarta conexões mortas (ex.: Postgres reiniciado) antes de usá-las
+    # e recycle renova as antigas antes de algum firewall derrubá-las em silêncio.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": _pool_size(),
+        "max_overflow": int(os.environ.get('DB_MAX_OVERFLOW', max(0, _conexoes_por_worker() - _pool_size()))),
+        "pool_timeout": float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        "pool_recycle": int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        "pool_pre_ping": True,
+    }
+
 class TestingConfig(Config):
     """Configuração específica para quando estivermos rodando os testes automatizados."""
     TESTING = True
@@ -29,4 +83,8 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     
     # A chave JWT pode ser fixa para os testes, não precisa ser um segredo.
-    JWT_SECRET_KEY = 'chave_secreta_para_testes'
\ No newline at end of file
+    JWT_SECRET_KEY = 'chave_secreta_para_testes'
+
+    # Hashes baratos e sem pool de processos para os testes rodarem rápido.
+    BCRYPT_LOG_ROUNDS = 4
+    BCRYPT_PROCESSOS = 0
@@ -1,5 +1,5 @@
 
-from app import create_app, db, bcrypt, Usuario
+from app import create_app, db, senhas, Usuario
 
 # --- LISTA DE ADMINISTRADORES A SEREM CRIADOS ---
 admins = [
@@ -35,7 +35,8 @@ def criar_admins():
                 print(f"Usuário '{admin_data['username']}' já existe. Pulando.")
                 continue
 
-            hashed_password = bcrypt.generate_password_hash(admin_data['password']).decode('utf-8')
+            # Mesmo pool e mesmo work factor da API (BCRYPT_LOG_ROUNDS).
+            hashed_password = senhas.gerar(admin_data['password'])
 
             novo_admin = Usuario(
                 nome_completo=admin_data['nome_completo'],
@@ -0,0 +1,70 @@
+# Arquivo: ponto-api/gunicorn.conf.py
+# Configuração do gunicorn para a API de ponto em produção.
+# Workers em processos separados usam todos os núcleos; threads por worker
+# atendem as requisições que esperam o Postgres. Tudo ajustável pelo ambiente.
+
+import os
+
+
+def nucleos_disponiveis():
+    """Núcleos que o contêiner pode usar: afinidade (cpuset) e cota do cgroup v2 (--cpus)."""
+    nucleos = len(os.sched_getaffinity(0))
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            cota, periodo = f.read().split()
+        if cota != 'max':
+            nucleos = min(nucleos, max(1, int(cota) // int(periodo)))
+    except (OSError, ValueError):
+        pass
+    return nucleos
+
+
+nucleos = nucleos_disponiveis()
+bind = os.environ.get('WEB_BIND', '0.0.0.0:5001')
+worker_class = 'gthread'
+# 2 × núcleos + 1, limitado por WEB_WORKERS_MAX: cada worker custa memória e conexões do banco.
+workers = int(os.environ.get('WEB_WORKERS', min(nucleos * 2 + 1, int(os.environ.get('WEB_WORKERS_MAX', 9)))))
+threads = int(os.environ.get('WEB_THREADS', 4))
+# O pool do SQLAlchemy (config.py) divide DB_CONEXOES_TOTAL entre os workers e usa as
+# threads de cada um; com mais de um worker, o cache do /me/hoje exige o Redis (ver cache_hoje.py).
+os.environ['WEB_THREADS'] = str(threads)
+os.environ['WEB_WORKERS'] = str(workers)
+# Retratos das métricas de cada worker, somados pelo /metrics (ver metrics.py).
+os.environ.setdefault('METRICS_DIR', '/tmp/ponto-api-metrics')
+# bcrypt: no máximo BCRYPT_PROCESSOS_TOTAL hashes ao mesmo tempo somando todos os workers
+# (padrão: metade dos núcleos, para o /ponto/registrar nunca ficar sem CPU num pico de login).
+# O limite global vem das vagas em BCRYPT_VAGAS_DIR; cada worker mantém um pool pequeno.
+bcrypt_total = int(os.environ.get('BCRYPT_PROCESSOS_TOTAL', max(1, nucleos // 2)))
+os.environ['BCRYPT_PROCESSOS_TOTAL'] = str(bcrypt_total)
+os.environ.setdefault('BCRYPT_PROCESSOS', str(max(1, bcrypt_total // workers)))
+os.environ.setdefault('BCRYPT_VAGAS_DIR', '/tmp/ponto-api-bcrypt')
+
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))
+# SIGTERM (docker stop): espera as requisições em andamento terminarem.
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+# Recicla workers aos poucos para conter vazamentos de memória; o jitter evita todos de uma vez.
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('WEB_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    # Contadores de uma execução anterior não devem ser somados aos novos.
+    from metrics import limpar_diretorio
+    limpar_diretorio(os.environ['METRICS_DIR'])
+
+
+def worker_exit(server, worker):
+    # Fecha o pool do bcrypt e devolve as conexões do banco antes de o processo sair.
+    from app import db, senhas
+    senhas.parar()
+    app = getattr(worker, 'wsgi', None)
+    if app is not None:
+        # Último retrato das métricas, para nada do que este worker contou se perder.
+        app.extensions['metricas'].gravar_retrato()
+        with app.app_context():
+            db.engine.dispose()
@@ -0,0 +1,45 @@
+# Arquivo: ponto-api/migrate.py
+# Aplica no banco existente as migrações SQL da pasta migrations/, em ordem.
+# Cada arquivo é aplicado uma única vez; os aplicados ficam em schema_migrations.
+#
+# Uso (com os contêineres no ar):
+#   docker compose exec ponto-api python migrate.py
+
+import os
+from sqlalchemy import text
+from app import create_app, db
+
+PASTA_MIGRACOES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+def _comandos(caminho):
+    """Separa o arquivo em comandos, ignorando comentários e linhas vazias."""
+    with open(caminho, encoding='utf-8') as f:
+        linhas = [l for l in f.read().splitlines() if not l.strip().startswith('--')]
+    return [c.strip() for c in '\n'.join(linhas).split(';') if c.strip()]
+
+
+def aplicar_migracoes():
+    app = create_app()
+    with app.app_context():
+        # Fora de transação: CREATE INDEX CONCURRENTLY não pode rodar dentro de uma.
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conexao:
+            conexao.execute(text(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "versao VARCHAR(255) PRIMARY KEY, aplicada_em TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now())"
+            ))
+            aplicadas = {linha[0] for linha in conexao.execute(text("SELECT versao FROM schema_migrations"))}
+            pendentes = sorted(n for n in os.listdir(PASTA_MIGRACOES) if n.endswith('.sql') and n not in aplicadas)
+            if not pendentes:
+                print("Nenhuma migração pendente.")
+                return
+            for nome in pendentes:
+                print(f"Aplicando {nome}...")
+                for comando in _comandos(os.path.join(PASTA_MIGRACOES, nome)):
+                    conexao.execute(text(comando))
+                conexao.execute(text("INSERT INTO schema_migrations (versao) VALUES (:versao)"), {"versao": nome})
+            print("Migrações aplicadas com sucesso.")
+
+
+if __name__ == '__main__':
+    aplicar_migracoes()
@@ -0,0 +1,10 @@
+-- Índices para os filtros por período em registros_ponto.
+-- Os filtros usam intervalos de timestamp (>= início, < fim), que o PostgreSQL
+-- resolve com estes índices em vez de varrer a tabela inteira.
+-- CONCURRENTLY evita bloquear as escritas do ponto enquanto o índice é criado.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_registros_ponto_usuario_timestamp
+    ON registros_ponto (usuario_id, "timestamp");
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_registros_ponto_timestamp
+    ON registros_ponto ("timestamp");
@@ -0,0 +1,22 @@
+-- Tabela de resumo diário por funcionário (horas trabalhadas, almoço e extras).
+-- É mantida pela API a cada batida ou edição de registro; para preencher o
+-- histórico já existente, rode depois: python backfill_resumos.py
+
+CREATE TABLE IF NOT EXISTS resumos_diarios (
+    usuario_id INTEGER NOT NULL REFERENCES usuarios (id) ON DELETE CASCADE,
+    dia DATE NOT NULL,
+    entrada TIMESTAMP WITH TIME ZONE,
+    saida_almoco TIMESTAMP WITH TIME ZONE,
+    volta_almoco TIMESTAMP WITH TIME ZONE,
+    saida TIMESTAMP WITH TIME ZONE,
+    minutos_trabalhados INTEGER NOT NULL DEFAULT 0,
+    minutos_almoco INTEGER NOT NULL DEFAULT 0,
+    minutos_extras INTEGER NOT NULL DEFAULT 0,
+    total_registros INTEGER NOT NULL DEFAULT 0,
+    completo BOOLEAN NOT NULL DEFAULT FALSE,
+    atualizado_em TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (usuario_id, dia)
+);
+
+CREATE INDEX IF NOT EXISTS ix_resumos_diarios_dia
+    ON resumos_diarios (dia);
@@ -0,0 +1,10 @@
+-- Lista de refresh tokens revogados (já usados na rotação ou encerrados no logout).
+-- Cada linha só precisa existir até o token expirar; a API apaga as vencidas.
+
+CREATE TABLE IF NOT EXISTS tokens_revogados (
+    jti VARCHAR(36) PRIMARY KEY,
+    expira_em TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_tokens_revogados_expira_em
+    ON tokens_revogados (expira_em);
@@ -0,0 +1,6 @@
+-- Índice para o arquivamento incremental (arquivo.py): a cada noite ele procura
+-- os resumos alterados desde a última marca para saber quais meses regravar.
+-- CONCURRENTLY evita bloquear as batidas enquanto o índice é criado.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_resumos_diarios_atualizado_em
+    ON resumos_diarios (atualizado_em);
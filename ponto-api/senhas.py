@@ -0,0 +1,148 @@
+# Arquivo: ponto-api/senhas.py
+# Hash e verificação de senhas com bcrypt fora das threads que atendem requisições.
+# O bcrypt é CPU puro e segura o GIL; às 8h, com todo mundo fazendo login, ele
+# travava o /ponto/registrar. Aqui ele roda em um pool de processos de tamanho
+# fixo, com uma fila limitada, e o custo (work factor) vem da configuração.
+# Com vários workers do gunicorn, vagas travadas por flock limitam quantos hashes
+# rodam ao mesmo tempo somando todos os workers (BCRYPT_PROCESSOS_TOTAL).
+
+import os
+import time
+import fcntl
+import random
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+
+def _bytes(senha):
+    # O bcrypt só usa os 72 primeiros bytes; versões novas recusam senhas maiores.
+    return senha.encode('utf-8')[:72]
+
+
+def _gerar(senha, rounds):
+    return bcrypt.hashpw(_bytes(senha), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _verificar(senha, password_hash):
+    try:
+        return bcrypt.checkpw(_bytes(senha), password_hash.encode('utf-8'))
+    except ValueError:
+        # Hash corrompido ou em formato desconhecido.
+        return False
+
+
+def rounds_do_hash(password_hash):
+    """Work factor gravado no hash ('$2b$12$...' -> 12); None se o formato não for reconhecido."""
+    partes = (password_hash or '').split('$')
+    return int(partes[2]) if len(partes) > 3 and partes[2].isdigit() else None
+
+
+class VagasEntreProcessos:
+    """Semáforo entre processos: uma vaga é um arquivo travado com flock.
+
+    Não depende de um processo pai em comum e a trava é liberada pelo sistema se
+    o processo morrer segurando a vaga.
+    """
+
+    def __init__(self, diretorio, total, espera_max=0.05):
+        os.makedirs(diretorio, exist_ok=True)
+        self.caminhos = [os.path.join(diretorio, f"vaga-{i}.lock") for i in range(max(1, total))]
+        self.espera_max = espera_max
+        self._local = threading.local()
+
+    def _tentar(self):
+        inicio = random.randrange(len(self.caminhos))
+        for i in range(len(self.caminhos)):
+            fd = os.open(self.caminhos[(inicio + i) % len(self.caminhos)], os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    def __enter__(self):
+        espera = 0.001
+        fd = self._tentar()
+        while fd is None:
+            time.sleep(espera)
+            espera = min(espera * 2, self.espera_max)
+            fd = self._tentar()
+        self._local.fd = fd
+        return self
+
+    def __exit__(self, *exc):
+        # Fechar o descritor libera o flock.
+        os.close(self._local.fd)
+        self._local.fd = None
+
+
+class HashSenhas:
+    """Extensão Flask que executa o bcrypt em um ProcessPoolExecutor limitado.
+
+    BCRYPT_LOG_ROUNDS define o custo dos hashes novos; BCRYPT_PROCESSOS o tamanho do
+    pool (0 = na própria thread, usado nos testes) e BCRYPT_FILA_MAX quantos hashes
+    podem esperar por um processo antes de a requisição ficar bloqueada. Com
+    BCRYPT_VAGAS_DIR, no máximo BCRYPT_PROCESSOS_TOTAL hashes rodam ao mesmo tempo
+    entre todos os processos que usam o diretório.
+    """
+
+    def __init__(self, app=None):
+        self.rounds = 12
+        self.processos = 0
+        self._fila = None
+        self._vagas = None
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.processos = app.config.get('BCRYPT_PROCESSOS', 0)
+        self._fila = threading.BoundedSemaphore(max(1, app.config.get('BCRYPT_FILA_MAX', 64)))
+        diretorio = app.config.get('BCRYPT_VAGAS_DIR')
+        if self.processos and diretorio:
+            self._vagas = VagasEntreProcessos(diretorio, app.config.get('BCRYPT_PROCESSOS_TOTAL') or self.processos)
+        app.extensions['hash_senhas'] = self
+
+    def _executor(self):
+        # Criado sob demanda e refeito após um fork (ex.: workers do gunicorn). O worker
+        # gthread já tem outras threads: o forkserver evita herdar locks segurados por elas.
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.processos,
+                                                 mp_context=multiprocessing.get_context('forkserver'))
+                self._pid = os.getpid()
+            return self._pool
+
+    def _executar(self, funcao, *args):
+        if not self.processos:
+            return funcao(*args)
+        with self._fila:
+            if self._vagas is None:
+                return self._executor().submit(funcao, *args).result()
+            with self._vagas:
+                return self._executor().submit(funcao, *args).result()
+
+    def gerar(self, senha):
+        return self._executar(_gerar, senha, self.rounds)
+
+    def verificar(self, senha, password_hash):
+        if not senha or not password_hash:
+            return False
+        return self._executar(_verificar, senha, password_hash)
+
+    def precisa_rehash(self, password_hash):
+        """True se o hash foi gerado com um work factor diferente do configurado."""
+        return rounds_do_hash(password_hash) != self.rounds
+
+    def parar(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -1,5 +1,8 @@
+import json
+from datetime import datetime
+
 import pytest
-from app import create_app, db, Usuario, bcrypt
+from app import create_app, db, Usuario, RegistroPonto, senhas, BR_TIMEZONE
 from config import TestingConfig
 
 @pytest.fixture(scope='module')
@@ -10,10 +13,10 @@ def test_app():
     with app.app_context():
         db.create_all()
         
-        hashed_password_admin = bcrypt.generate_password_hash('senha_admin').decode('utf-8')
+        hashed_password_admin = senhas.gerar('senha_admin')
         admin = Usuario(nome_completo='Admin de Teste', username='testadmin', password_hash=hashed_password_admin, role='admin')
         
-        hashed_password_func = bcrypt.generate_password_hash('senha_func').decode('utf-8')
+        hashed_password_func = senhas.gerar('senha_func')
         func = Usuario(nome_completo='Func de Teste', username='testfunc', password_hash=hashed_password_func, role='funcionario')
 
         db.session.add(admin)
@@ -29,3 +32,22 @@ def test_app():
 def test_client(test_app):
     """Cria um cliente de teste para fazer requisições à API."""
     return test_app.test_client()
+
+@pytest.fixture(scope='module')
+def token_admin(test_client):
+    """Token de acesso do administrador de teste."""
+    login_res = test_client.post('/login', data=json.dumps({'username': 'testadmin', 'password': 'senha_admin'}), content_type='application/json')
+    return json.loads(login_res.data)['access_token']
+
+@pytest.fixture(scope='module')
+def criar_registros(test_app):
+    """Cria batidas nos dias 1 a 3 do mês para os usuários indicados (todos, se None)."""
+    def _criar(ano, mes, usernames=None, batidas=((8, 'entrada'),)):
+        with test_app.app_context():
+            consulta = Usuario.query if usernames is None else Usuario.query.filter(Usuario.username.in_(usernames))
+            for usuario in consulta.order_by(Usuario.id).all():
+                for dia in range(1, 4):
+                    for hora, tipo in batidas:
+                        db.session.add(RegistroPonto(usuario_id=usuario.id, tipo_registro=tipo, timestamp=datetime(ano, mes, dia, hora, 0, tzinfo=BR_TIMEZONE)))
+            db.session.commit()
+    return _criar
@@ -0,0 +1,54 @@
+import io
+import os
+from datetime import datetime
+
+import pytest
+
+from app import db, Usuario, RegistroPonto, ResumoDiario, BR_TIMEZONE, atualizar_resumos_diarios
+from arquivo import exportar, restaurar, consultar, verificar, ler_manifesto, ArquivoInvalido
+
+
+def _bater(usuario_id, *horarios):
+    for ano, mes, dia, hora, tipo in horarios:
+        db.session.add(RegistroPonto(usuario_id=usuario_id, tipo_registro=tipo, timestamp=datetime(ano, mes, dia, hora, tzinfo=BR_TIMEZONE)))
+    atualizar_resumos_diarios({(usuario_id, datetime(a, m, d).date()) for a, m, d, _, _ in horarios})
+    db.session.commit()
+
+
+def test_exportacao_incremental_e_restauracao(test_app, tmp_path):
+    """Testa se só o mês alterado é regravado, se a consulta lê o arquivo e se a restauração devolve o mês ao banco."""
+    pasta = str(tmp_path)
+    func = Usuario.query.filter_by(username='testfunc').first()
+    _bater(func.id, (2024, 5, 6, 8, 'entrada'), (2024, 5, 6, 17, 'saida'), (2024, 6, 3, 8, 'entrada'), (2024, 6, 3, 18, 'saida'))
+
+    assert exportar(pasta) == ['2024-05', '2024-06']
+    manifesto = ler_manifesto(pasta)
+    assert manifesto['meses']['2024-06']['linhas'] == 2
+    assert manifesto['marca'] is not None
+    # Nada mudou de verdade: os arquivos saem iguais e nenhum mês é regravado.
+    assert exportar(pasta) == []
+
+    maio = RegistroPonto.query.filter_by(usuario_id=func.id, tipo_registro='saida').order_by(RegistroPonto.timestamp).first()
+    db.session.delete(maio)
+    atualizar_resumos_diarios({(func.id, datetime(2024, 5, 6).date())})
+    db.session.commit()
+    assert exportar(pasta) == ['2024-05']
+    assert ler_manifesto(pasta)['meses']['2024-05']['linhas'] == 1
+
+    saida = io.StringIO()
+    assert consultar(pasta, '2024-06', usuario='testfunc', saida=saida) == 2
+    assert saida.getvalue().splitlines()[1].split(',')[2:6] == ['testfunc', 'Func de Teste', '2024-06-03T08:00:00-03:00', 'entrada']
+    assert verificar(pasta) == []
+
+    # Perde o mês de junho no banco e o recupera do arquivo, com o resumo recalculado.
+    RegistroPonto.query.filter(RegistroPonto.timestamp >= datetime(2024, 6, 1, tzinfo=BR_TIMEZONE)).delete()
+    db.session.commit()
+    assert restaurar(pasta, '2024-06')['restaurados'] == 2
+    assert RegistroPonto.query.filter(RegistroPonto.timestamp >= datetime(2024, 6, 1, tzinfo=BR_TIMEZONE)).count() == 2
+    assert db.session.get(ResumoDiario, (func.id, datetime(2024, 6, 3).date())).minutos_trabalhados == 600
+
+    with open(os.path.join(pasta, 'registros', '2024-06.json.gz'), 'ab') as f:
+        f.write(b'lixo')
+    assert len(verificar(pasta)) == 1
+    with pytest.raises(ArquivoInvalido):
+        restaurar(pasta, '2024-06')
@@ -40,4 +40,81 @@ def test_criar_usuario_admin(test_client):
                                  content_type='application/json')
     assert response.status_code == 201
     data = json.loads(response.data)
-    assert data['msg'] == 'Usuário criado com sucesso!'
\ No newline at end of file
+    assert data['msg'] == 'Usuário criado com sucesso!'
+
+
+def test_refresh_token_com_rotacao(test_client):
+    """Testa se o refresh token renova a sessão uma única vez e se o logout o revoga."""
+    login_res = test_client.post('/login', data=json.dumps({'username': 'testfunc', 'password': 'senha_func'}), content_type='application/json')
+    refresh = json.loads(login_res.data)['refresh_token']
+
+    response = test_client.post('/token/refresh', headers={'Authorization': f'Bearer {refresh}'})
+    assert response.status_code == 200
+    novos = json.loads(response.data)
+    assert test_client.get('/me/hoje', headers={'Authorization': f"Bearer {novos['access_token']}"}).status_code == 200
+
+    # O refresh token antigo foi rotacionado e não vale mais.
+    assert test_client.post('/token/refresh', headers={'Authorization': f'Bearer {refresh}'}).status_code == 401
+
+    assert test_client.post('/logout', headers={'Authorization': f"Bearer {novos['refresh_token']}"}).status_code == 200
+    assert test_client.post('/token/refresh', headers={'Authorization': f"Bearer {novos['refresh_token']}"}).status_code == 401
+
+
+def test_rehash_no_login_quando_o_custo_muda(test_app, test_client):
+    """Testa se o login regrava o hash com o work factor configurado."""
+    from app import db, Usuario, senhas
+    from senhas import _gerar, rounds_do_hash
+    with test_app.app_context():
+        user = Usuario.query.filter_by(username='testfunc').first()
+        user.password_hash = _gerar('senha_func', 5)
+        db.session.commit()
+    response = test_client.post('/login', data=json.dumps({'username': 'testfunc', 'password': 'senha_func'}), content_type='application/json')
+    assert response.status_code == 200
+    with test_app.app_context():
+        assert rounds_do_hash(Usuario.query.filter_by(username='testfunc').first().password_hash) == senhas.rounds
+
+
+def test_health(test_client):
+    """Testa os endpoints de liveness e readiness (este consulta o banco)."""
+    assert test_client.get('/health/live').status_code == 200
+    response = test_client.get('/health/ready')
+    assert response.status_code == 200
+    assert json.loads(response.data)['database'] == 'ok'
+
+
+def test_vagas_limitam_hashes_simultaneos_entre_processos(tmp_path):
+    """Testa se as vagas por flock deixam só BCRYPT_PROCESSOS_TOTAL hashes rodando ao mesmo tempo, mesmo com vários pools."""
+    import threading
+    import time
+    from senhas import HashSenhas
+    from flask import Flask
+
+    apps = []
+    for _ in range(3):
+        app = Flask(__name__)
+        app.config.update(BCRYPT_LOG_ROUNDS=4, BCRYPT_PROCESSOS=1, BCRYPT_PROCESSOS_TOTAL=2, BCRYPT_VAGAS_DIR=str(tmp_path))
+        apps.append(HashSenhas(app))
+    simultaneos, pico, lock = [0], [0], threading.Lock()
+
+    def usar(vagas):
+        with vagas:
+            with lock:
+                simultaneos[0] += 1
+                pico[0] = max(pico[0], simultaneos[0])
+            time.sleep(0.05)
+            with lock:
+                simultaneos[0] -= 1
+
+    threads = [threading.Thread(target=usar, args=(s._vagas,)) for s in apps * 2]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert pico[0] == 2
+
+    try:
+        hash_ = apps[0].gerar('senha')
+        assert apps[1].verificar('senha', hash_)
+    finally:
+        for s in apps:
+            s.parar()
@@ -0,0 +1,78 @@
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app import db, Usuario, RegistroPonto, BR_TIMEZONE, senhas
+
+ORCAMENTOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench', 'budgets.json')
+
+
+def _limites():
+    with open(ORCAMENTOS) as f:
+        return {rotulo: l['sql_statements_max'] for rotulo, l in json.load(f)['endpoints'].items()}
+
+
+@contextmanager
+def _contar_sql():
+    comandos = []
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        comandos.append(statement)
+    event.listen(db.engine, 'after_cursor_execute', contar)
+    try:
+        yield comandos
+    finally:
+        event.remove(db.engine, 'after_cursor_execute', contar)
+
+
+def _medir(test_client, metodo, url, **kwargs):
+    with _contar_sql() as comandos:
+        response = getattr(test_client, metodo)(url, **kwargs)
+        response.get_data()  # o relatório é gerado em streaming
+    assert response.status_code in (200, 201), response.data
+    return response, len(comandos)
+
+
+def _popular_agosto(usuarios, dias):
+    for usuario_id in usuarios:
+        for dia in range(1, dias + 1):
+            for hora, tipo in ((8, 'entrada'), (12, 'saida_almoco'), (13, 'volta_almoco'), (17, 'saida')):
+                db.session.add(RegistroPonto(usuario_id=usuario_id, tipo_registro=tipo, timestamp=datetime(2024, 8, dia, hora, tzinfo=BR_TIMEZONE)))
+    db.session.commit()
+
+
+def test_comandos_sql_por_endpoint_dentro_do_orcamento(test_app, test_client):
+    """Testa os comandos SQL por requisição do pico contra bench/budgets.json e se não crescem com o volume de dados."""
+    limites = _limites()
+    func = Usuario.query.filter_by(username='testfunc').first()
+    _popular_agosto([func.id], 2)
+
+    login, n = _medir(test_client, 'post', '/login', data=json.dumps({'username': 'testfunc', 'password': 'senha_func'}), content_type='application/json')
+    assert n <= limites['POST /login']
+    headers = {'Authorization': f"Bearer {json.loads(login.data)['access_token']}"}
+    _, n = _medir(test_client, 'post', '/ponto/registrar', data=json.dumps({'tipo': 'entrada'}), content_type='application/json', headers=headers)
+    assert n <= limites['POST /ponto/registrar']
+    _, n = _medir(test_client, 'get', '/me/hoje', headers=headers)
+    assert n <= limites['GET /me/hoje']
+    # Com o cache preenchido, o polling não vai ao banco.
+    assert _medir(test_client, 'get', '/me/hoje', headers=headers)[1] == 0
+
+    admin = json.loads(test_client.post('/login', data=json.dumps({'username': 'testadmin', 'password': 'senha_admin'}), content_type='application/json').data)
+    admin_headers = {'Authorization': f"Bearer {admin['access_token']}"}
+    consultas = {
+        'GET /admin/registros': '/admin/registros?ano=2024&mes=8',
+        'GET /admin/relatorio': '/admin/relatorio?ano=2024&mes=8&formato=csv',
+    }
+    antes = {rotulo: _medir(test_client, 'get', url, headers=admin_headers)[1] for rotulo, url in consultas.items()}
+
+    # Mais funcionários e mais dias: o número de comandos tem que continuar o mesmo (sem N+1).
+    novos = [Usuario(nome_completo=f'Func {i}', username=f'func_sql_{i}', password_hash=senhas.gerar('x'), role='funcionario') for i in range(5)]
+    db.session.add_all(novos)
+    db.session.commit()
+    _popular_agosto([u.id for u in novos], 10)
+    for rotulo, url in consultas.items():
+        _, n = _medir(test_client, 'get', url, headers=admin_headers)
+        assert n == antes[rotulo] <= limites[rotulo]
+    assert len(json.loads(test_client.get(consultas['GET /admin/registros'], headers=admin_headers).data)) == 8 + 5 * 40
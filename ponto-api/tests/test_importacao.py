@@ -0,0 +1,55 @@
+import json
+from datetime import datetime
+
+from app import db, Usuario, RegistroPonto, ResumoDiario
+
+
+def test_importacao_csv_idempotente(test_app, test_client, token_admin):
+    """Testa se o CSV é importado de uma vez, atualiza os resumos e se reenviar o arquivo não duplica nada."""
+    headers = {'Authorization': f'Bearer {token_admin}'}
+    csv = (
+        "username,data,tipo,hora,justificativa\n"
+        "testfunc,2024-07-01,entrada,08:00,\n"
+        "testfunc,2024-07-01,saida,17:00,Feriado compensado\n"
+        "testadmin,2024-07-01,entrada,09:00,\n"
+        "testadmin,2024-07-01,entrada,09:00,\n"
+    )
+    response = test_client.post('/admin/registros/importar', data=csv.encode('utf-8'), content_type='text/csv', headers=headers)
+    assert response.status_code == 201
+    corpo = json.loads(response.data)
+    assert corpo['inseridos'] == 3
+    assert corpo['linhas_duplicadas'] == [4]
+
+    response = test_client.post('/admin/registros/importar', data=csv.encode('utf-8'), content_type='text/csv', headers=headers)
+    corpo = json.loads(response.data)
+    assert corpo['inseridos'] == 0 and corpo['ignorados'] == 4
+
+    with test_app.app_context():
+        func = Usuario.query.filter_by(username='testfunc').first()
+        registros = RegistroPonto.query.filter_by(usuario_id=func.id).all()
+        assert len(registros) == 2
+        assert {r.justificativa for r in registros} == {'Importação em lote', 'Feriado compensado'}
+        assert db.session.get(ResumoDiario, (func.id, datetime(2024, 7, 1).date())).minutos_trabalhados == 540
+
+
+def test_importacao_json_com_erros_nao_grava_nada(test_app, test_client, token_admin):
+    """Testa se uma linha inválida gera o relatório por linha e nenhuma é gravada."""
+    headers = {'Authorization': f'Bearer {token_admin}'}
+    with test_app.app_context():
+        func_id = Usuario.query.filter_by(username='testfunc').first().id
+        antes = RegistroPonto.query.count()
+    linhas = [
+        {'usuario_id': func_id, 'data': '2024-07-02', 'tipo': 'entrada', 'hora': '08:00'},
+        {'usuario_id': 99999, 'data': '2024-07-02', 'tipo': 'entrada', 'hora': '08:00'},
+        {'username': 'testfunc', 'data': '2024-07-02', 'tipo': 'pausa', 'hora': '10:00'},
+        {'username': 'testfunc', 'data': '02/07/2024', 'tipo': 'saida', 'hora': '17:00'},
+    ]
+    response = test_client.post('/admin/registros/importar', data=json.dumps(linhas), content_type='application/json', headers=headers)
+    assert response.status_code == 400
+    assert [e['linha'] for e in json.loads(response.data)['erros']] == [2, 3, 4]
+    with test_app.app_context():
+        assert RegistroPonto.query.count() == antes
+
+    response = test_client.post('/admin/registros/importar', data=json.dumps({'registros': linhas[:1]}), content_type='application/json', headers=headers)
+    assert response.status_code == 201
+    assert json.loads(response.data)['inseridos'] == 1
@@ -26,4 +26,88 @@ def test_acesso_admin_negado_para_funcionario(test_client):
                                headers={'Authorization': f'Bearer {token}'})
     assert response.status_code == 403
     data = json.loads(response.data)
-    assert data['msg'] == "Acesso restrito a administradores!"
\ No newline at end of file
+    assert data['msg'] == "Acesso restrito a administradores!"
+
+
+def test_meus_registros_usa_mes_local(test_app, test_client):
+    """Testa se o filtro mensal respeita o dia em BR_TIMEZONE (23:30 do dia 31 ainda é março)."""
+    from datetime import datetime
+    from app import db, Usuario, RegistroPonto, BR_TIMEZONE, intervalo_periodo
+    with test_app.app_context():
+        func = Usuario.query.filter_by(username='testfunc').first()
+        db.session.add(RegistroPonto(usuario_id=func.id, tipo_registro='saida', timestamp=datetime(2024, 3, 31, 23, 30, tzinfo=BR_TIMEZONE)))
+        db.session.add(RegistroPonto(usuario_id=func.id, tipo_registro='entrada', timestamp=datetime(2024, 4, 1, 0, 0, tzinfo=BR_TIMEZONE)))
+        db.session.commit()
+
+    login_res = test_client.post('/login', data=json.dumps({'username': 'testfunc', 'password': 'senha_func'}), content_type='application/json')
+    token = json.loads(login_res.data)['access_token']
+    response = test_client.get('/me/registros?ano=2024&mes=3', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert [r['tipo_registro'] for r in json.loads(response.data)] == ['saida']
+
+    assert intervalo_periodo(2024, 12) == (datetime(2024, 12, 1, tzinfo=BR_TIMEZONE), datetime(2025, 1, 1, tzinfo=BR_TIMEZONE))
+    assert test_client.get('/me/registros?ano=2024&mes=13', headers={'Authorization': f'Bearer {token}'}).status_code == 400
+
+
+def test_me_hoje_cache_e_etag(test_app, test_client):
+    """Testa se o /me/hoje responde 304 sem mudanças, reflete a batida e a edição do admin."""
+    from app import cache_hoje, Usuario, BR_TIMEZONE
+    from datetime import datetime
+    login_res = test_client.post('/login', data=json.dumps({'username': 'testfunc', 'password': 'senha_func'}), content_type='application/json')
+    headers = {'Authorization': f"Bearer {json.loads(login_res.data)['access_token']}"}
+    with test_app.app_context():
+        usuario_id = Usuario.query.filter_by(username='testfunc').first().id
+    hoje = datetime.now(BR_TIMEZONE).date()
+
+    primeira = test_client.get('/me/hoje', headers=headers)
+    assert primeira.status_code == 200
+    assert cache_hoje.obter(usuario_id, hoje) == json.loads(primeira.data)
+    repetida = test_client.get('/me/hoje', headers={**headers, 'If-None-Match': primeira.headers['ETag']})
+    assert repetida.status_code == 304
+
+    # A batida invalida a entrada e muda o ETag.
+    test_client.post('/ponto/registrar', data=json.dumps({'tipo': 'saida'}), content_type='application/json', headers=headers)
+    assert cache_hoje.obter(usuario_id, hoje) is None
+    depois = test_client.get('/me/hoje', headers={**headers, 'If-None-Match': primeira.headers['ETag']})
+    assert depois.status_code == 200
+    assert json.loads(depois.data)['registros_hoje'][-1] == 'saida'
+
+    # Edição do admin invalida a entrada do dia.
+    admin_res = test_client.post('/login', data=json.dumps({'username': 'testadmin', 'password': 'senha_admin'}), content_type='application/json')
+    admin = {'Authorization': f"Bearer {json.loads(admin_res.data)['access_token']}"}
+    registros = json.loads(test_client.get(f'/admin/registros?usuario_id={usuario_id}', headers=admin).data)
+    test_client.delete(f"/admin/registros/{registros[-1]['id']}", headers=admin)
+    assert cache_hoje.obter(usuario_id, hoje) is None
+
+
+def test_cache_hoje_ignora_gravacao_de_leitura_anterior_a_invalidacao():
+    """Testa se um GET que leu o banco antes da batida não recoloca o valor antigo no cache."""
+    from datetime import date
+    from flask import Flask
+    from cache_hoje import CacheHoje
+    app = Flask(__name__)
+    app.config.update(CACHE_HOJE_TTL=60)
+    cache = CacheHoje(app)
+    dia = date(2024, 6, 3)
+
+    _, versao = cache.ler(1, dia)
+    cache.invalidar(1, dia)
+    cache.gravar(1, dia, {'registros_hoje': []}, versao)
+    assert cache.obter(1, dia) is None
+
+    _, versao = cache.ler(1, dia)
+    cache.gravar(1, dia, {'registros_hoje': ['entrada']}, versao)
+    assert cache.obter(1, dia) == {'registros_hoje': ['entrada']}
+
+
+def test_cache_hoje_em_memoria_desligado_com_varios_workers():
+    """Testa se o cache por processo é desligado quando há vários workers sem Redis."""
+    from datetime import date
+    from flask import Flask
+    from cache_hoje import CacheHoje
+    app = Flask(__name__)
+    app.config.update(CACHE_HOJE_TTL=60, WEB_WORKERS=3)
+    cache = CacheHoje(app)
+    _, versao = cache.ler(1, date(2024, 6, 3))
+    cache.gravar(1, date(2024, 6, 3), {'registros_hoje': []}, versao)
+    assert cache.obter(1, date(2024, 6, 3)) is None
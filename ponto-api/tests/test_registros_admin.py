@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def registros_maio(criar_registros):
+    """Uma entrada por usuário em 1 a 3/5/2024: seis registros."""
+    criar_registros(2024, 5)
+
+
+def test_listagem_completa_sem_limite(test_client, token_admin, registros_maio):
+    """Testa se sem 'limit' a listagem continua devolvendo todos os registros, como antes."""
+    response = test_client.get('/admin/registros?ano=2024&mes=5', headers={'Authorization': f'Bearer {token_admin}'})
+    assert response.status_code == 200
+    registros = json.loads(response.data)
+    assert len(registros) == 6
+    assert set(registros[0]) == {'id', 'usuario_id', 'nome_usuario', 'timestamp', 'tipo_registro', 'justificativa'}
+    assert [r['nome_usuario'] for r in registros] == ['Admin de Teste'] * 3 + ['Func de Teste'] * 3
+    assert 'X-Next-Cursor' not in response.headers
+
+
+def test_paginacao_por_cursor(test_client, token_admin, registros_maio):
+    """Testa se as páginas do keyset cobrem todos os registros, sem repetir nenhum."""
+    headers = {'Authorization': f'Bearer {token_admin}'}
+    ids = []
+    url = '/admin/registros?ano=2024&mes=5&limit=4'
+    while url:
+        response = test_client.get(url, headers=headers)
+        assert response.status_code == 200
+        ids += [r['id'] for r in json.loads(response.data)]
+        cursor = response.headers.get('X-Next-Cursor')
+        url = f'/admin/registros?ano=2024&mes=5&limit=4&cursor={cursor}' if cursor else None
+    assert len(ids) == 6 and len(set(ids)) == 6
+
+    assert test_client.get('/admin/registros?cursor=lixo', headers=headers).status_code == 400
+    assert test_client.get('/admin/registros?limit=0', headers=headers).status_code == 400
+
+
+def test_projecao_de_campos(test_client, token_admin, registros_maio):
+    """Testa o parâmetro 'fields'."""
+    headers = {'Authorization': f'Bearer {token_admin}'}
+    response = test_client.get('/admin/registros?ano=2024&mes=5&fields=id,tipo_registro', headers=headers)
+    assert response.status_code == 200
+    assert all(set(r) == {'id', 'tipo_registro'} for r in json.loads(response.data))
+    assert test_client.get('/admin/registros?fields=senha', headers=headers).status_code == 400
+
+
+def test_etag_devolve_304(test_client, token_admin, registros_maio):
+    """Testa se uma consulta repetida sem mudanças recebe 304 Not Modified."""
+    headers = {'Authorization': f'Bearer {token_admin}'}
+    primeira = test_client.get('/admin/registros?ano=2024&mes=5', headers=headers)
+    etag = primeira.headers['ETag']
+    segunda = test_client.get('/admin/registros?ano=2024&mes=5', headers=dict(headers, **{'If-None-Match': etag}))
+    assert segunda.status_code == 304
+    assert segunda.data == b''
+
+
+def test_metrics_conta_comandos_sql_por_rota(test_client, token_admin, registros_maio):
+    """Testa se o /metrics mostra a latência e a quantidade de comandos SQL da listagem."""
+    headers = {'Authorization': f'Bearer {token_admin}'}
+    test_client.get('/admin/registros?ano=2024&mes=5', headers=headers)
+    texto = test_client.get('/metrics').get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{method="GET",route="/admin/registros",status="200"}' in texto
+    assert 'db_statements_per_request_count{route="/admin/registros"}' in texto
@@ -0,0 +1,66 @@
+import io
+import gzip
+
+import pytest
+from openpyxl import load_workbook
+
+
+@pytest.fixture(scope='module')
+def registros_marco(criar_registros):
+    """Entrada e saída do testfunc em 1 a 3/3/2024: seis linhas no relatório."""
+    criar_registros(2024, 3, usernames=['testfunc'], batidas=((8, 'entrada'), (18, 'saida')))
+
+
+def test_relatorio_xlsx(test_client, token_admin, registros_marco):
+    """Testa se o relatório padrão continua sendo uma planilha com as mesmas colunas."""
+    response = test_client.get('/admin/relatorio?ano=2024&mes=3', headers={'Authorization': f'Bearer {token_admin}'})
+    assert response.status_code == 200
+    assert 'relatorio_ponto_2024_3.xlsx' in response.headers['Content-Disposition']
+    planilha = load_workbook(io.BytesIO(response.data))['Registros de Ponto']
+    linhas = list(planilha.iter_rows(values_only=True))
+    assert linhas[0] == ('ID Registro', 'Funcionário', 'Username', 'Data e Hora', 'Tipo', 'Justificativa')
+    assert len(linhas) == 7
+    assert linhas[1][1:3] == ('Func de Teste', 'testfunc')
+    assert linhas[1][3].startswith('2024-03-01') and linhas[1][4] == 'entrada'
+
+
+def test_relatorio_xlsx_limitado_aponta_para_csv(test_app, test_client, token_admin, registros_marco):
+    """Testa se planilhas acima do limite são recusadas, enquanto o CSV continua disponível."""
+    headers = {'Authorization': f'Bearer {token_admin}'}
+    limite_original = test_app.config['RELATORIO_XLSX_MAX_LINHAS']
+    test_app.config['RELATORIO_XLSX_MAX_LINHAS'] = 5
+    try:
+        response = test_client.get('/admin/relatorio?ano=2024&mes=3', headers=headers)
+        assert response.status_code == 400
+        assert 'formato=csv' in response.get_json()['msg']
+        assert test_client.get('/admin/relatorio?ano=2024&mes=3&formato=csv', headers=headers).status_code == 200
+        test_app.config['RELATORIO_XLSX_MAX_LINHAS'] = 6
+        assert test_client.get('/admin/relatorio?ano=2024&mes=3', headers=headers).status_code == 200
+    finally:
+        test_app.config['RELATORIO_XLSX_MAX_LINHAS'] = limite_original
+
+
+def test_relatorio_csv_em_streaming(test_client, token_admin, registros_marco):
+    """Testa o relatório em CSV, enviado em blocos."""
+    response = test_client.get('/admin/relatorio?ano=2024&mes=3&formato=csv', headers={'Authorization': f'Bearer {token_admin}'})
+    assert response.status_code == 200
+    assert response.is_streamed
+    texto = response.data.decode('utf-8-sig')
+    linhas = texto.strip().splitlines()
+    assert linhas[0] == 'ID Registro,Funcionário,Username,Data e Hora,Tipo,Justificativa'
+    assert len(linhas) == 7
+
+
+def test_relatorio_csv_gzip(test_client, token_admin, registros_marco):
+    """Testa o relatório em CSV comprimido."""
+    response = test_client.get('/admin/relatorio?ano=2024&mes=3&formato=csv.gz', headers={'Authorization': f'Bearer {token_admin}'})
+    assert response.status_code == 200
+    texto = gzip.decompress(response.data).decode('utf-8-sig')
+    assert len(texto.strip().splitlines()) == 7
+
+
+def test_relatorio_sem_registros_e_formato_invalido(test_client, token_admin):
+    """Testa as respostas de erro do relatório."""
+    headers = {'Authorization': f'Bearer {token_admin}'}
+    assert test_client.get('/admin/relatorio?ano=2020&mes=1', headers=headers).status_code == 404
+    assert test_client.get('/admin/relatorio?ano=2024&mes=3&formato=pdf', headers=headers).status_code == 400
@@ -0,0 +1,111 @@
+import json
+from datetime import datetime, timedelta
+
+from app import db, Usuario, RegistroPonto, ResumoDiario, BR_TIMEZONE, calcular_resumo, gravar_resumos
+
+
+def test_calcular_resumo():
+    """Testa o pareamento das batidas: manhã + tarde, almoço e hora extra sobre a jornada."""
+    def dia(h, m):
+        return datetime(2024, 6, 3, h, m, tzinfo=BR_TIMEZONE)
+    resumo = calcular_resumo([(dia(18, 30), 'saida'), (dia(8, 0), 'entrada'), (dia(12, 0), 'saida_almoco'), (dia(13, 0), 'volta_almoco')], 480)
+    assert resumo['minutos_trabalhados'] == 570
+    assert resumo['minutos_almoco'] == 60
+    assert resumo['minutos_extras'] == 90
+    assert resumo['completo'] is True
+
+    # Sem almoço e sem saída: conta só a manhã e não gera hora extra.
+    parcial = calcular_resumo([(dia(8, 0), 'entrada'), (dia(12, 0), 'saida_almoco')], 180)
+    assert parcial['minutos_trabalhados'] == 240
+    assert parcial['minutos_extras'] == 0
+    assert parcial['completo'] is False
+
+
+def test_resumo_mantido_pelas_edicoes(test_app, test_client, token_admin):
+    """Testa se lançamento manual, PUT e DELETE mantêm o resumo do dia e se o /admin/resumo o lê."""
+    headers = {'Authorization': f'Bearer {token_admin}'}
+    with test_app.app_context():
+        usuario_id = Usuario.query.filter_by(username='testfunc').first().id
+
+    dados = {'usuario_id': usuario_id, 'data': '2024-06-03', 'registros': {'entrada': '08:00', 'saida_almoco': '12:00', 'volta_almoco': '13:00', 'saida': '17:30'}}
+    assert test_client.post('/admin/registros', data=json.dumps(dados), content_type='application/json', headers=headers).status_code == 201
+
+    response = test_client.get('/admin/resumo?ano=2024&mes=6', headers=headers)
+    assert response.status_code == 200
+    resumos = json.loads(response.data)
+    assert len(resumos) == 1
+    assert resumos[0]['dia'] == '2024-06-03'
+    assert resumos[0]['minutos_trabalhados'] == 510
+    assert resumos[0]['minutos_extras'] == 30
+    assert resumos[0]['completo'] is True
+
+    # Move a saída para o dia seguinte: os dois dias são recalculados.
+    registros = json.loads(test_client.get(f'/admin/registros?usuario_id={usuario_id}&ano=2024&mes=6', headers=headers).data)
+    saida = next(r for r in registros if r['tipo_registro'] == 'saida')
+    test_client.put(f"/admin/registros/{saida['id']}", data=json.dumps({'timestamp': '2024-06-04T17:30:00'}), content_type='application/json', headers=headers)
+    with test_app.app_context():
+        assert db.session.get(ResumoDiario, (usuario_id, datetime(2024, 6, 3).date())).completo is False
+        assert db.session.get(ResumoDiario, (usuario_id, datetime(2024, 6, 4).date())).total_registros == 1
+
+    test_client.delete(f"/admin/registros/{saida['id']}", headers=headers)
+    resumos = json.loads(test_client.get(f'/admin/resumo?ano=2024&mes=6&usuario_id={usuario_id}', headers=headers).data)
+    assert [r['dia'] for r in resumos] == ['2024-06-03']
+
+    assert test_client.get('/admin/resumo?ano=2024', headers=headers).status_code == 400
+
+
+def test_registrar_ponto_atualiza_resumo_de_hoje(test_app, test_client):
+    """Testa se a batida do próprio funcionário já cria o resumo do dia."""
+    login_res = test_client.post('/login', data=json.dumps({'username': 'testfunc', 'password': 'senha_func'}), content_type='application/json')
+    token = json.loads(login_res.data)['access_token']
+    response = test_client.post('/ponto/registrar', data=json.dumps({'tipo': 'entrada'}), content_type='application/json', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 201
+    with test_app.app_context():
+        usuario_id = Usuario.query.filter_by(username='testfunc').first().id
+        hoje = datetime.now(BR_TIMEZONE).date()
+        resumo = db.session.get(ResumoDiario, (usuario_id, hoje))
+        assert resumo is not None and resumo.entrada is not None
+
+
+def test_gravar_resumos_faz_upsert(test_app):
+    """Testa se gravar o mesmo (usuario_id, dia) duas vezes atualiza em vez de violar a chave, e se somente_mais_novos preserva a linha mais recente."""
+    dia = datetime(2024, 6, 10).date()
+    with test_app.app_context():
+        usuario_id = Usuario.query.filter_by(username='testfunc').first().id
+        recente = datetime(2024, 6, 10, 18, 0, tzinfo=BR_TIMEZONE)
+        linha = dict(calcular_resumo([], 480), usuario_id=usuario_id, dia=dia, atualizado_em=recente)
+        gravar_resumos([linha])
+        gravar_resumos([dict(linha, total_registros=2)])
+        db.session.commit()
+        assert db.session.get(ResumoDiario, (usuario_id, dia)).total_registros == 2
+
+        antigo = dict(linha, total_registros=9, atualizado_em=recente - timedelta(hours=1))
+        gravar_resumos([antigo], somente_mais_novos=True)
+        db.session.commit()
+        db.session.expire_all()
+        assert db.session.get(ResumoDiario, (usuario_id, dia)).total_registros == 2
+
+
+def test_backfill_em_lotes_com_commit_entre_consultas(test_app, monkeypatch):
+    """Testa o backfill com mais dias que LOTE: cada lote é lido por uma consulta nova e gravado com commit próprio."""
+    import backfill_resumos
+    monkeypatch.setattr(backfill_resumos, 'LOTE', 3)
+    monkeypatch.setattr(backfill_resumos, 'LINHAS_POR_CONSULTA', 5)
+    with test_app.app_context():
+        usuarios = [u.id for u in Usuario.query.order_by(Usuario.id)]
+        for usuario_id in usuarios:
+            for dia in range(2, 10):
+                for hora, tipo in ((8, 'entrada'), (17, 'saida')):
+                    db.session.add(RegistroPonto(usuario_id=usuario_id, tipo_registro=tipo, timestamp=datetime(2023, 1, dia, hora, 0, tzinfo=BR_TIMEZONE)))
+        db.session.commit()
+
+    commits = []
+    commit_original = db.session.commit
+    monkeypatch.setattr(db.session, 'commit', lambda: (commits.append(1), commit_original())[1])
+    backfill_resumos.preencher_resumos(desde=datetime(2023, 1, 1).date(), app=test_app)
+    assert len(commits) > 2
+
+    with test_app.app_context():
+        resumos = ResumoDiario.query.filter(ResumoDiario.dia < datetime(2023, 2, 1).date()).all()
+        assert len(resumos) == 8 * len(usuarios)
+        assert all(r.total_registros == 2 and r.minutos_trabalhados == 540 for r in resumos)
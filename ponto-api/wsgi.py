@@ -0,0 +1,7 @@
+# Arquivo: ponto-api/wsgi.py
+# Ponto de entrada para o gunicorn em produção: gunicorn -c gunicorn.conf.py wsgi:app
+# (o bloco __main__ do app.py continua servindo para desenvolvimento local).
+
+from app import create_app
+
+app = create_app()
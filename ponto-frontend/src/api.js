@@ -0,0 +1,65 @@
+import axios from 'axios';
+
+// Cliente HTTP compartilhado pelas páginas: envia o access token e, quando ele
+// expira (401), renova a sessão com o refresh token sem pedir a senha de novo.
+const api = axios.create();
+
+api.interceptors.request.use((config) => {
+  const token = localStorage.getItem('user_token');
+  if (token) { config.headers.Authorization = `Bearer ${token}`; }
+  return config;
+}, (error) => Promise.reject(error));
+
+export const salvarSessao = ({ access_token, refresh_token, role }) => {
+  localStorage.setItem('user_token', access_token);
+  localStorage.setItem('refresh_token', refresh_token);
+  if (role) { localStorage.setItem('user_role', role); }
+};
+
+export const limparSessao = () => {
+  localStorage.removeItem('user_token');
+  localStorage.removeItem('refresh_token');
+  localStorage.removeItem('user_role');
+};
+
+// Uma única renovação em andamento por vez: o refresh token é de uso único.
+let renovacao = null;
+
+const renovarSessao = () => {
+  if (!renovacao) {
+    const refreshToken = localStorage.getItem('refresh_token');
+    renovacao = axios.post('/api/token/refresh', null, { headers: { Authorization: `Bearer ${refreshToken}` } })
+      .then((response) => { salvarSessao(response.data); return response.data.access_token; })
+      .finally(() => { renovacao = null; });
+  }
+  return renovacao;
+};
+
+api.interceptors.response.use((response) => response, async (error) => {
+  const original = error.config;
+  if (error.response?.status === 401 && original && !original._renovado && localStorage.getItem('refresh_token')) {
+    original._renovado = true;
+    try {
+      const token = await renovarSessao();
+      original.headers.Authorization = `Bearer ${token}`;
+      return api(original);
+    } catch (e) {
+      limparSessao();
+    }
+  }
+  return Promise.reject(error);
+});
+
+export const encerrarSessao = async () => {
+  const refreshToken = localStorage.getItem('refresh_token');
+  limparSessao();
+  if (refreshToken) {
+    try {
+      await axios.post('/api/logout', null, { headers: { Authorization: `Bearer ${refreshToken}` } });
+    } catch (e) {
+      // O token expira sozinho; falhar aqui não impede a saída.
+    }
+  }
+};
+
+export default api;
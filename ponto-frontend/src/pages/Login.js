@@ -1,5 +1,6 @@
 import React, { useState } from 'react';
 import axios from 'axios';
+import { salvarSessao } from '../api';
 import { useNavigate } from 'react-router-dom';
 
 const Login = () => {
@@ -13,10 +14,9 @@ const Login = () => {
     setError('');
     try {
       const response = await axios.post('/api/login', { username, password });
-      const { access_token, role } = response.data;
+      const { role } = response.data;
       
-      localStorage.setItem('user_token', access_token);
-      localStorage.setItem('user_role', role);
+      salvarSessao(response.data);
 
       if (role === 'admin') {
         navigate('/admin');
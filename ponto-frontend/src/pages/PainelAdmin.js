@@ -1,16 +1,9 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
-import axios from 'axios';
+import api, { encerrarSessao } from '../api';
 import Swal from 'sweetalert2';
 import { FaUserPlus, FaFileExcel, FaClipboardList, FaSearch, FaEdit, FaTrash } from 'react-icons/fa';
 
-const api = axios.create();
-api.interceptors.request.use((config) => {
-  const token = localStorage.getItem('user_token');
-  if (token) { config.headers.Authorization = `Bearer ${token}`; }
-  return config;
-}, (error) => Promise.reject(error));
-
 const PainelAdmin = () => {
     const navigate = useNavigate();
     const [usuarios, setUsuarios] = useState([]);
@@ -41,8 +34,7 @@ const PainelAdmin = () => {
     useEffect(() => { fetchUsuarios(); }, []);
 
     const handleLogout = () => {
-        localStorage.removeItem('user_token');
-        localStorage.removeItem('user_role');
+        encerrarSessao();
         navigate('/');
     };
 
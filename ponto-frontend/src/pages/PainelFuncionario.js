@@ -1,18 +1,9 @@
 import React, { useState, useEffect } from 'react';
-import axios from 'axios';
+import api, { encerrarSessao } from '../api';
 import Swal from 'sweetalert2';
 import { FaCheckCircle, FaCalendarAlt } from 'react-icons/fa';
 import { useNavigate, Link } from 'react-router-dom';
 
-const api = axios.create();
-api.interceptors.request.use((config) => {
-  const token = localStorage.getItem('user_token');
-  if (token) {
-    config.headers.Authorization = `Bearer ${token}`;
-  }
-  return config;
-}, (error) => Promise.reject(error));
-
 const PainelFuncionario = () => {
   const [userData, setUserData] = useState(null);
   const [registrosDoDia, setRegistrosDoDia] = useState([]);
@@ -28,8 +19,7 @@ const PainelFuncionario = () => {
   };
 
   const handleLogout = () => {
-    localStorage.removeItem('user_token');
-    localStorage.removeItem('user_role');
+    encerrarSessao();
     navigate('/');
   };
 
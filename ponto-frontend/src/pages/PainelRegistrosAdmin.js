@@ -1,16 +1,9 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
-import axios from 'axios';
+import api from '../api';
 import Swal from 'sweetalert2';
 import { FaPlusCircle, FaEdit, FaTrash, FaSearch } from 'react-icons/fa';
 
-const api = axios.create();
-api.interceptors.request.use((config) => {
-  const token = localStorage.getItem('user_token');
-  if (token) { config.headers.Authorization = `Bearer ${token}`; }
-  return config;
-}, (error) => Promise.reject(error));
-
 const PainelRegistrosAdmin = () => {
     const navigate = useNavigate();
     const [registros, setRegistros] = useState([]);